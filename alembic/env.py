@@ -5,6 +5,7 @@ from logging.config import fileConfig
 from sqlalchemy import engine_from_config, pool
 from alembic import context
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
 
 from app.db.models import Clients, SyncState
 from app.db.models import BonusLog
@@ -46,7 +47,9 @@ def run_migrations_offline() -> None:
 
 def run_migrations_online() -> None:
     """Запуск с реальным подключением (online mode)."""
-    sync_url = settings.DATABASE_URL.replace("+asyncpg", "")
+    # Синхронный драйвер того же диалекта (postgresql+asyncpg -> postgresql)
+    url = make_url(settings.DATABASE_URL)
+    sync_url = url.set(drivername=url.get_backend_name())
 
     # Создаём синхронный движок
     connectable = create_engine(
@@ -56,14 +59,24 @@ def run_migrations_online() -> None:
     )
 
     with connectable.connect() as connection:
-        context.configure(connection=connection, target_metadata=target_metadata)
+        # Каждая миграция - своя транзакция: блокировки (например, ACCESS EXCLUSIVE
+        # при подмене bonuslog в b6d1e0a47c32) снимаются сразу после неё, а не
+        # держатся до конца всего `alembic upgrade head` при старте контейнера
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            transaction_per_migration=True,
+        )
 
         with context.begin_transaction():
             context.run_migrations()
 
 
-# 7) Ветка offline/online
-if context.is_offline_mode():
+# 7) Ветка offline/online. Миграции написаны для Postgres (секционирование,
+# pg_trgm); схему SQLite создаёт init_db через create_all при старте
+if settings.DB_DIALECT == "sqlite":
+    print("SQLite database: migrations are skipped, schema is created by init_db")
+elif context.is_offline_mode():
     run_migrations_offline()
 else:
     run_migrations_online()
@@ -0,0 +1,33 @@
+"""mediafile table
+
+Revision ID: 356d244fe9fe
+Revises: 4b47e85db048
+Create Date: 2026-10-19 12:26:40.183952
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '356d244fe9fe'
+down_revision: Union[str, Sequence[str], None] = '4b47e85db048'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "mediafile",
+        sa.Column("key", sa.String(length=64), primary_key=True),
+        sa.Column("file_id", sa.String(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("mediafile")
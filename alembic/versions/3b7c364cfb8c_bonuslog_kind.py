@@ -0,0 +1,38 @@
+"""bonuslog kind and nullable record_id
+
+Revision ID: 3b7c364cfb8c
+Revises: 5c4024d3089f
+Create Date: 2026-10-19 10:14:52.907311
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b7c364cfb8c'
+down_revision: Union[str, Sequence[str], None] = '5c4024d3089f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "bonuslog",
+        sa.Column("kind", sa.String(length=16), nullable=False, server_default="award"),
+    )
+    # Служебные операции (сгорание и т.п.) не привязаны к записи YClients
+    op.alter_column("bonuslog", "record_id", existing_type=sa.Integer(), nullable=True)
+    # Индекс для агрегатов по клиенту и дате начисления
+    op.create_index("ix_bonuslog_client_id_awarded_at", "bonuslog", ["client_id", "awarded_at"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_bonuslog_client_id_awarded_at", table_name="bonuslog")
+    op.execute("DELETE FROM bonuslog WHERE record_id IS NULL")
+    op.alter_column("bonuslog", "record_id", existing_type=sa.Integer(), nullable=False)
+    op.drop_column("bonuslog", "kind")
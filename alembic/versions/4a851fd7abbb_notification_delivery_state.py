@@ -0,0 +1,55 @@
+"""notification delivery state
+
+Revision ID: 4a851fd7abbb
+Revises: a8fb5c37c0f2
+Create Date: 2026-10-19 13:47:19.205514
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4a851fd7abbb'
+down_revision: Union[str, Sequence[str], None] = 'a8fb5c37c0f2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("clients", sa.Column("is_chat_unreachable", sa.Boolean(), nullable=False, server_default=sa.text("FALSE")))
+
+    op.add_column("bonuslog", sa.Column("notify_state", sa.String(length=16), nullable=False, server_default="pending"))
+    op.add_column("bonuslog", sa.Column("notify_attempts", sa.Integer(), nullable=False, server_default="0"))
+    op.add_column("bonuslog", sa.Column("notify_next_at", sa.DateTime(timezone=True), nullable=True))
+    op.add_column("bonuslog", sa.Column("notify_error", sa.String(length=255), nullable=True))
+
+    # Уже отправленные уведомления
+    op.execute("UPDATE bonuslog SET notify_state = 'sent' WHERE is_telegram_notified AND kind = 'award'")
+    op.execute("UPDATE bonuslog SET notify_state = 'skipped' WHERE is_telegram_notified AND kind <> 'award'")
+    # Накопившийся хвост для клиентов без Telegram больше не перебирается
+    op.execute("""
+        UPDATE bonuslog SET is_telegram_notified = TRUE, notify_state = 'skipped'
+        FROM clients
+        WHERE bonuslog.client_id = clients.id
+          AND NOT bonuslog.is_telegram_notified
+          AND clients.telegram_user_id IS NULL
+    """)
+
+    op.create_index(
+        "ix_bonuslog_pending", "bonuslog", ["notify_next_at"],
+        postgresql_where=sa.text("NOT is_telegram_notified"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_bonuslog_pending", table_name="bonuslog")
+    op.drop_column("bonuslog", "notify_error")
+    op.drop_column("bonuslog", "notify_next_at")
+    op.drop_column("bonuslog", "notify_attempts")
+    op.drop_column("bonuslog", "notify_state")
+    op.drop_column("clients", "is_chat_unreachable")
@@ -0,0 +1,56 @@
+"""dailystats summary table
+
+Revision ID: 4b47e85db048
+Revises: 3b7c364cfb8c
+Create Date: 2026-10-19 11:03:27.551840
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4b47e85db048'
+down_revision: Union[str, Sequence[str], None] = '3b7c364cfb8c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COUNTERS = (
+    "points_awarded",
+    "awards_count",
+    "points_credited",
+    "points_redeemed",
+    "redemptions_count",
+    "points_expired",
+    "new_members",
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "dailystats",
+        sa.Column("day", sa.Date(), primary_key=True),
+        *[sa.Column(name, sa.Integer(), nullable=False, server_default="0") for name in COUNTERS],
+    )
+    op.create_index("ix_clients_points", "clients", ["points"])
+
+    # Разовое заполнение сводки из накопленной истории начислений и сгораний
+    op.execute("""
+        INSERT INTO dailystats (day, points_awarded, awards_count, points_expired)
+        SELECT
+            CAST(awarded_at AS DATE),
+            COALESCE(SUM(points) FILTER (WHERE kind = 'award'), 0),
+            COUNT(*) FILTER (WHERE kind = 'award'),
+            COALESCE(-SUM(points) FILTER (WHERE kind = 'expire'), 0)
+        FROM bonuslog
+        GROUP BY CAST(awarded_at AS DATE)
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_clients_points", table_name="clients")
+    op.drop_table("dailystats")
@@ -0,0 +1,38 @@
+"""clients trigram indexes
+
+Revision ID: 5c163e14c589
+Revises: 4a851fd7abbb
+Create Date: 2026-10-19 15:11:52.730184
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c163e14c589'
+down_revision: Union[str, Sequence[str], None] = '4a851fd7abbb'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Нечёткий поиск клиентов по имени и части телефона
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.create_index(
+        "ix_clients_name_trgm", "clients", ["name"],
+        postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"},
+    )
+    op.create_index(
+        "ix_clients_phone_number_trgm", "clients", ["phone_number"],
+        postgresql_using="gin", postgresql_ops={"phone_number": "gin_trgm_ops"},
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_clients_phone_number_trgm", table_name="clients")
+    op.drop_index("ix_clients_name_trgm", table_name="clients")
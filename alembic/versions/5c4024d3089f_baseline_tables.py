@@ -0,0 +1,68 @@
+"""baseline tables
+
+Revision ID: 5c4024d3089f
+Revises: 72725f5e4f23
+Create Date: 2026-10-19 10:02:11.418203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c4024d3089f'
+down_revision: Union[str, Sequence[str], None] = '72725f5e4f23'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Начальная миграция пустая, таблицы раньше создавались через create_all.
+    # Создаём их здесь, только если их ещё нет, чтобы последующие миграции
+    # работали и на чистой базе, и на уже развёрнутой.
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if "clients" not in existing:
+        op.create_table(
+            "clients",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("yclients_id", sa.Integer(), nullable=False),
+            sa.Column("phone_number", sa.String(), nullable=False),
+            sa.Column("points", sa.Integer(), nullable=False),
+            sa.Column("is_in_loyalty", sa.Boolean(), nullable=False),
+            sa.Column("name", sa.String(), nullable=False),
+            sa.Column("telegram_user_id", sa.BigInteger(), nullable=True),
+        )
+        op.create_index("ix_clients_yclients_id", "clients", ["yclients_id"])
+        op.create_index("ix_clients_phone_number", "clients", ["phone_number"])
+        op.create_index("ix_clients_name", "clients", ["name"])
+
+    if "syncstate" not in existing:
+        op.create_table(
+            "syncstate",
+            sa.Column("company_id", sa.Integer(), primary_key=True),
+            sa.Column("last_checked", sa.DateTime(timezone=True), nullable=False),
+        )
+
+    if "bonuslog" not in existing:
+        op.create_table(
+            "bonuslog",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("record_id", sa.Integer(), nullable=False),
+            sa.Column("client_id", sa.Integer(), sa.ForeignKey("clients.id"), nullable=False),
+            sa.Column("points", sa.Integer(), nullable=False),
+            sa.Column("awarded_at", sa.DateTime(timezone=True), nullable=False),
+            sa.Column("is_telegram_notified", sa.Boolean(), nullable=False, server_default=sa.text("FALSE")),
+            sa.UniqueConstraint("record_id", name="uix_record_id"),
+        )
+        op.create_index("ix_bonuslog_record_id", "bonuslog", ["record_id"])
+        op.create_index("ix_bonuslog_client_id", "bonuslog", ["client_id"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Таблицы могли существовать до этой миграции - не удаляем их
+    pass
@@ -0,0 +1,49 @@
+"""unified ledger
+
+Revision ID: 7e2d9b41c0a6
+Revises: 5c163e14c589
+Create Date: 2026-10-19 16:02:37.418520
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7e2d9b41c0a6'
+down_revision: Union[str, Sequence[str], None] = '5c163e14c589'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Индекс под keyset-пагинацию истории: (client_id, awarded_at, id)
+    op.drop_index("ix_bonuslog_client_id_awarded_at", table_name="bonuslog")
+    op.create_index(
+        "ix_bonuslog_client_id_awarded_at_id", "bonuslog", ["client_id", "awarded_at", "id"]
+    )
+
+    # Ручные начисления и списания раньше не попадали в журнал. Чтобы сумма
+    # bonuslog по клиенту совпадала с clients.points, разница записывается
+    # одной корректировкой на момент миграции.
+    op.execute("""
+        INSERT INTO bonuslog (client_id, points, awarded_at, is_telegram_notified, notify_state, kind)
+        SELECT c.id, c.points - COALESCE(l.total, 0), now(), TRUE, 'skipped', 'adjust'
+        FROM clients c
+        LEFT JOIN (
+            SELECT client_id, SUM(points) AS total FROM bonuslog GROUP BY client_id
+        ) l ON l.client_id = c.id
+        WHERE c.points <> COALESCE(l.total, 0)
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DELETE FROM bonuslog WHERE kind = 'adjust'")
+    op.drop_index("ix_bonuslog_client_id_awarded_at_id", table_name="bonuslog")
+    op.create_index(
+        "ix_bonuslog_client_id_awarded_at", "bonuslog", ["client_id", "awarded_at"]
+    )
@@ -0,0 +1,52 @@
+"""recordfingerprint
+
+Revision ID: 9f3a6c2d81e4
+Revises: 7e2d9b41c0a6
+Create Date: 2026-10-19 16:48:05.211937
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9f3a6c2d81e4'
+down_revision: Union[str, Sequence[str], None] = '7e2d9b41c0a6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "recordfingerprint",
+        sa.Column("record_id", sa.Integer(), primary_key=True, autoincrement=False),
+        sa.Column("client_id", sa.Integer(), sa.ForeignKey("clients.id"), nullable=False),
+        sa.Column("fingerprint", sa.String(length=16), nullable=True),
+        sa.Column("points", sa.Integer(), nullable=False),
+    )
+    # Уже начисленные записи: отпечаток посчитается при следующем изменении,
+    # корректировка будет только если изменились баллы
+    op.execute("""
+        INSERT INTO recordfingerprint (record_id, client_id, fingerprint, points)
+        SELECT record_id, client_id, NULL, points
+        FROM bonuslog
+        WHERE kind = 'award' AND record_id IS NOT NULL
+    """)
+
+    # Корректировки по записи хранят тот же record_id - уникально только начисление
+    op.drop_constraint("uix_record_id", "bonuslog", type_="unique")
+    op.create_index(
+        "uix_record_id", "bonuslog", ["record_id"], unique=True,
+        postgresql_where=sa.text("kind = 'award'"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("UPDATE bonuslog SET record_id = NULL WHERE kind <> 'award'")
+    op.drop_index("uix_record_id", table_name="bonuslog")
+    op.create_unique_constraint("uix_record_id", "bonuslog", ["record_id"])
+    op.drop_table("recordfingerprint")
@@ -0,0 +1,34 @@
+"""processedupdate table
+
+Revision ID: a8fb5c37c0f2
+Revises: 356d244fe9fe
+Create Date: 2026-10-19 12:58:03.661027
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a8fb5c37c0f2'
+down_revision: Union[str, Sequence[str], None] = '356d244fe9fe'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "processedupdate",
+        sa.Column("update_id", sa.BigInteger(), primary_key=True, autoincrement=False),
+        sa.Column("seen_at", sa.DateTime(timezone=True), nullable=False),
+    )
+    op.create_index("ix_processedupdate_seen_at", "processedupdate", ["seen_at"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_processedupdate_seen_at", table_name="processedupdate")
+    op.drop_table("processedupdate")
@@ -0,0 +1,184 @@
+"""partition bonuslog by month
+
+Revision ID: b6d1e0a47c32
+Revises: 9f3a6c2d81e4
+Create Date: 2026-10-19 17:35:41.902118
+
+"""
+from datetime import date
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b6d1e0a47c32'
+down_revision: Union[str, Sequence[str], None] = '9f3a6c2d81e4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Сколько строк копировать за одну транзакцию
+COPY_BATCH_SIZE = 20000
+# Сколько будущих месяцев создать сразу (дальше - задача maintain_bonuslog_partitions)
+MONTHS_AHEAD = 3
+
+# Колонки, которые может изменить приложение (уведомления, корректировки)
+_MUTABLE_COLUMNS = (
+    "record_id", "client_id", "points", "is_telegram_notified", "kind",
+    "notify_state", "notify_attempts", "notify_next_at", "notify_error",
+)
+
+
+def _add_months(month: date, months: int) -> date:
+    total = month.year * 12 + month.month - 1 + months
+    return date(total // 12, total % 12 + 1, 1)
+
+
+def _drop_copy() -> None:
+    """Зеркалирующий триггер и копия таблицы, оставшиеся от прерванного запуска"""
+    op.execute("DROP TRIGGER IF EXISTS bonuslog_mirror ON bonuslog")
+    op.execute("DROP FUNCTION IF EXISTS bonuslog_mirror()")
+    op.execute("DROP TABLE IF EXISTS bonuslog_part")
+
+
+def upgrade() -> None:
+    """
+    Перенос bonuslog в таблицу, секционированную по месяцам awarded_at, без
+    долгой блокировки: новые изменения зеркалируются триггером, старые строки
+    копируются пачками в отдельных транзакциях, в конце таблицы меняются местами.
+    """
+    bind = op.get_bind()
+
+    # Копирование фиксируется до подмены таблиц: после неудачного запуска начинаем заново
+    _drop_copy()
+
+    # 1) Новая таблица с секциями и индексами (имена индексов старой таблицы освобождаем)
+    for name in ("ix_bonuslog_pending", "ix_bonuslog_client_id_awarded_at_id"):
+        op.execute(f"ALTER INDEX IF EXISTS {name} RENAME TO {name}_old")
+
+    op.execute("""
+        CREATE TABLE bonuslog_part (LIKE bonuslog INCLUDING DEFAULTS)
+        PARTITION BY RANGE (awarded_at)
+    """)
+    op.execute("ALTER TABLE bonuslog_part ADD CONSTRAINT bonuslog_part_pkey PRIMARY KEY (id, awarded_at)")
+    op.execute("""
+        ALTER TABLE bonuslog_part ADD CONSTRAINT bonuslog_part_client_id_fkey
+        FOREIGN KEY (client_id) REFERENCES clients (id)
+    """)
+
+    # Границы секций - месяцы по UTC
+    oldest, current = bind.execute(sa.text("""
+        SELECT date_trunc('month', min(awarded_at) AT TIME ZONE 'UTC')::date,
+               date_trunc('month', now() AT TIME ZONE 'UTC')::date
+        FROM bonuslog
+    """)).one()
+    month = oldest or current
+    while month <= _add_months(current, MONTHS_AHEAD):
+        following = _add_months(month, 1)
+        op.execute(
+            f"CREATE TABLE bonuslog_{month:%Y_%m} PARTITION OF bonuslog_part "
+            f"FOR VALUES FROM ('{month:%Y-%m-%d} 00:00:00+00') TO ('{following:%Y-%m-%d} 00:00:00+00')"
+        )
+        month = following
+    # Страховка для строк вне созданных месяцев
+    op.execute("CREATE TABLE bonuslog_default PARTITION OF bonuslog_part DEFAULT")
+
+    op.create_index(
+        "ix_bonuslog_client_id_awarded_at_id", "bonuslog_part", ["client_id", "awarded_at", "id"]
+    )
+    op.create_index(
+        "ix_bonuslog_pending", "bonuslog_part", ["notify_next_at"],
+        postgresql_where=sa.text("NOT is_telegram_notified"),
+    )
+
+    # 2) Все изменения старой таблицы с этого момента повторяются в новой
+    updates = ", ".join(f"{column} = EXCLUDED.{column}" for column in _MUTABLE_COLUMNS)
+    op.execute(f"""
+        CREATE FUNCTION bonuslog_mirror() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                DELETE FROM bonuslog_part WHERE id = OLD.id AND awarded_at = OLD.awarded_at;
+                RETURN OLD;
+            END IF;
+            INSERT INTO bonuslog_part SELECT NEW.*
+            ON CONFLICT (id, awarded_at) DO UPDATE SET {updates};
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER bonuslog_mirror AFTER INSERT OR UPDATE OR DELETE ON bonuslog
+        FOR EACH ROW EXECUTE FUNCTION bonuslog_mirror()
+    """)
+
+    try:
+        # 3) Копирование накопленных строк пачками, каждая пачка - своя транзакция
+        with op.get_context().autocommit_block():
+            max_id = bind.execute(sa.text("SELECT coalesce(max(id), 0) FROM bonuslog")).scalar()
+            last_id = 0
+            while last_id < max_id:
+                bind.execute(
+                    sa.text("""
+                        INSERT INTO bonuslog_part
+                        SELECT * FROM bonuslog WHERE id > :last_id AND id <= :upper
+                        ON CONFLICT (id, awarded_at) DO NOTHING
+                    """),
+                    {"last_id": last_id, "upper": last_id + COPY_BATCH_SIZE}
+                )
+                last_id += COPY_BATCH_SIZE
+
+        # 4) Подмена таблиц под короткой блокировкой; при ошибке откатывается только она.
+        # Блокировка снимается коммитом этой миграции (transaction_per_migration в env.py)
+        with bind.begin_nested():
+            op.execute("LOCK TABLE bonuslog IN ACCESS EXCLUSIVE MODE")
+            old_count, new_count = bind.execute(sa.text(
+                "SELECT (SELECT count(*) FROM bonuslog), (SELECT count(*) FROM bonuslog_part)"
+            )).one()
+            if old_count != new_count:
+                raise RuntimeError(f"bonuslog copy mismatch: {old_count} rows vs {new_count} copied")
+
+            op.execute("DROP TRIGGER bonuslog_mirror ON bonuslog")
+            op.execute("DROP FUNCTION bonuslog_mirror()")
+            op.execute("ALTER TABLE bonuslog RENAME TO bonuslog_unpartitioned")
+            op.execute("ALTER TABLE bonuslog_part RENAME TO bonuslog")
+            op.execute("ALTER SEQUENCE bonuslog_id_seq OWNED BY bonuslog.id")
+            op.execute("DROP TABLE bonuslog_unpartitioned")
+            op.execute("ALTER INDEX bonuslog_part_pkey RENAME TO bonuslog_pkey")
+            op.execute("ALTER TABLE bonuslog RENAME CONSTRAINT bonuslog_part_client_id_fkey TO bonuslog_client_id_fkey")
+    except Exception:
+        # Иначе триггер продолжит удваивать каждую запись в bonuslog_part,
+        # а повторный запуск миграции упадёт на CREATE TABLE bonuslog_part
+        with op.get_context().autocommit_block():
+            _drop_copy()
+        raise
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Обратный перенос в обычную таблицу (секции, уже отправленные в архив, не вернутся)
+    op.execute("ALTER TABLE bonuslog RENAME TO bonuslog_part")
+    op.execute("ALTER INDEX bonuslog_pkey RENAME TO bonuslog_part_pkey")
+    for name in ("ix_bonuslog_pending", "ix_bonuslog_client_id_awarded_at_id"):
+        op.execute(f"ALTER INDEX {name} RENAME TO {name}_part")
+
+    op.execute("CREATE TABLE bonuslog (LIKE bonuslog_part INCLUDING DEFAULTS)")
+    op.execute("INSERT INTO bonuslog SELECT * FROM bonuslog_part")
+    op.execute("ALTER TABLE bonuslog ADD PRIMARY KEY (id)")
+    op.execute("ALTER SEQUENCE bonuslog_id_seq OWNED BY bonuslog.id")
+    op.execute("DROP TABLE bonuslog_part")
+
+    op.create_foreign_key("bonuslog_client_id_fkey", "bonuslog", "clients", ["client_id"], ["id"])
+    op.create_index("ix_bonuslog_client_id", "bonuslog", ["client_id"])
+    op.create_index("ix_bonuslog_record_id", "bonuslog", ["record_id"])
+    op.create_index(
+        "uix_record_id", "bonuslog", ["record_id"], unique=True,
+        postgresql_where=sa.text("kind = 'award'"),
+    )
+    op.create_index(
+        "ix_bonuslog_client_id_awarded_at_id", "bonuslog", ["client_id", "awarded_at", "id"]
+    )
+    op.create_index(
+        "ix_bonuslog_pending", "bonuslog", ["notify_next_at"],
+        postgresql_where=sa.text("NOT is_telegram_notified"),
+    )
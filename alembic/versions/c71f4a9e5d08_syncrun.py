@@ -0,0 +1,49 @@
+"""syncrun
+
+Revision ID: c71f4a9e5d08
+Revises: b6d1e0a47c32
+Create Date: 2026-10-19 18:22:14.603371
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c71f4a9e5d08'
+down_revision: Union[str, Sequence[str], None] = 'b6d1e0a47c32'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "syncrun",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("company_id", sa.Integer(), nullable=False),
+        sa.Column("started_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("finished_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("window_start", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("window_end", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("cursor", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("pages", sa.Integer(), nullable=False),
+        sa.Column("api_seconds", sa.Float(), nullable=False),
+        sa.Column("db_seconds", sa.Float(), nullable=False),
+        sa.Column("records_seen", sa.Integer(), nullable=False),
+        sa.Column("records_skipped", sa.Integer(), nullable=False),
+        sa.Column("records_awarded", sa.Integer(), nullable=False),
+        sa.Column("records_adjusted", sa.Integer(), nullable=False),
+        sa.Column("api_errors", sa.Integer(), nullable=False),
+        sa.Column("errors", sa.Integer(), nullable=False),
+        sa.Column("last_error", sa.String(length=255), nullable=True),
+    )
+    op.create_index("ix_syncrun_started_at", "syncrun", ["started_at"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_syncrun_started_at", table_name="syncrun")
+    op.drop_table("syncrun")
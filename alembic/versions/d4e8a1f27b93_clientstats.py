@@ -0,0 +1,85 @@
+"""clientstats
+
+Revision ID: d4e8a1f27b93
+Revises: c71f4a9e5d08
+Create Date: 2026-10-19 21:47:36.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4e8a1f27b93'
+down_revision: Union[str, Sequence[str], None] = 'c71f4a9e5d08'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Сумма уже учтённых записей не хранилась: у них amount пусто и в spend они
+    # не входят, пока запись не изменится. Оплаченными они считаются по баллам
+    op.add_column("recordfingerprint", sa.Column("amount", sa.Integer(), nullable=True))
+
+    op.create_table(
+        "clientstats",
+        sa.Column("client_id", sa.Integer(), sa.ForeignKey("clients.id"), primary_key=True),
+        sa.Column("visits", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("spend", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("points_earned", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("points_redeemed", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("last_visit_at", sa.DateTime(timezone=True), nullable=True),
+    )
+
+    # Начальное заполнение - тот же расчёт, что в app/tasks/rebuild_client_stats.py
+    op.execute(
+        """
+        INSERT INTO clientstats (client_id, visits, spend, points_earned, points_redeemed, last_visit_at)
+        SELECT c.id,
+               coalesce(r.visits, 0),
+               coalesce(r.spend, 0),
+               coalesce(p.earned, 0),
+               coalesce(p.redeemed, 0),
+               v.last_visit_at
+        FROM clients c
+        LEFT JOIN (
+            SELECT client_id,
+                   count(*) FILTER (WHERE coalesce(amount, points) > 0) AS visits,
+                   sum(amount) AS spend
+            FROM recordfingerprint
+            GROUP BY client_id
+        ) r ON r.client_id = c.id
+        LEFT JOIN (
+            SELECT client_id,
+                   -- корректировки без записи - расхождения с журналом (миграция 7e2d9b41c0a6):
+                   -- положительные - начисления мимо журнала, отрицательные - списания
+                   sum(points) FILTER (
+                       WHERE kind IN ('award', 'credit') OR (kind = 'adjust' AND record_id IS NOT NULL)
+                          OR (kind = 'adjust' AND record_id IS NULL AND points > 0)
+                   ) AS earned,
+                   -sum(points) FILTER (
+                       WHERE kind = 'redeem' OR (kind = 'adjust' AND record_id IS NULL AND points < 0)
+                   ) AS redeemed
+            FROM bonuslog
+            GROUP BY client_id
+        ) p ON p.client_id = c.id
+        LEFT JOIN (
+            SELECT b.client_id, max(b.awarded_at) AS last_visit_at
+            FROM bonuslog b
+            JOIN recordfingerprint f ON f.record_id = b.record_id
+            WHERE (b.kind = 'award' OR (b.kind = 'adjust' AND b.points > 0))
+              AND coalesce(f.amount, f.points) > 0
+            GROUP BY b.client_id
+        ) v ON v.client_id = c.id
+        WHERE r.client_id IS NOT NULL OR p.client_id IS NOT NULL
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("clientstats")
+    op.drop_column("recordfingerprint", "amount")
@@ -0,0 +1,83 @@
+# app/api/admin.py
+
+import secrets
+from typing import Optional
+
+from fastapi import APIRouter, BackgroundTasks, Depends, Header, HTTPException, Query
+from fastapi.responses import FileResponse, StreamingResponse
+
+from app.config import settings
+from app.loop_monitor import loop_monitor
+from app.profiling import DEFAULT_PROFILE_SECONDS, request_profile
+from app.bot.services.export import EXPORT_FORMATS, export_to_file, iter_csv, parse_period_bounds
+
+
+def require_admin_token(authorization: str = Header(default="")):
+    """Проверка заголовка Authorization: Bearer <ADMIN_API_TOKEN>"""
+    if not settings.ADMIN_API_TOKEN:
+        raise HTTPException(status_code=404, detail="Not found")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not secrets.compare_digest(token, settings.ADMIN_API_TOKEN):
+        raise HTTPException(status_code=401, detail="Unauthorized")
+
+
+# Служебные HTTP-эндпоинты для администраторов
+admin_api = APIRouter(prefix="/admin", dependencies=[Depends(require_admin_token)])
+
+
+@admin_api.get("/export")
+async def export_ledger(
+    background: BackgroundTasks,
+    start: Optional[str] = Query(default=None, description="YYYY-MM-DD или YYYY-MM (месяц целиком)"),
+    end: Optional[str] = Query(default=None, description="YYYY-MM-DD, включительно"),
+    fmt: str = Query(default="csv", alias="format"),
+):
+    """
+    Выгрузка журнала баллов за период. CSV отдаётся потоком прямо из
+    серверного курсора, parquet собирается во временный файл по row group.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {EXPORT_FORMATS}")
+    try:
+        period = parse_period_bounds(start, end)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid period: {e}")
+    date_from, date_to = period
+    filename = f"ledger_{date_from}_{date_to}"
+
+    if fmt == "csv":
+        return StreamingResponse(
+            iter_csv(date_from, date_to),
+            media_type="text/csv",
+            headers={"Content-Disposition": f'attachment; filename="{filename}.csv"'},
+        )
+
+    try:
+        path, _ = await export_to_file(date_from, date_to, fmt)
+    except ImportError:
+        raise HTTPException(status_code=501, detail="pyarrow is not installed")
+    background.add_task(path.unlink, missing_ok=True)
+    return FileResponse(path, media_type="application/octet-stream", filename=f"{filename}.parquet")
+
+
+@admin_api.get("/loop-lag")
+async def loop_lag():
+    """Гистограмма задержек event loop этого процесса (LOOP_MONITOR_ENABLED)"""
+    return loop_monitor.snapshot()
+
+
+@admin_api.post("/profile")
+async def profile(
+    target: str = Query(description="sync или updates"),
+    count: int = Query(default=1, ge=1),
+    seconds: int = Query(default=DEFAULT_PROFILE_SECONDS, ge=1),
+):
+    """
+    Профилирование следующих `count` запусков синхронизации или апдейтов
+    Telegram. Отчёт cProfile приходит документом всем администраторам бота.
+    """
+    try:
+        result = await request_profile(target, count, seconds, list(settings.ADMIN_IDS))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"status": "ok", "detail": result}
@@ -1,11 +1,12 @@
 import httpx
-from typing import List
+from typing import List, Optional
 from datetime import datetime
 from pydantic import BaseModel
 from zoneinfo import ZoneInfo
 from tenacity import AsyncRetrying, retry_if_exception_type, stop_after_attempt, wait_exponential
 import logging
 from app.config import settings
+from app.api.yclients_replay import transport_from_settings
 
 # Настройка логгера для YClientsAPI
 logger = logging.getLogger(__name__)
@@ -32,9 +33,11 @@ class Record(BaseModel):
 class YClientsAPI:
     BASE = "https://api.yclients.com/api/v1"
 
-    def __init__(self):
+    def __init__(self, transport: Optional[httpx.AsyncBaseTransport] = None):
         self.company_id = settings.COMPANY_ID
         self.client = httpx.AsyncClient(
+            # Запись/воспроизведение трафика (app/api/yclients_replay.py)
+            transport=transport or transport_from_settings(),
             base_url=self.BASE,
             headers={
                 "Accept": f"application/vnd.yclients.v2+json",
@@ -82,5 +85,39 @@ class YClientsAPI:
             # Пробрасываем дальше, чтобы вызывающий код мог обработать или пропустить
             raise
 
+    async def search_clients(self, page: int = 1, page_size: int = 200) -> List[dict]:
+        """Страница из базы клиентов филиала (id, phone, name), по имени."""
+        try:
+            async for attempt in AsyncRetrying(
+                reraise=True,
+                stop=stop_after_attempt(3),
+                wait=wait_exponential(multiplier=1, min=1, max=10),
+                retry=retry_if_exception_type((
+                    httpx.ConnectError,
+                    httpx.ReadTimeout,
+                    httpx.HTTPStatusError
+                ))
+            ):
+                with attempt:
+                    resp = await self.client.post(
+                        f"/company/{self.company_id}/clients/search",
+                        json={
+                            "page": page,
+                            "page_size": page_size,
+                            "fields": ["id", "phone", "name"],
+                            "filters": [],
+                            "operation": "AND",
+                            "order_by": "name",
+                            "order_by_direction": "ASC"
+                        }
+                    )
+                    resp.raise_for_status()
+                    return resp.json().get("data", [])
+        except Exception as exc:
+            logger.exception(
+                "Failed to search clients in YClients after retries: %s", exc
+            )
+            raise
+
     async def close(self):
         await self.client.aclose()
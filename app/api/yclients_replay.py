@@ -0,0 +1,176 @@
+# app/api/yclients_replay.py
+"""
+Запись и воспроизведение трафика YClientsAPI для разбора проблем
+производительности без сети.
+
+- CaptureTransport оборачивает обычный транспорт httpx и дописывает каждую
+  пару запрос/ответ строкой JSON в YCLIENTS_CAPTURE_FILE (gzip, JSONL).
+  Каждая строка - отдельный завершённый gzip-член, поэтому файл читается и
+  после того, как процесс убили посреди синхронизации. Заголовки
+  авторизации в файл не попадают.
+- ReplayTransport отдаёт ответы из такого файла. Запросы сопоставляются по
+  методу, пути, параметрам и телу без меняющихся от запуска к запуску полей
+  (changed_after); одинаковые запросы получают ответы в порядке записи,
+  поэтому повтор детерминирован. YCLIENTS_REPLAY_LATENCY - множитель
+  записанных задержек (0 - отвечать сразу).
+"""
+
+import asyncio
+import gzip
+import json
+import logging
+import time
+from collections import defaultdict, deque
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Deque, Dict, Optional, Tuple
+
+import httpx
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Заголовки запроса, которые не пишутся в файл
+REDACTED_HEADERS = {"authorization", "cookie", "proxy-authorization"}
+# Параметры, зависящие от времени запуска; при воспроизведении не сравниваются
+VOLATILE_PARAMS = {"changed_after"}
+
+
+class ReplayMiss(httpx.TransportError):
+    """В записи не осталось ответа на такой запрос"""
+
+
+def _request_body(request: httpx.Request):
+    if not request.content:
+        return None
+    try:
+        return json.loads(request.content)
+    except ValueError:
+        return request.content.decode(errors="replace")
+
+
+def _request_key(method: str, path: str, params: Dict[str, str], body) -> Tuple[str, str, str, str]:
+    stable = {k: v for k, v in params.items() if k not in VOLATILE_PARAMS}
+    return (
+        method,
+        path,
+        json.dumps(stable, sort_keys=True),
+        json.dumps(body, sort_keys=True, ensure_ascii=False),
+    )
+
+
+class CaptureTransport(httpx.AsyncBaseTransport):
+    """Пишет запросы и ответы в gzip JSONL, ответ отдаёт дальше без изменений"""
+
+    def __init__(self, path: str, inner: Optional[httpx.AsyncBaseTransport] = None):
+        self.inner = inner or httpx.AsyncHTTPTransport()
+        # Каждая запись сжимается отдельным gzip-членом и сразу сбрасывается на диск
+        self._file = open(path, "ab")
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        started = time.perf_counter()
+        response = await self.inner.handle_async_request(request)
+        content = await response.aread()
+        elapsed = time.perf_counter() - started
+
+        entry = {
+            "at": datetime.now(timezone.utc).isoformat(),
+            "method": request.method,
+            "path": request.url.path,
+            "params": dict(request.url.params),
+            "headers": {
+                k: v for k, v in request.headers.items() if k.lower() not in REDACTED_HEADERS
+            },
+            "body": _request_body(request),
+            "status": response.status_code,
+            "content_type": response.headers.get("content-type", ""),
+            "response": content.decode("utf-8", errors="replace"),
+            "elapsed": round(elapsed, 4),
+        }
+        self._file.write(gzip.compress((json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8")))
+        self._file.flush()
+
+        # Тело уже прочитано и распаковано - отдаём его без content-encoding
+        return httpx.Response(
+            response.status_code,
+            headers={"content-type": entry["content_type"]},
+            content=content,
+            request=request,
+        )
+
+    async def aclose(self):
+        self._file.close()
+        await self.inner.aclose()
+
+
+class ReplayLog:
+    """Записанные ответы, разложенные по ключу запроса в порядке записи"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: Dict[tuple, Deque[dict]] = defaultdict(deque)
+        self.total = 0
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            try:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    entry = json.loads(line)
+                    key = _request_key(entry["method"], entry["path"], entry["params"], entry["body"])
+                    self.entries[key].append(entry)
+                    self.total += 1
+            except (EOFError, gzip.BadGzipFile, ValueError) as e:
+                # Запись прервана (процесс остановили на середине строки) - берём всё до неё
+                logger.warning("Capture %s ends with a truncated entry (%s), using what was read", path, e)
+        logger.info("Loaded %s recorded YClients responses from %s", self.total, path)
+
+    def take(self, key: tuple) -> Optional[dict]:
+        queue = self.entries.get(key)
+        return queue.popleft() if queue else None
+
+    def remaining(self, path_prefix: str = "", **params) -> int:
+        """Сколько ещё не выданных ответов на запросы с таким началом пути и параметрами"""
+        count = 0
+        for (_, path, stable, _), queue in self.entries.items():
+            if not path.startswith(path_prefix) or not queue:
+                continue
+            recorded = json.loads(stable)
+            if all(recorded.get(k) == str(v) for k, v in params.items()):
+                count += len(queue)
+        return count
+
+
+@lru_cache(maxsize=None)
+def load_replay(path: str) -> ReplayLog:
+    """Одна запись на процесс: следующие экземпляры API продолжают с того же места"""
+    return ReplayLog(path)
+
+
+class ReplayTransport(httpx.AsyncBaseTransport):
+    def __init__(self, log: ReplayLog, latency: float = 0.0):
+        self.log = log
+        self.latency = latency
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        key = _request_key(request.method, request.url.path, dict(request.url.params), _request_body(request))
+        entry = self.log.take(key)
+        if entry is None:
+            raise ReplayMiss(f"No recorded response for {request.method} {request.url}", request=request)
+        if self.latency:
+            await asyncio.sleep(entry["elapsed"] * self.latency)
+        return httpx.Response(
+            entry["status"],
+            headers={"content-type": entry["content_type"]},
+            content=entry["response"].encode("utf-8"),
+            request=request,
+        )
+
+
+def transport_from_settings() -> Optional[httpx.AsyncBaseTransport]:
+    """Транспорт для YClientsAPI по настройкам; None - обычные запросы в сеть"""
+    if settings.YCLIENTS_REPLAY_FILE:
+        return ReplayTransport(load_replay(settings.YCLIENTS_REPLAY_FILE), settings.YCLIENTS_REPLAY_LATENCY)
+    if settings.YCLIENTS_CAPTURE_FILE:
+        return CaptureTransport(settings.YCLIENTS_CAPTURE_FILE)
+    return None
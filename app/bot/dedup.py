@@ -0,0 +1,93 @@
+# app/bot/dedup.py
+
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete
+
+from app.config import settings
+from app.db.models import ProcessedUpdate
+from app.db.session import async_session, dialect_insert
+
+logger = logging.getLogger(__name__)
+
+
+class UpdateDeduplicator:
+    """
+    Индекс недавно полученных update_id. Telegram повторно присылает апдейт,
+    если webhook отвечал слишком долго, - такие повторы отбрасываются до
+    запуска хендлеров.
+
+    В памяти: OrderedDict в порядке поступления, проверка и вставка O(1),
+    записи старше ttl и сверх max_size вытесняются с головы.
+    При shared=True апдейт дополнительно фиксируется в Postgres, чтобы
+    повтор, пришедший на другую реплику, тоже был отброшен.
+    """
+
+    # Как часто (в новых апдейтах) чистить устаревшие строки в Postgres
+    CLEANUP_EVERY = 1000
+
+    def __init__(self, ttl_seconds: int, max_size: int, shared: bool = False):
+        self.ttl = ttl_seconds
+        self.max_size = max_size
+        self.shared = shared
+        self._seen: "OrderedDict[int, float]" = OrderedDict()
+        self._inserted = 0
+        self.duplicates = 0
+
+    async def first_seen(self, update_id: int) -> bool:
+        """True - апдейт новый и его нужно обработать, False - повтор"""
+        now = time.monotonic()
+        self._evict(now)
+        if update_id in self._seen:
+            self.duplicates += 1
+            return False
+        self._seen[update_id] = now
+
+        if self.shared:
+            try:
+                if not await self._claim_shared(update_id):
+                    self.duplicates += 1
+                    return False
+            except Exception as e:
+                # Недоступность БД не должна останавливать обработку апдейтов
+                logger.exception("Shared update dedup failed for %s: %s", update_id, e)
+        return True
+
+    def _evict(self, now: float):
+        horizon = now - self.ttl
+        while self._seen:
+            seen_at = next(iter(self._seen.values()))
+            if seen_at >= horizon and len(self._seen) < self.max_size:
+                break
+            self._seen.popitem(last=False)
+
+    async def _claim_shared(self, update_id: int) -> bool:
+        """INSERT ... ON CONFLICT DO NOTHING: строка вернулась - апдейт наш"""
+        table = ProcessedUpdate.__table__
+        now = datetime.now(timezone.utc)
+        async with async_session() as session:
+            result = await session.execute(
+                dialect_insert(session, table)
+                .values(update_id=update_id, seen_at=now)
+                .on_conflict_do_nothing(index_elements=[table.c.update_id])
+                .returning(table.c.update_id)
+            )
+            claimed = result.first() is not None
+
+            self._inserted += 1
+            if self._inserted % self.CLEANUP_EVERY == 0:
+                await session.execute(
+                    delete(table).where(table.c.seen_at < now - timedelta(seconds=self.ttl))
+                )
+            await session.commit()
+        return claimed
+
+
+update_dedup = UpdateDeduplicator(
+    ttl_seconds=settings.UPDATE_DEDUP_TTL_SECONDS,
+    max_size=settings.UPDATE_DEDUP_MAX_SIZE,
+    shared=settings.UPDATE_DEDUP_SHARED,
+)
@@ -7,6 +7,9 @@ from aiogram.types import Update, Message, ErrorEvent
 from aiogram.filters import Command
 
 from app.config import settings
+from app.profiling import profiler, TARGET_UPDATES
+from .dedup import update_dedup
+from .middlewares import throttling
 # Используем относительные импорты для внутренних роутеров
 from .handlers.handlers_admin import admin_router
 from .handlers.handlers_clients import clients_router
@@ -30,6 +33,10 @@ bot = Bot(
 )
 dp = Dispatcher(storage=MemoryStorage())
 
+# Ограничение частоты запросов от пользователей (до фильтров и хендлеров)
+dp.message.outer_middleware(throttling)
+dp.callback_query.outer_middleware(throttling)
+
 # Подключение роутеров с хендлерами
 dp.include_router(admin_router)
 dp.include_router(clients_router)
@@ -60,6 +67,12 @@ router = APIRouter()
 @router.post(f"/bot/{settings.FATHERBOT_TOKEN}")
 async def bot_webhook(request: Request):
     update_data = await request.json()
+    # Повторную доставку того же апдейта отбрасываем до любых хендлеров
+    update_id = update_data.get("update_id")
+    if update_id is not None and not await update_dedup.first_seen(update_id):
+        logger.info("Duplicate update %s dropped", update_id)
+        return {"status": "ok"}
     update = Update(**update_data)
-    await dp.feed_webhook_update(bot, update)
+    async with profiler.capture(TARGET_UPDATES):
+        await dp.feed_webhook_update(bot, update)
     return {"status": "ok"}
@@ -1,11 +1,19 @@
+import asyncio
+import html
+import logging
 import re
 from aiogram import Router, F
-from aiogram.filters import Command
+from aiogram.filters import Command, CommandObject
 from aiogram.types import (
     Message,
     InlineKeyboardMarkup,
     InlineKeyboardButton,
     CallbackQuery,
+    BufferedInputFile,
+    FSInputFile,
+    InlineQuery,
+    InlineQueryResultArticle,
+    InputTextMessageContent,
 )
 from aiogram.filters.state import StateFilter
 from aiogram.fsm.state import State, StatesGroup
@@ -13,11 +21,34 @@ from aiogram.fsm.context import FSMContext
 from sqlmodel import select
 
 from app.config import settings
-from app.db.models import Clients
-from app.db.session import async_session
+from app.db.models import Clients, KIND_CREDIT, KIND_REDEEM
+from app.db.session import async_session, read_session, mark_written
+from app.bot.services.stats import collect_stats, collect_sync_status
+from app.bot.services.export import EXPORT_FORMATS, export_to_file, parse_period
+from app.bot.services.search import MIN_QUERY_LENGTH, search_clients
+from app.bot.services.history import format_history, history_keyboard, history_page
+from app.bot.services.loyalty import change_points
+from app.bot.services.bulk import (
+    BULK_FORMATS,
+    BULK_MAX_FILE_SIZE,
+    BulkRow,
+    Rejected,
+    apply_bulk,
+    format_rejected,
+    parse_bulk_file,
+    preview_bulk,
+)
+from app.bot.services.phones import normalize_phone
+from app.bot.middlewares import throttling
+from app.profiling import DEFAULT_PROFILE_SECONDS, PROFILE_LIMITS, request_profile
+
+logger = logging.getLogger(__name__)
 
 admin_router = Router()
 
+# Ссылки на фоновые задачи, чтобы их не собрал GC до завершения
+_background_tasks = set()
+
 
 # ─── 1) /start и /help ────────────────────────────────────────────────────────
 
@@ -34,6 +65,14 @@ async def cmd_start(message: Message):
         " • XXXXXXXXXX  (добавлю +7)\n\n"
         "Команды:\n"
         " /help — подсказка\n"
+        " /find &lt;имя или часть телефона&gt; — поиск клиента\n"
+        " /history &lt;телефон&gt; — история операций клиента\n"
+        " /stats — статистика программы\n"
+        " /syncstatus — состояние синхронизации с YClients\n"
+        " /profile &lt;sync|updates&gt; [N] [сек] — профилирование следующих N запусков\n"
+        " /export [2026-09 | 2026-09-01 2026-09-15] [csv|parquet] — выгрузка журнала баллов\n"
+        "\nМассовое начисление и списание: пришлите файл CSV или XLSX с колонками "
+        "«телефон» и «баллы» (отрицательное число — списание), бот покажет предпросмотр.\n"
     )
     await message.reply(text, parse_mode="HTML")
 
@@ -44,6 +83,132 @@ async def cmd_help(message: Message):
     await cmd_start(message)
 
 
+@admin_router.message(Command("stats"), F.from_user.id.in_(settings.ADMIN_IDS))
+async def cmd_stats(message: Message):
+    """Сводка из таблицы dailystats - без агрегатов по всей истории"""
+    async with read_session() as session:
+        today, period, members, top = await collect_stats(session, days=30)
+
+    top_lines = "\n".join(
+        f" {i}. {html.escape(c.name)} ({c.phone_number}) — <b>{c.points}</b>"
+        for i, c in enumerate(top, start=1)
+    ) or " —"
+    text = (
+        "📈 <b>Статистика</b>\n\n"
+        f"<b>Сегодня:</b>\n"
+        f" Начислено за визиты: <b>{today['points_awarded']}</b> ({today['awards_count']} визитов)\n"
+        f" Начислено вручную: <b>{today['points_credited']}</b>\n"
+        f" Списано: <b>{today['points_redeemed']}</b> ({today['redemptions_count']} операций)\n"
+        f" Новых участников: <b>{today['new_members']}</b>\n\n"
+        f"<b>За 30 дней:</b>\n"
+        f" Начислено за визиты: <b>{period['points_awarded']}</b> ({period['awards_count']} визитов)\n"
+        f" Начислено вручную: <b>{period['points_credited']}</b>\n"
+        f" Списано: <b>{period['points_redeemed']}</b> ({period['redemptions_count']} операций)\n"
+        f" Сгорело: <b>{period['points_expired']}</b>\n"
+        f" Новых участников: <b>{period['new_members']}</b>\n\n"
+        f"👥 Участников с Telegram: <b>{members}</b>\n"
+        f"🚦 Отклонено антифлудом (с запуска): <b>{sum(throttling.rejected.values())}</b>\n\n"
+        f"🏆 <b>Топ по балансу:</b>\n{top_lines}"
+    )
+    await message.reply(text, parse_mode="HTML")
+
+
+@admin_router.message(Command("syncstatus"), F.from_user.id.in_(settings.ADMIN_IDS))
+async def cmd_syncstatus(message: Message):
+    """Последний запуск sync_records и тренды по таблице syncrun"""
+    async with read_session() as session:
+        last, trends = await collect_sync_status(session)
+
+    if last is None:
+        return await message.reply("ℹ️ Синхронизация ещё не запускалась")
+
+    duration = (last.finished_at - last.started_at).total_seconds() if last.finished_at else 0
+    lines = [
+        "🔄 <b>Синхронизация YClients</b>\n",
+        f"<b>Последний запуск:</b> {last.started_at:%d.%m %H:%M:%S} UTC, {duration:.1f} с",
+        f" Записей: {last.records_seen} (начислено {last.records_awarded}, "
+        f"скорректировано {last.records_adjusted}, пропущено {last.records_skipped})",
+        f" Страниц: {last.pages}, API {last.api_seconds:.1f} с, БД {last.db_seconds:.1f} с",
+        f" Курсор: {last.cursor:%d.%m %H:%M:%S}" if last.cursor else " Курсор: —",
+    ]
+    if last.errors or last.api_errors:
+        lines.append(f" ❗️ Ошибок: {last.errors + last.api_errors} — {html.escape(last.last_error or '')}")
+
+    for label, t in trends:
+        lines += [
+            f"\n<b>За {label}:</b> {t['runs']} запусков, ошибок {t['errors']}",
+            f" Записей: {t['seen']} ({t['seen_per_run']:.1f} за запуск), "
+            f"начислено {t['awarded']}, скорректировано {t['adjusted']}",
+            f" API: {t['api_per_page']:.2f} с/страница, БД: {t['db_per_record'] * 1000:.1f} мс/запись, "
+            f"самый долгий запуск {float(t['max_duration']):.1f} с",
+        ]
+    await message.reply("\n".join(lines), parse_mode="HTML")
+
+
+@admin_router.message(Command("profile"), F.from_user.id.in_(settings.ADMIN_IDS))
+async def cmd_profile(message: Message, command: CommandObject):
+    """
+    /profile sync 3          - следующие 3 запуска синхронизации
+    /profile updates 200 300 - следующие 200 апдейтов, не дольше 300 секунд
+    Отчёт cProfile придёт документом в этот чат.
+    """
+    args = (command.args or "").split()
+    usage = f"❗️ Формат: /profile &lt;{'|'.join(PROFILE_LIMITS)}&gt; [сколько] [секунд]"
+    try:
+        target = args[0]
+        count = int(args[1]) if len(args) > 1 else 1
+        seconds = int(args[2]) if len(args) > 2 else DEFAULT_PROFILE_SECONDS
+    except (IndexError, ValueError):
+        return await message.reply(usage)
+    try:
+        result = await request_profile(target, count, seconds, [message.chat.id])
+    except ValueError as e:
+        return await message.reply(f"❗️ {html.escape(str(e))}")
+    await message.reply(f"⏱ Профилирование {html.escape(target)}: {result}")
+
+
+@admin_router.message(Command("export"), F.from_user.id.in_(settings.ADMIN_IDS))
+async def cmd_export(message: Message, command: CommandObject):
+    """
+    /export                          - прошлый месяц, csv
+    /export 2026-09 parquet          - месяц
+    /export 2026-09-01 2026-09-15    - диапазон дат
+    Файл собирается в фоне, чтобы не держать обработку апдейта.
+    """
+    args = (command.args or "").split()
+    fmt = "csv"
+    if args and args[-1].lower() in EXPORT_FORMATS:
+        fmt = args.pop().lower()
+    try:
+        start, end = parse_period(args)
+    except ValueError:
+        return await message.reply("❗️ Формат: /export [2026-09 | 2026-09-01 2026-09-15] [csv|parquet]")
+
+    await message.reply(f"⏳ Готовлю выгрузку за {start} — {end} ({fmt})…")
+    task = asyncio.create_task(_send_export(message, start, end, fmt))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+async def _send_export(message: Message, start, end, fmt: str):
+    path = None
+    try:
+        path, total = await export_to_file(start, end, fmt)
+        suffix = ".csv.gz" if fmt == "csv" else ".parquet"
+        await message.answer_document(
+            FSInputFile(path, filename=f"ledger_{start}_{end}{suffix}"),
+            caption=f"📄 Журнал баллов за {start} — {end}: {total} строк",
+        )
+    except ImportError:
+        await message.answer("❗️ Для parquet на сервере не установлен pyarrow, используйте csv")
+    except Exception as e:
+        logger.exception("Ledger export failed: %s", e)
+        await message.answer("❗️ Не удалось подготовить выгрузку")
+    finally:
+        if path is not None:
+            path.unlink(missing_ok=True)
+
+
 # ─── 2) FSM для списания и начисления баллов ────────────────────────────────
 
 class WriteoffStates(StatesGroup):
@@ -75,19 +240,22 @@ async def callback_writeoff(query: CallbackQuery, state: FSMContext):
         )
         client = result.scalar_one_or_none()
 
+        if client and mode == "all":
+            # Если у нас есть order total>0, списываем не больше min(points, total), иначе всё
+            remove = min(client.points, total) if total > 0 else client.points
+            if remove:
+                await change_points(session, client, -remove, KIND_REDEEM)
+            await session.commit()
+            mark_written(query.from_user.id, client.telegram_user_id)
+
     if not client:
         return await query.answer("❗️ Клиент не найден", show_alert=True)
 
     if mode == "all":
-        # Если у нас есть order total>0, списываем не больше min(points, total), иначе всё
-        remove = min(client.points, total) if total > 0 else client.points
-        client.points -= remove
-        session.add(client)
-        await session.commit()
 
         to_pay = max(0, total - remove)
         await query.message.edit_text(
-            f"✅ Списано {remove} баллов у <b>{client.name}</b> ({phone}).\n" +
+            f"✅ Списано {remove} баллов у <b>{html.escape(client.name)}</b> ({phone}).\n" +
             f"📊 Осталось баллов: <b>{client.points}</b>\n" +
             (f"💰 Осталось к оплате: <b>{to_pay}</b>" if total > 0 else ""),
             parse_mode="HTML"
@@ -96,7 +264,7 @@ async def callback_writeoff(query: CallbackQuery, state: FSMContext):
     else:
         # custom: спрашиваем, сколько списать, и сохраняем в FSM: телефон + исходную сумму
         await query.message.answer(
-            f"Сколько баллов списать у <b>{client.name}</b> ({phone})? Введите число:",
+            f"Сколько баллов списать у <b>{html.escape(client.name)}</b> ({phone})? Введите число:",
             parse_mode="HTML"
         )
         await state.set_state(WriteoffStates.waiting_for_amount)
@@ -152,16 +320,16 @@ async def process_writeoff_amount(message: Message, state: FSMContext):
             return await message.reply(f"❗️ Нельзя списать больше, чем сумма заказа ({total})", reply_markup=kb)
 
         # списываем
-        client.points -= amount
-        session.add(client)
+        await change_points(session, client, -amount, KIND_REDEEM)
         await session.commit()
+        mark_written(message.from_user.id, client.telegram_user_id)
 
     # расчёт оставшейся к оплате суммы
     to_pay = max(0, total - amount)
 
     await message.reply(
         (
-            f"✅ Списано {amount} баллов у <b>{client.name}</b> ({phone}).\n"
+            f"✅ Списано {amount} баллов у <b>{html.escape(client.name)}</b> ({phone}).\n"
             f"📊 Осталось баллов: <b>{client.points}</b>\n"
             f"💰 Осталось к оплате: <b>{to_pay}</b>"
         ),
@@ -189,7 +357,7 @@ async def callback_add_points(query: CallbackQuery, state: FSMContext):
         return await query.answer("❗️ Клиент не найден", show_alert=True)
 
     await query.message.answer(
-        f"Сколько баллов начислить клиенту <b>{client.name}</b> ({phone})?\n"
+        f"Сколько баллов начислить клиенту <b>{html.escape(client.name)}</b> ({phone})?\n"
         "Введите положительное число:",
         parse_mode="HTML"
     )
@@ -234,12 +402,12 @@ async def process_add_amount(message: Message, state: FSMContext):
             await message.reply(f"❗️ Сумма баллов превышает максимально допустимое значение ({MAX_INT32}). Попробуйте начислить меньше.", reply_markup=kb)
             return
 
-        client.points = new_points
-        session.add(client)
+        await change_points(session, client, amount, KIND_CREDIT)
         await session.commit()
+        mark_written(message.from_user.id, client.telegram_user_id)
 
         await message.reply(
-            f"✅ Начислено <b>{amount}</b> баллов клиенту <b>{client.name}</b> ({phone})\n"
+            f"✅ Начислено <b>{amount}</b> баллов клиенту <b>{html.escape(client.name)}</b> ({phone})\n"
             f"📊 Новый баланс: <b>{client.points}</b>",
             parse_mode="HTML"
         )
@@ -262,9 +430,316 @@ async def cancel_action(query: CallbackQuery, state: FSMContext):
         " • XXXXXXXXXX  (добавлю +7)\n\n"
         "Команды:\n"
         " /help — подсказка\n"
+        " /find &lt;имя или часть телефона&gt; — поиск клиента\n"
+        " /history &lt;телефон&gt; — история операций клиента\n"
+        " /stats — статистика программы\n"
+        " /syncstatus — состояние синхронизации с YClients\n"
+        " /profile &lt;sync|updates&gt; [N] [сек] — профилирование следующих N запусков\n"
+        " /export [2026-09 | 2026-09-01 2026-09-15] [csv|parquet] — выгрузка журнала баллов\n"
+        "\nМассовое начисление и списание: пришлите файл CSV или XLSX с колонками "
+        "«телефон» и «баллы» (отрицательное число — списание), бот покажет предпросмотр.\n"
+    )
+    await query.message.edit_text(text, parse_mode="HTML")
+    await query.answer()
+
+
+# ─── Массовое начисление / списание из файла ────────────────────────────────
+
+class BulkStates(StatesGroup):
+    waiting_for_confirm = State()
+
+# Сколько отклонённых строк показывать в сообщении (остальные - файлом)
+BULK_REJECTED_SHOWN = 10
+
+
+@admin_router.message(F.document, F.from_user.id.in_(settings.ADMIN_IDS))
+async def handle_bulk_file(message: Message, state: FSMContext):
+    """
+    CSV/XLSX с колонками «телефон» и «баллы»: разбор, проверка и предпросмотр.
+    Изменения применяются только после подтверждения кнопкой.
+    """
+    document = message.document
+    filename = document.file_name or ""
+    if not filename.lower().endswith(BULK_FORMATS):
+        return await message.reply("❗️ Для массового начисления пришлите файл CSV или XLSX")
+    if document.file_size and document.file_size > BULK_MAX_FILE_SIZE:
+        return await message.reply(f"❗️ Файл больше {BULK_MAX_FILE_SIZE // 1024 // 1024} МБ")
+
+    buffer = await message.bot.download(document)
+    try:
+        # Разбор XLSX на тысячи строк заметно держит event loop - в поток
+        rows, rejected = await asyncio.to_thread(parse_bulk_file, filename, buffer.getvalue())
+    except ImportError:
+        return await message.reply("❗️ Для XLSX на сервере не установлен openpyxl, пришлите CSV")
+    except (ValueError, UnicodeDecodeError) as e:
+        return await message.reply(f"❗️ Не удалось разобрать файл: {html.escape(str(e))}")
+
+    credited = debited = 0
+    if rows:
+        async with read_session(message.from_user.id) as session:
+            preview = await preview_bulk(session, rows)
+        rows, credited, debited = preview.rows, preview.credited, preview.debited
+        rejected = sorted(rejected + preview.rejected)
+
+    text = (
+        f"📥 <b>{html.escape(filename)}</b>\n"
+        f"Будет изменено клиентов: <b>{len(rows)}</b>\n"
+        f"➕ Начислить: <b>{credited}</b> баллов\n"
+        f"➖ Списать: <b>{debited}</b> баллов\n"
+        f"❌ Отклонено строк: <b>{len(rejected)}</b>"
     )
+    text += _rejected_text(rejected)
+    if not rows:
+        await state.clear()
+        await message.reply(text + "\n\nПрименять нечего.", parse_mode="HTML")
+        return await _send_rejected(message, rejected)
+
+    kb = InlineKeyboardMarkup(inline_keyboard=[[
+        InlineKeyboardButton(text="✅ Применить", callback_data="bulk:apply"),
+        InlineKeyboardButton(text="◀️ Отмена", callback_data="cancel_action"),
+    ]])
+    await state.set_state(BulkStates.waiting_for_confirm)
+    await state.update_data(
+        bulk_rows=[list(r) for r in rows],
+        bulk_rejected=[list(r) for r in rejected],
+    )
+    await message.reply(text, reply_markup=kb, parse_mode="HTML")
+    await _send_rejected(message, rejected)
+
+
+@admin_router.callback_query(
+    F.data == "bulk:apply",
+    StateFilter(BulkStates.waiting_for_confirm),
+    F.from_user.id.in_(settings.ADMIN_IDS),
+)
+async def callback_bulk_apply(query: CallbackQuery, state: FSMContext):
+    data = await state.get_data()
+    await state.clear()
+    rows = [BulkRow(*r) for r in data.get("bulk_rows", [])]
+    rejected = [Rejected(*r) for r in data.get("bulk_rejected", [])]
+
+    # Все строки - одной транзакцией: либо применены все прошедшие проверку, либо ничего
+    try:
+        async with async_session() as session:
+            result, telegram_ids = await apply_bulk(session, rows)
+            await session.commit()
+    except Exception as e:
+        logger.exception("Bulk points change failed: %s", e)
+        await query.answer()
+        return await query.message.edit_text("❗️ Не удалось применить изменения, баллы не изменены")
+    mark_written(query.from_user.id, *telegram_ids)
+
+    # Балансы могли измениться после предпросмотра - эти строки тоже отклонены
+    late = result.rejected
+    rejected = sorted(rejected + late)
+    text = (
+        f"✅ Изменено клиентов: <b>{len(result.rows)}</b>\n"
+        f"➕ Начислено: <b>{result.credited}</b> баллов\n"
+        f"➖ Списано: <b>{result.debited}</b> баллов\n"
+        f"❌ Отклонено строк: <b>{len(rejected)}</b>"
+    )
+    if late:
+        text += f" (из них {len(late)} - изменились после предпросмотра)"
+    text += _rejected_text(rejected)
     await query.message.edit_text(text, parse_mode="HTML")
     await query.answer()
+    if late:
+        await _send_rejected(query.message, rejected)
+
+
+@admin_router.callback_query(F.data == "bulk:apply", F.from_user.id.in_(settings.ADMIN_IDS))
+async def callback_bulk_expired(query: CallbackQuery):
+    await query.answer("❗️ Предпросмотр устарел, пришлите файл ещё раз", show_alert=True)
+
+
+def _rejected_text(rejected) -> str:
+    if not rejected:
+        return ""
+    lines = [
+        f"• строка {r.line}: {html.escape(r.value)} — {html.escape(r.reason)}"
+        for r in rejected[:BULK_REJECTED_SHOWN]
+    ]
+    if len(rejected) > BULK_REJECTED_SHOWN:
+        lines.append(f"… и ещё {len(rejected) - BULK_REJECTED_SHOWN}, полный список - в файле")
+    return "\n\n" + "\n".join(lines)
+
+
+async def _send_rejected(message: Message, rejected):
+    """Полный список отклонённых строк, если он не поместился в сообщение"""
+    if len(rejected) <= BULK_REJECTED_SHOWN:
+        return
+    await message.answer_document(
+        BufferedInputFile(format_rejected(rejected).encode("utf-8-sig"), filename="rejected.csv"),
+        caption=f"❌ Отклонённые строки: {len(rejected)}",
+    )
+
+
+# ─── Поиск клиента по имени / части телефона ─────────────────────────────────
+
+# Лимит Telegram на callback_data - 64 байта
+CALLBACK_DATA_LIMIT = 64
+
+
+@admin_router.message(Command("find"), F.from_user.id.in_(settings.ADMIN_IDS))
+async def cmd_find(message: Message, command: CommandObject):
+    query = (command.args or "").strip()
+    if len(query) < MIN_QUERY_LENGTH:
+        return await message.reply(
+            f"❗️ Формат: /find &lt;имя или часть телефона&gt;, не короче {MIN_QUERY_LENGTH} символов"
+        )
+    text, kb = await _find_page(message.from_user.id, query, 0)
+    await message.reply(text, reply_markup=kb, parse_mode="HTML")
+
+
+@admin_router.callback_query(
+    F.data.startswith("find:"),
+    F.from_user.id.in_(settings.ADMIN_IDS),
+)
+async def callback_find_page(query: CallbackQuery):
+    """Листание результатов: find:<page>:<запрос>"""
+    _, page_str, search = query.data.split(":", 2)
+    text, kb = await _find_page(query.from_user.id, search, int(page_str))
+    await query.message.edit_text(text, reply_markup=kb, parse_mode="HTML")
+    await query.answer()
+
+
+@admin_router.callback_query(
+    F.data.startswith("lookup:"),
+    F.from_user.id.in_(settings.ADMIN_IDS),
+)
+async def callback_lookup(query: CallbackQuery):
+    """Выбор клиента из результатов поиска - та же карточка, что и по телефону"""
+    phone = query.data.split(":", 1)[1]
+    async with read_session(query.from_user.id) as session:
+        result = await session.execute(
+            select(Clients).where(Clients.phone_number == phone)
+        )
+        client = result.scalar_one_or_none()
+
+    if not client:
+        return await query.answer("❗️ Клиент не найден", show_alert=True)
+
+    text, kb = _client_card(client)
+    await query.message.answer(text, reply_markup=kb, parse_mode="HTML")
+    await query.answer()
+
+
+async def _find_page(admin_id: int, query: str, page: int):
+    async with read_session(admin_id) as session:
+        clients, has_next = await search_clients(session, query, page=page)
+
+    if not clients:
+        return f"🔎 По запросу <b>{html.escape(query)}</b> никого не нашлось.", None
+
+    rows = [
+        [InlineKeyboardButton(
+            text=f"{c.name} · {c.phone_number} · {c.points}",
+            callback_data=f"lookup:{c.phone_number}"
+        )]
+        for c in clients
+    ]
+    pager = []
+    if page > 0:
+        pager.append(InlineKeyboardButton(text="◀️", callback_data=_find_callback(page - 1, query)))
+    if has_next:
+        pager.append(InlineKeyboardButton(text="▶️", callback_data=_find_callback(page + 1, query)))
+    if pager:
+        rows.append(pager)
+
+    text = f"🔎 Клиенты по запросу <b>{html.escape(query)}</b> (стр. {page + 1}):"
+    return text, InlineKeyboardMarkup(inline_keyboard=rows)
+
+
+def _find_callback(page: int, query: str) -> str:
+    """callback_data для листания; длинный запрос обрезается по лимиту Telegram"""
+    prefix = f"find:{page}:"
+    room = CALLBACK_DATA_LIMIT - len(prefix.encode())
+    return prefix + query.encode()[:room].decode(errors="ignore")
+
+
+@admin_router.inline_query(F.from_user.id.in_(settings.ADMIN_IDS))
+async def inline_find(inline_query: InlineQuery):
+    """
+    Инлайн-поиск: @бот <имя или часть телефона>.
+    Выбранный результат отправляет телефон клиента, и бот отвечает карточкой.
+    """
+    query = inline_query.query.strip()
+    if len(query) < MIN_QUERY_LENGTH:
+        return await inline_query.answer([], cache_time=1, is_personal=True)
+
+    page = int(inline_query.offset or 0)
+    async with read_session(inline_query.from_user.id) as session:
+        clients, has_next = await search_clients(session, query, page=page)
+
+    results = [
+        InlineQueryResultArticle(
+            id=str(c.id),
+            title=c.name,
+            description=f"{c.phone_number} · баллов: {c.points}",
+            input_message_content=InputTextMessageContent(message_text=c.phone_number),
+        )
+        for c in clients
+    ]
+    await inline_query.answer(
+        results,
+        cache_time=5,
+        is_personal=True,
+        next_offset=str(page + 1) if has_next else "",
+    )
+
+
+# ─── История операций клиента ────────────────────────────────────────────────
+
+@admin_router.message(Command("history"), F.from_user.id.in_(settings.ADMIN_IDS))
+async def cmd_history(message: Message, command: CommandObject):
+    phone = normalize_phone(command.args or "")
+    if not phone:
+        return await message.reply("❗️ Формат: /history &lt;телефон клиента&gt;")
+
+    async with read_session(message.from_user.id) as session:
+        result = await session.execute(
+            select(Clients).where(Clients.phone_number == phone)
+        )
+        client = result.scalar_one_or_none()
+        if not client:
+            return await message.reply(f"⚠️ Клиент <b>{phone}</b> не найден.", parse_mode="HTML")
+        text, kb = await _history_message(session, client)
+    await message.reply(text, reply_markup=kb, parse_mode="HTML")
+
+
+@admin_router.callback_query(
+    F.data.startswith("hist:"),
+    F.from_user.id.in_(settings.ADMIN_IDS),
+)
+async def callback_history(query: CallbackQuery):
+    """
+    hist:<client_id>                    - первая страница (кнопка в карточке)
+    hist:<client_id>:<n|o>:<курсор>     - листание
+    """
+    parts = query.data.split(":")
+    client_id = int(parts[1])
+    direction, cursor = (parts[2], parts[3]) if len(parts) == 4 else (None, None)
+
+    async with read_session(query.from_user.id) as session:
+        client = await session.get(Clients, client_id)
+        if not client:
+            return await query.answer("❗️ Клиент не найден", show_alert=True)
+        text, kb = await _history_message(session, client, direction, cursor)
+
+    if cursor is None:
+        await query.message.answer(text, reply_markup=kb, parse_mode="HTML")
+    else:
+        await query.message.edit_text(text, reply_markup=kb, parse_mode="HTML")
+    await query.answer()
+
+
+async def _history_message(session, client: Clients, direction=None, cursor=None):
+    rows, has_newer, has_older = await history_page(session, client.id, direction, cursor)
+    header = f"📜 История <b>{html.escape(client.name)}</b> ({client.phone_number}), баланс <b>{client.points}</b>\n\n"
+    if not rows:
+        return header + "Операций пока нет.", None
+    kb = history_keyboard(f"hist:{client.id}", rows, has_newer, has_older)
+    return header + format_history(rows), kb
 
 
 # ─── 3) Общий хэндлер «телефон [+ сумма]» ────────────────────────────────────
@@ -295,8 +770,8 @@ async def handle_phone_and_amount(message: Message):
     raw, amount_str = m.group(1), m.group(2)
     phone = f"+7{raw}"
 
-    # получаем клиента
-    async with async_session() as session:
+    # получаем клиента (только чтение - можно с реплики)
+    async with read_session(message.from_user.id) as session:
         result = await session.execute(
             select(Clients).where(Clients.phone_number == phone)
         )
@@ -311,7 +786,15 @@ async def handle_phone_and_amount(message: Message):
             f"⚠️ Клиент <b>{phone}</b> не в программе лояльности.", parse_mode="HTML"
         )
 
-    name = client.name
+    text, kb = _client_card(client, amount_str)
+    await message.reply(text, reply_markup=kb, parse_mode="HTML")
+
+
+def _client_card(client: Clients, amount_str=None):
+    """Текст и кнопки карточки клиента (баланс + списание/начисление)"""
+    phone = client.phone_number
+    # Имя вставляется в сообщение с parse_mode=HTML
+    name = html.escape(client.name)
     pts = client.points
 
     # Кнопки «списать всё», «списать custom» и «начислить»
@@ -329,6 +812,10 @@ async def handle_phone_and_amount(message: Message):
          InlineKeyboardButton(
              text="➕ Начислить баллы",
              callback_data=f"add_points:{phone}"
+         ),
+         InlineKeyboardButton(
+             text="📜 История",
+             callback_data=f"hist:{client.id}"
          )
      ]])
 
@@ -344,5 +831,4 @@ async def handle_phone_and_amount(message: Message):
             f"После операции останется <b>{max(0, pts - total)}</b> баллов\n\n"
             "Выберите вариант списания или начислите баллы:"
         )
-
-    await message.reply(text, reply_markup=kb, parse_mode="HTML")
\ No newline at end of file
+    return text, kb
\ No newline at end of file
@@ -1,5 +1,6 @@
 # app/bot/handlers/handlers_client.py
 
+import html
 import re
 from aiogram import Router, F
 from aiogram.filters import Command
@@ -11,18 +12,21 @@ from aiogram.types import (
     ReplyKeyboardMarkup,
     KeyboardButton,
     Contact,
-    FSInputFile,
     ReplyKeyboardRemove
 )
 from aiogram.filters.state import StateFilter
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.fsm.context import FSMContext
 
+from sqlalchemy import update
 from sqlmodel import select
 from app.config import settings
-from app.db.models import Clients
-from app.db.session import async_session
-from app.api.yclients import YClientsAPI
+from app.db.models import ClientStats, Clients
+from app.db.session import async_session, read_session, mark_written
+from app.bot.services.stats import bump_daily_stats
+from app.bot.services.phones import normalize_phone
+from app.bot.services.media import answer_photo
+from app.bot.services.history import format_history, history_keyboard, history_page
 
 clients_router = Router()
 
@@ -41,7 +45,7 @@ class AuthStates(StatesGroup):
 # 1) /start спрашиваем контакт через кнопку
 @clients_router.message(Command("start"))
 async def cmd_start(message: Message, state: FSMContext):
-    async with async_session() as session:
+    async with read_session(message.from_user.id if message.from_user else None) as session:
         client = None
         if message.from_user:
             telegram_user_id = message.from_user.id
@@ -49,14 +53,22 @@ async def cmd_start(message: Message, state: FSMContext):
                 select(Clients).where(Clients.telegram_user_id == telegram_user_id)
             )
             client = result.scalar_one_or_none()
+        if client and client.is_chat_unreachable:
+            # Пользователь снова пишет боту - чат опять доступен
+            async with async_session() as write_session:
+                await write_session.execute(
+                    update(Clients).where(Clients.id == client.id).values(is_chat_unreachable=False)
+                )
+                await write_session.commit()
         if client:
             # Уже зарегистрирован - показываем доступные команды
             await message.answer(
-                f" <b>{client.name}</b>, рады видеть Вас в числе наших постоянных гостей!\n"
+                f" <b>{html.escape(client.name)}</b>, рады видеть Вас в числе наших постоянных гостей!\n"
                 f"Ваш номер <b>{client.phone_number}</b> успешно сохранён.\n\n"
                 "Вы стали участником программы лояльности <b>DOG STYLE</b> — теперь за каждое посещение вы будете получать бонусы и приятные привилегии.\n\n"
                 "Доступные команды:\n"
                 "/balance - Посмотреть баланс баллов\n"
+                "/history - История начислений и списаний\n"
                 "/reserve - Записаться на услугу\n"
                 "/contact - Связаться с нами\n\n"
                 "Если что-то понадобится — мы всегда рядом! ❤️🪄",
@@ -70,8 +82,9 @@ async def cmd_start(message: Message, state: FSMContext):
                 resize_keyboard=True,
                 one_time_keyboard=True,
             )
-            await message.answer_photo(
-                photo=FSInputFile("app/media/welcome.png"),
+            await answer_photo(
+                message,
+                "welcome",
                 caption="<b>Добро пожаловать в программу лояльности DOG STYLE! 💞</b>"
                         "Участвуйте и накапливайте бонусные баллы за каждое посещение.\n"
                         "Для регистрации и начала участия, пожалуйста, нажмите кнопку ниже, чтобы указать свой номер телефона.📲",
@@ -90,13 +103,8 @@ async def process_contact(message: Message, state: FSMContext):
     telegram_user_id = message.from_user.id  # сохраняем user_id
 
     # Нормализация
-    if phone.startswith("8") and len(phone) == 11:
-        phone = "+7" + phone[1:]
-    elif phone.startswith("7") and len(phone) == 11:
-        phone = "+" + phone
-    elif phone.startswith("+7") and len(phone) == 12:
-        pass
-    else:
+    phone = normalize_phone(phone)
+    if not phone:
         return await message.reply(
             "❗️ Похоже, ваш номер в нестандартном формате. "
             "Попробуйте ещё раз или обратитесь к администратору."
@@ -115,12 +123,19 @@ async def _register_or_find_client(phone: str, telegram_user_id: int, message: M
 
         if client:
             # Обновляем статус и сохраняем user_id
+            if client.telegram_user_id is None:
+                await bump_daily_stats(session, new_members=1)
             client.is_in_loyalty = True
             client.telegram_user_id = telegram_user_id
+            # Пользователь снова пишет боту - чат опять доступен
+            client.is_chat_unreachable = False
             session.add(client)
             await session.commit()
+            mark_written(telegram_user_id)
         else:
             # 2) Ищем по всем клиентам YClients постранично
+            # (httpx/tenacity импортируются только при первой такой регистрации)
+            from app.api.yclients import YClientsAPI
             api = YClientsAPI()  # должен использовать правильные заголовки
             found = None
             page = 1
@@ -128,22 +143,9 @@ async def _register_or_find_client(phone: str, telegram_user_id: int, message: M
 
             try:
                 while True:
-                    resp = await api.client.post(
-                        f"/company/{settings.COMPANY_ID}/clients/search",  # ✅ Правильный эндпоинт
-                        json={
-                            "page": page,
-                            "page_size": page_size,
-                            "fields": ["id", "phone", "name"],  # ✅ Обязательные поля
-                            "filters": [],  # ✅ Даже если фильтры не нужны
-                            "operation": "AND",  # ✅ Обязательный параметр
-                            "order_by": "name",
-                            "order_by_direction": "ASC"
-                        }
-                    )
-                    resp.raise_for_status()
-                    data = resp.json().get("data", [])
+                    data = await api.search_clients(page=page, page_size=page_size)
                     for yc in data:
-                        if yc.get("phone") == phone:
+                        if normalize_phone(yc.get("phone")) == phone:
                             found = yc
                             break
                     if found or len(data) < page_size:
@@ -171,13 +173,15 @@ async def _register_or_find_client(phone: str, telegram_user_id: int, message: M
             )
             client.id = None  
             session.add(client)
+            await bump_daily_stats(session, new_members=1)
             await session.commit()
+            mark_written(telegram_user_id)
 
     # 4) Сбрасываем FSM и показываем доступные команды
     await state.clear()
 
     await message.answer(
-        f" <b>{client.name}</b>, рады видеть Вас в числе наших постоянных гостей!\n"
+        f" <b>{html.escape(client.name)}</b>, рады видеть Вас в числе наших постоянных гостей!\n"
         f"Ваш номер <b>{client.phone_number}</b> успешно сохранён.\n"
         f"Вы стали участником программы лояльности <b>DOG STYLE</b> — теперь за каждое посещение вы будете получать бонусы и приятные привилегии.\n\n"
         f"Используйте доступные команды при помощи кнопки \"Меню\" слева снизу.\n"
@@ -189,29 +193,71 @@ async def _register_or_find_client(phone: str, telegram_user_id: int, message: M
 # 5) Баланс через команду
 @clients_router.message(Command("balance"))
 async def cmd_balance(message: Message):
-    async with async_session() as session:
-        telegram_user_id = message.from_user.id if message.from_user else None
+    telegram_user_id = message.from_user.id if message.from_user else None
+    async with read_session(telegram_user_id) as session:
         if not telegram_user_id:
             return await message.reply("❗️ Ошибка: не удалось определить пользователя. Если ошибка повторяется, рекомендуем написать /start, либо удалить историю чата бота и зарегистрироваться в нем снова. В случае дополнительных вопросов, обращайтесь к администратору.")
         result = await session.execute(
             select(Clients).where(Clients.telegram_user_id == telegram_user_id)
         )
         client = result.scalar_one_or_none()
+        stats = await session.get(ClientStats, client.id) if client else None
 
     if not client:
         return await message.reply("❗️ Ошибка: клиент не найден. Скорее всего, Вы не поделились контактом. Нажмите на кнопку \"Поделиться контактом\" внизу. Если ошибка повторяется, рекомендуем написать /start, либо удалить историю чата бота и зарегистрироваться в нем снова. В случае дополнительных вопросов, обращайтесь к администратору.")
 
-    await message.reply(
-        f"💳 Ваш баланс: <b>{client.points}</b> баллов",
-        parse_mode="HTML",
-    )
+    text = f"💳 Ваш баланс: <b>{client.points}</b> баллов"
+    if stats and stats.visits:
+        text += (
+            f"\n\n🐾 Визитов: <b>{stats.visits}</b> на сумму <b>{stats.spend}</b> ₽\n"
+            f"➕ Начислено всего: <b>{stats.points_earned}</b> баллов\n"
+            f"➖ Потрачено всего: <b>{stats.points_redeemed}</b> баллов"
+        )
+        if stats.last_visit_at:
+            text += f"\n📅 Последний визит: {stats.last_visit_at:%d.%m.%Y}"
+    await message.reply(text, parse_mode="HTML")
+
+# 5.1) История начислений и списаний
+@clients_router.message(Command("history"))
+async def cmd_history(message: Message):
+    text, kb = await _history_message(message.from_user.id if message.from_user else None)
+    await message.reply(text, reply_markup=kb, parse_mode="HTML")
+
+
+@clients_router.callback_query(F.data.startswith("myhist:"))
+async def callback_history(query: CallbackQuery):
+    """myhist:<n|o>:<курсор> - листание своей истории"""
+    _, direction, cursor = query.data.split(":")
+    text, kb = await _history_message(query.from_user.id, direction, cursor)
+    await query.message.edit_text(text, reply_markup=kb, parse_mode="HTML")
+    await query.answer()
+
+
+async def _history_message(telegram_user_id, direction=None, cursor=None):
+    if not telegram_user_id:
+        return "❗️ Ошибка: не удалось определить пользователя. Попробуйте написать /start.", None
+    # Клиент определяется по отправителю, а не по данным кнопки - чужую историю не открыть
+    async with read_session(telegram_user_id) as session:
+        result = await session.execute(
+            select(Clients).where(Clients.telegram_user_id == telegram_user_id)
+        )
+        client = result.scalar_one_or_none()
+        if not client:
+            return "❗️ Вы ещё не зарегистрированы. Напишите /start и поделитесь контактом.", None
+        rows, has_newer, has_older = await history_page(session, client.id, direction, cursor)
+
+    header = f"📜 История баллов, баланс: <b>{client.points}</b>\n\n"
+    if not rows:
+        return header + "Операций пока нет.", None
+    return header + format_history(rows), history_keyboard("myhist", rows, has_newer, has_older)
 
 # 6) Записаться через команду
 @clients_router.message(Command("reserve"))
 async def cmd_reserve(message: Message):
     # Отправляем картинку и текст с ссылкой
-    await message.answer_photo(
-        photo=FSInputFile("app/media/welcome.png"),
+    await answer_photo(
+        message,
+        "welcome",
         caption=f"📍Перейдите по ссылке, чтобы записаться:\n\n{settings.YCLIENTS_BOOK_URL}"
     )
 
@@ -0,0 +1,149 @@
+# app/bot/middlewares.py
+
+import asyncio
+import logging
+import time
+from collections import Counter, deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+from aiogram import BaseMiddleware
+from aiogram.types import CallbackQuery, Message, TelegramObject
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Лимиты по умолчанию: ключ -> (сколько апдейтов, за сколько секунд)
+DEFAULT_LIMITS: Dict[str, Tuple[int, float]] = {
+    "start": (3, 10),
+    "balance": (5, 10),
+    "history": (5, 10),
+    "contact": (2, 30),      # регистрация может запускать полный обход клиентов YClients
+    "default": (20, 10),
+}
+
+# Ключи, по которым параллельный дубль схлопывается в уже выполняющийся хендлер:
+# они дорогие (БД, YClients) и на повтор отвечают тем же. Свободный текст ("default")
+# и остальные ключи не схлопываются - два разных сообщения подряд не должны теряться
+COLLAPSE_KEYS = frozenset({"start", "balance", "history", "contact", "callback:myhist"})
+
+
+def parse_limits(raw: str) -> Dict[str, Tuple[int, float]]:
+    """
+    "start=3/10,balance=5/10" -> {"start": (3, 10.0), "balance": (5, 10.0)}
+    Некорректные элементы пропускаются.
+    """
+    limits: Dict[str, Tuple[int, float]] = {}
+    for item in raw.split(","):
+        key, _, value = item.strip().partition("=")
+        count, _, window = value.partition("/")
+        try:
+            limits[key.strip()] = (int(count), float(window))
+        except ValueError:
+            if item.strip():
+                logger.warning("Invalid throttle limit %r ignored", item)
+    return limits
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """
+    Ограничение частоты апдейтов от одного пользователя.
+
+    - Скользящее окно на пару (пользователь, ключ), ключ - команда
+      (/start, /balance, ...), "contact" для отправки контакта или
+      "callback:<префикс>" для кнопок.
+    - Для ключей COLLAPSE_KEYS, пока хендлер по паре (пользователь, ключ)
+      выполняется, такой же параллельный апдейт не запускает второй хендлер -
+      он дожидается уже выполняющегося и получает его результат (кнопке
+      сразу отправляется answer, чтобы не крутился индикатор загрузки).
+    - Отклонённые апдейты считаются в `rejected` по ключу и причине.
+    Администраторы не ограничиваются.
+    """
+
+    # После скольких пользователей чистить устаревшие окна
+    CLEANUP_THRESHOLD = 10_000
+
+    def __init__(self, limits: Optional[Dict[str, Tuple[int, float]]] = None):
+        self.limits = dict(DEFAULT_LIMITS)
+        self.limits.update(limits or {})
+        self._hits: Dict[Tuple[int, str], Deque[float]] = {}
+        self._inflight: Dict[Tuple[int, str], asyncio.Task] = {}
+        self.rejected: Counter = Counter()
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        user = getattr(event, "from_user", None)
+        if user is None or user.id in settings.ADMIN_IDS:
+            return await handler(event, data)
+
+        key = self._key(event)
+        slot = (user.id, key)
+
+        inflight = self._inflight.get(slot)
+        if inflight is not None:
+            self.rejected[(key, "collapsed")] += 1
+            logger.debug("Collapsed concurrent %s from user %s", key, user.id)
+            if isinstance(event, CallbackQuery):
+                await event.answer()
+            await asyncio.wait({inflight})
+            if inflight.cancelled() or inflight.exception() is not None:
+                # Ошибку уже обработал и залогировал исходный апдейт
+                return None
+            return inflight.result()
+
+        if not self._allow(slot, key):
+            self.rejected[(key, "rate")] += 1
+            logger.info("Throttled %s from user %s", key, user.id)
+            if isinstance(event, CallbackQuery):
+                await event.answer("⏳ Слишком часто, попробуйте чуть позже")
+            return None
+
+        if key not in COLLAPSE_KEYS:
+            return await handler(event, data)
+
+        task = asyncio.ensure_future(handler(event, data))
+        self._inflight[slot] = task
+        try:
+            return await task
+        finally:
+            self._inflight.pop(slot, None)
+
+    def _allow(self, slot: Tuple[int, str], key: str) -> bool:
+        limit, window = self.limits.get(key, self.limits["default"])
+        now = time.monotonic()
+        hits = self._hits.get(slot)
+        if hits is None:
+            if len(self._hits) > self.CLEANUP_THRESHOLD:
+                self._cleanup(now)
+            hits = self._hits[slot] = deque()
+        while hits and hits[0] <= now - window:
+            hits.popleft()
+        if len(hits) >= limit:
+            return False
+        hits.append(now)
+        return True
+
+    def _cleanup(self, now: float):
+        longest = max(window for _, window in self.limits.values())
+        for slot in [s for s, hits in self._hits.items() if not hits or hits[-1] <= now - longest]:
+            del self._hits[slot]
+
+    @staticmethod
+    def _key(event: TelegramObject) -> str:
+        if isinstance(event, Message):
+            if event.contact:
+                return "contact"
+            text = event.text or ""
+            if text.startswith("/"):
+                return text[1:].split(maxsplit=1)[0].split("@", 1)[0].lower() or "default"
+            return "default"
+        if isinstance(event, CallbackQuery):
+            return "callback:" + (event.data or "").split(":", 1)[0]
+        return "default"
+
+
+throttling = ThrottlingMiddleware(parse_limits(settings.THROTTLE_LIMITS))
@@ -0,0 +1,263 @@
+"""
+Массовое начисление и списание баллов по файлу администратора.
+
+Файл CSV или XLSX с колонками «телефон» и «баллы» (положительное число -
+начисление, отрицательное - списание). Разбор и проверка формата идут без
+БД, затем preview_bulk сверяет строки с клиентами, а apply_bulk применяет
+все изменения в одной транзакции: один UPDATE clients для всех строк,
+одна вставка в bonuslog по строке на операцию, одна запись в dailystats
+и один UPSERT сводок клиентов в clientstats.
+"""
+
+import csv
+import io
+from datetime import datetime, timezone
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from sqlalchemy import case, insert, update
+from sqlmodel import select
+
+from app.bot.services.phones import normalize_phone
+from app.bot.services.stats import bump_clients_stats, bump_daily_stats
+from app.db.models import BonusLog, Clients, KIND_CREDIT, KIND_REDEEM, NOTIFY_SKIPPED
+
+# Ограничения на загружаемый файл
+BULK_MAX_FILE_SIZE = 2 * 1024 * 1024
+BULK_MAX_ROWS = 5000
+# Верхняя граница баланса - колонка clients.points типа integer
+MAX_POINTS = 2_147_483_647
+
+BULK_FORMATS = (".csv", ".xlsx")
+
+PHONE_HEADERS = ("phone", "телефон", "номер")
+AMOUNT_HEADERS = ("amount", "points", "баллы", "сумма", "количество")
+
+
+class BulkRow(NamedTuple):
+    line: int
+    phone: str
+    amount: int
+
+
+class Rejected(NamedTuple):
+    line: int
+    value: str
+    reason: str
+
+
+class BulkPreview(NamedTuple):
+    rows: List[BulkRow]
+    rejected: List[Rejected]
+    credited: int
+    debited: int
+
+
+def parse_bulk_file(filename: str, data: bytes) -> Tuple[List[BulkRow], List[Rejected]]:
+    """
+    Строки файла с проверенными телефоном и суммой и отклонённые строки.
+    ValueError - файл не читается; ImportError - для XLSX не установлен openpyxl.
+    """
+    if filename.lower().endswith(".xlsx"):
+        table = _read_xlsx(data)
+    else:
+        table = _read_csv(data)
+
+    table = [(line, cells) for line, cells in table if any(c.strip() for c in cells)]
+    if not table:
+        raise ValueError("файл пуст")
+
+    # Заголовок необязателен: без него телефон - первая колонка, сумма - вторая
+    phone_idx, amount_idx = 0, 1
+    header = [c.strip().lower() for c in table[0][1]]
+    found_phone = _pick_index(header, PHONE_HEADERS)
+    found_amount = _pick_index(header, AMOUNT_HEADERS)
+    if found_phone is not None or found_amount is not None:
+        if found_phone is None or found_amount is None:
+            raise ValueError("в заголовке нужны колонки телефона и баллов")
+        phone_idx, amount_idx = found_phone, found_amount
+        table = table[1:]
+    if len(table) > BULK_MAX_ROWS:
+        raise ValueError(f"не больше {BULK_MAX_ROWS} строк в одном файле")
+
+    rows: List[BulkRow] = []
+    rejected: List[Rejected] = []
+    seen: Dict[str, int] = {}
+    for line, cells in table:
+        raw_phone = cells[phone_idx].strip() if phone_idx < len(cells) else ""
+        raw_amount = cells[amount_idx].strip() if amount_idx < len(cells) else ""
+        phone = normalize_phone(raw_phone)
+        if not phone:
+            rejected.append(Rejected(line, raw_phone, "неверный телефон"))
+            continue
+        amount = _parse_amount(raw_amount)
+        if amount is None:
+            rejected.append(Rejected(line, phone, f"неверное число баллов «{raw_amount}»"))
+            continue
+        if phone in seen:
+            # Две строки одного клиента - скорее ошибка в файле, чем намерение
+            rejected.append(Rejected(line, phone, f"телефон уже был в строке {seen[phone]}"))
+            continue
+        seen[phone] = line
+        rows.append(BulkRow(line, phone, amount))
+    return rows, rejected
+
+
+async def preview_bulk(session, rows: Sequence[BulkRow]) -> BulkPreview:
+    """
+    Сверка строк с клиентами одним запросом: неизвестные телефоны, клиенты
+    вне программы, списания больше баланса и переполнение баланса отклоняются.
+    """
+    preview, _ = await _check_rows(session, rows)
+    return preview
+
+
+async def _check_rows(session, rows: Sequence[BulkRow], lock: bool = False) -> Tuple[BulkPreview, Dict[str, Clients]]:
+    query = select(Clients).where(Clients.phone_number.in_([r.phone for r in rows]))
+    if lock:
+        query = query.with_for_update()
+    clients = {c.phone_number: c for c in (await session.execute(query)).scalars().all()}
+
+    valid: List[BulkRow] = []
+    rejected: List[Rejected] = []
+    credited = debited = 0
+    for row in rows:
+        client = clients.get(row.phone)
+        if client is None:
+            rejected.append(Rejected(row.line, row.phone, "клиент не найден"))
+        elif not client.is_in_loyalty:
+            rejected.append(Rejected(row.line, row.phone, "клиент не в программе лояльности"))
+        elif client.points + row.amount < 0:
+            rejected.append(Rejected(row.line, row.phone, f"у клиента всего {client.points} баллов"))
+        elif client.points + row.amount > MAX_POINTS:
+            rejected.append(Rejected(row.line, row.phone, "превышен максимальный баланс"))
+        else:
+            valid.append(row)
+            if row.amount > 0:
+                credited += row.amount
+            else:
+                debited -= row.amount
+    return BulkPreview(valid, rejected, credited, debited), clients
+
+
+async def apply_bulk(session, rows: Sequence[BulkRow]) -> Tuple[BulkPreview, List[int]]:
+    """
+    Применяет строки в текущей транзакции (commit - за вызывающим).
+    Строки проверяются заново под блокировкой: балансы могли измениться
+    после предпросмотра. Возвращает итог и telegram_user_id затронутых клиентов.
+    """
+    preview, clients = await _check_rows(session, rows, lock=True)
+    if not preview.rows:
+        return preview, []
+
+    ids = {r.phone: clients[r.phone].id for r in preview.rows}
+    telegram_ids = [
+        clients[r.phone].telegram_user_id for r in preview.rows
+        if clients[r.phone].telegram_user_id is not None
+    ]
+
+    # Один UPDATE на все строки: points = points + CASE id WHEN ... END
+    deltas = {ids[r.phone]: r.amount for r in preview.rows}
+    await session.execute(
+        update(Clients)
+        .where(Clients.id.in_(list(deltas)))
+        .values(points=Clients.points + case(deltas, value=Clients.id))
+        .execution_options(synchronize_session=False)
+    )
+
+    # Администратор сам сообщает клиентам об операции - уведомления не нужны
+    now = datetime.now(timezone.utc)
+    await session.execute(insert(BonusLog.__table__), [
+        {
+            "client_id": ids[r.phone],
+            "points": r.amount,
+            "awarded_at": now,
+            "kind": KIND_CREDIT if r.amount > 0 else KIND_REDEEM,
+            "is_telegram_notified": True,
+            "notify_state": NOTIFY_SKIPPED,
+        }
+        for r in preview.rows
+    ])
+
+    redemptions = sum(1 for r in preview.rows if r.amount < 0)
+    deltas_stats = {}
+    if preview.credited:
+        deltas_stats["points_credited"] = preview.credited
+    if redemptions:
+        deltas_stats.update(points_redeemed=preview.debited, redemptions_count=redemptions)
+    await bump_daily_stats(session, **deltas_stats)
+    await bump_clients_stats(session, [
+        {"client_id": ids[r.phone], "points_earned": r.amount} if r.amount > 0
+        else {"client_id": ids[r.phone], "points_redeemed": -r.amount}
+        for r in preview.rows
+    ])
+    return preview, telegram_ids
+
+
+def format_rejected(rejected: Sequence[Rejected]) -> str:
+    """Отклонённые строки файлом CSV: строка, значение, причина"""
+    out = io.StringIO()
+    writer = csv.writer(out, delimiter=";")
+    writer.writerow(("line", "value", "reason"))
+    writer.writerows(rejected)
+    return out.getvalue()
+
+
+def _read_csv(data: bytes) -> List[Tuple[int, List[str]]]:
+    try:
+        text = data.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        # Excel в русской локали сохраняет CSV в cp1251
+        text = data.decode("cp1251")
+    try:
+        dialect = csv.Sniffer().sniff(text[:4096], delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel
+    return [(i, row) for i, row in enumerate(csv.reader(io.StringIO(text), dialect=dialect), start=1)]
+
+
+def _read_xlsx(data: bytes) -> List[Tuple[int, List[str]]]:
+    # openpyxl нужен только для XLSX, импортируем по требованию
+    import openpyxl
+
+    try:
+        workbook = openpyxl.load_workbook(io.BytesIO(data), read_only=True, data_only=True)
+    except Exception as e:
+        raise ValueError(f"не удалось прочитать XLSX: {e}")
+    try:
+        sheet = workbook.worksheets[0]
+        return [
+            (i, [_cell_text(v) for v in row])
+            for i, row in enumerate(sheet.iter_rows(values_only=True), start=1)
+        ]
+    finally:
+        workbook.close()
+
+
+def _cell_text(value) -> str:
+    if value is None:
+        return ""
+    # Телефон в ячейке Excel часто хранится числом: 79990001122.0
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value)
+
+
+def _parse_amount(raw: str) -> Optional[int]:
+    # Разделители разрядов: пробел и неразрывный пробел из Excel
+    raw = raw.replace(" ", "").replace("\xa0", "")
+    if raw.endswith((".0", ",0")):
+        raw = raw[:-2]
+    try:
+        amount = int(raw)
+    except ValueError:
+        return None
+    if amount == 0 or abs(amount) > MAX_POINTS:
+        return None
+    return amount
+
+
+def _pick_index(header: List[str], candidates: Tuple[str, ...]) -> Optional[int]:
+    for candidate in candidates:
+        if candidate in header:
+            return header.index(candidate)
+    return None
@@ -0,0 +1,52 @@
+import logging
+from typing import Optional, Tuple
+
+from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramBadRequest,
+    TelegramForbiddenError,
+    TelegramRetryAfter,
+)
+from sqlalchemy import update
+
+from app.db.models import Clients
+
+logger = logging.getLogger(__name__)
+
+# Результат отправки сообщения клиенту
+SENT = "sent"
+RETRY = "retry"              # временная ошибка - повторить позже
+UNREACHABLE = "unreachable"  # бот заблокирован / аккаунт удалён / чат не найден
+FAILED = "failed"            # сообщение отклонено, повтор не поможет
+
+# Фрагменты описаний TelegramBadRequest, означающие, что чата больше нет
+_GONE_CHAT_ERRORS = ("chat not found", "user is deactivated", "peer_id_invalid")
+
+
+async def deliver(bot: Bot, chat_id: int, text: str, **kwargs) -> Tuple[str, Optional[float], Optional[str]]:
+    """
+    Отправка сообщения с классификацией ошибок Telegram.
+    Возвращает (результат, через сколько секунд можно повторить, текст ошибки).
+    """
+    try:
+        await bot.send_message(chat_id, text, **kwargs)
+        return SENT, None, None
+    except TelegramRetryAfter as e:
+        return RETRY, float(e.retry_after), str(e)
+    except TelegramForbiddenError as e:
+        return UNREACHABLE, None, str(e)
+    except TelegramBadRequest as e:
+        if any(fragment in e.message.lower() for fragment in _GONE_CHAT_ERRORS):
+            return UNREACHABLE, None, str(e)
+        return FAILED, None, str(e)
+    except Exception as e:
+        # Сеть, 5xx Telegram и т.п.
+        return RETRY, None, str(e)
+
+
+async def mark_unreachable(session, client_id: int):
+    """Флаг на клиенте: все рассылки пропускают его без попыток отправки"""
+    await session.execute(
+        update(Clients).where(Clients.id == client_id).values(is_chat_unreachable=True)
+    )
+    logger.info("Client %s marked as unreachable in Telegram", client_id)
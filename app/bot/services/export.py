@@ -0,0 +1,196 @@
+import asyncio
+import csv
+import gzip
+import io
+import tempfile
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import AsyncIterator, List, Optional, Sequence, Tuple
+
+from sqlmodel import select
+
+from app.db.models import BonusLog, Clients
+from app.db.session import replica_session
+
+# Сколько строк читать из серверного курсора за раз (и писать одним блоком)
+EXPORT_CHUNK_SIZE = 5000
+
+EXPORT_COLUMNS = (
+    "id", "awarded_at", "kind", "record_id", "points",
+    "client_id", "yclients_id", "client_name", "phone_number",
+)
+
+EXPORT_FORMATS = ("csv", "parquet")
+
+
+def parse_period(args: Sequence[str]) -> Tuple[date, date]:
+    """
+    Разбор периода выгрузки:
+      []                       - прошлый месяц
+      ["2026-09"]              - месяц целиком
+      ["2026-09-01", "2026-09-15"] - диапазон дат включительно
+    """
+    if not args:
+        first_this_month = date.today().replace(day=1)
+        end = first_this_month - timedelta(days=1)
+        return end.replace(day=1), end
+    if len(args) == 1:
+        start = datetime.strptime(args[0], "%Y-%m").date()
+        return start, _month_end(start)
+    start = date.fromisoformat(args[0])
+    end = date.fromisoformat(args[1])
+    if end < start:
+        raise ValueError("end before start")
+    return start, end
+
+
+def parse_period_bounds(start: Optional[str], end: Optional[str]) -> Tuple[date, date]:
+    """
+    Период из отдельных границ (параметры start и end в /admin/export):
+      start=2026-09              - месяц целиком (или до end)
+      start=2026-09-01           - с этой даты по сегодня (или до end)
+      end=2026-09-15             - с начала месяца end по end включительно
+      без параметров             - прошлый месяц
+    ValueError - граница не разобрана или end раньше start.
+    """
+    if not start and not end:
+        return parse_period([])
+    end_date = date.fromisoformat(end) if end else None
+    if start and len(start) == len("YYYY-MM"):
+        start_date = datetime.strptime(start, "%Y-%m").date()
+        default_end = _month_end(start_date)
+    elif start:
+        start_date = date.fromisoformat(start)
+        default_end = date.today()
+    else:
+        start_date = end_date.replace(day=1)
+    end_date = end_date or default_end
+    if end_date < start_date:
+        raise ValueError("end before start")
+    return start_date, end_date
+
+
+def _month_end(month_start: date) -> date:
+    next_month = (month_start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return next_month - timedelta(days=1)
+
+
+def _ledger_query(start: date, end: date):
+    # awarded_at хранится как наивное UTC-время, конец периода включительно
+    return (
+        select(
+            BonusLog.id,
+            BonusLog.awarded_at,
+            BonusLog.kind,
+            BonusLog.record_id,
+            BonusLog.points,
+            BonusLog.client_id,
+            Clients.yclients_id,
+            Clients.name,
+            Clients.phone_number,
+        )
+        .join(Clients, BonusLog.client_id == Clients.id)
+        .where(
+            BonusLog.awarded_at >= datetime.combine(start, datetime.min.time()),
+            BonusLog.awarded_at < datetime.combine(end + timedelta(days=1), datetime.min.time()),
+        )
+        .order_by(BonusLog.awarded_at, BonusLog.id)
+    )
+
+
+async def iter_ledger_chunks(
+    start: date,
+    end: date,
+    chunk_size: int = EXPORT_CHUNK_SIZE
+) -> AsyncIterator[List[tuple]]:
+    """
+    Журнал баллов за период блоками по `chunk_size` строк.
+    session.stream() открывает серверный курсор, поэтому в памяти
+    одновременно находится не больше одного блока.
+    """
+    async with replica_session() as session:
+        result = await session.stream(
+            _ledger_query(start, end).execution_options(yield_per=chunk_size)
+        )
+        async for partition in result.partitions(chunk_size):
+            yield [tuple(row) for row in partition]
+
+
+async def iter_csv(start: date, end: date) -> AsyncIterator[bytes]:
+    """CSV журнала по блокам - для потоковой отдачи по HTTP"""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(EXPORT_COLUMNS)
+    yield buf.getvalue().encode("utf-8")
+    async for rows in iter_ledger_chunks(start, end):
+        buf.seek(0)
+        buf.truncate()
+        writer.writerows(rows)
+        yield buf.getvalue().encode("utf-8")
+
+
+async def export_to_file(start: date, end: date, fmt: str = "csv") -> Tuple[Path, int]:
+    """
+    Пишет журнал за период во временный файл (csv.gz или parquet) и
+    возвращает путь и число строк. Удалить файл - забота вызывающего.
+    Запись на диск выполняется в потоке, чтобы не блокировать event loop.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"unknown export format: {fmt}")
+
+    suffix = ".csv.gz" if fmt == "csv" else ".parquet"
+    tmp = tempfile.NamedTemporaryFile(prefix=f"ledger_{start}_{end}_", suffix=suffix, delete=False)
+    tmp.close()
+    path = Path(tmp.name)
+
+    try:
+        if fmt == "csv":
+            total = await _write_csv(path, start, end)
+        else:
+            total = await _write_parquet(path, start, end)
+    except Exception:
+        path.unlink(missing_ok=True)
+        raise
+    return path, total
+
+
+async def _write_csv(path: Path, start: date, end: date) -> int:
+    total = 0
+    with gzip.open(path, "wt", encoding="utf-8", newline="") as fh:
+        writer = csv.writer(fh)
+        writer.writerow(EXPORT_COLUMNS)
+        async for rows in iter_ledger_chunks(start, end):
+            await asyncio.to_thread(writer.writerows, rows)
+            total += len(rows)
+    return total
+
+
+async def _write_parquet(path: Path, start: date, end: date) -> int:
+    # pyarrow - необязательная зависимость, нужна только для parquet
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("id", pa.int64()),
+        ("awarded_at", pa.timestamp("us")),
+        ("kind", pa.string()),
+        ("record_id", pa.int64()),
+        ("points", pa.int64()),
+        ("client_id", pa.int64()),
+        ("yclients_id", pa.int64()),
+        ("client_name", pa.string()),
+        ("phone_number", pa.string()),
+    ])
+    total = 0
+    writer: Optional["pq.ParquetWriter"] = None
+    try:
+        writer = pq.ParquetWriter(path, schema, compression="zstd")
+        async for rows in iter_ledger_chunks(start, end):
+            # Каждый блок - отдельная row group, память не растёт с размером выгрузки
+            batch = pa.Table.from_pylist([dict(zip(EXPORT_COLUMNS, row)) for row in rows], schema=schema)
+            await asyncio.to_thread(writer.write_table, batch)
+            total += len(rows)
+    finally:
+        if writer is not None:
+            writer.close()
+    return total
@@ -0,0 +1,112 @@
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+
+from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+from sqlalchemy import tuple_
+from sqlmodel import select
+
+from app.db.models import (
+    BonusLog,
+    KIND_ADJUST,
+    KIND_AWARD,
+    KIND_CREDIT,
+    KIND_EXPIRE,
+    KIND_REDEEM,
+)
+
+# Сколько операций показывать на странице /history
+HISTORY_PAGE_SIZE = 10
+
+# Направление листания от строки-курсора
+OLDER = "o"
+NEWER = "n"
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+
+KIND_LABELS = {
+    KIND_AWARD: "визит",
+    KIND_CREDIT: "начисление",
+    KIND_REDEEM: "списание",
+    KIND_EXPIRE: "сгорание",
+    KIND_ADJUST: "корректировка",
+}
+
+
+def encode_cursor(row: BonusLog) -> str:
+    """Курсор строки для кнопки: <awarded_at в микросекундах от эпохи>_<id>"""
+    awarded_at = row.awarded_at
+    if awarded_at.tzinfo is None:
+        # SQLite возвращает наивное время, в БД оно всегда UTC
+        awarded_at = awarded_at.replace(tzinfo=timezone.utc)
+    return f"{(awarded_at - _EPOCH) // _MICROSECOND}_{row.id}"
+
+
+def decode_cursor(cursor: str) -> Optional[Tuple[datetime, int]]:
+    """(awarded_at, id) из курсора; None - курсор не разобран (например, кнопка старого формата)"""
+    micros, _, row_id = cursor.partition("_")
+    try:
+        return _EPOCH + int(micros) * _MICROSECOND, int(row_id)
+    except ValueError:
+        return None
+
+
+async def history_page(
+    session,
+    client_id: int,
+    direction: Optional[str] = None,
+    cursor: Optional[str] = None,
+    page_size: int = HISTORY_PAGE_SIZE
+) -> Tuple[List[BonusLog], bool, bool]:
+    """
+    Страница журнала клиента от новых к старым.
+    Keyset-пагинация по (client_id, awarded_at, id): курсор - ключ крайней строки
+    предыдущей страницы, поэтому глубокие страницы стоят столько же, сколько первая
+    (индекс ix_bonuslog_client_id_awarded_at_id, без OFFSET). awarded_at в курсоре
+    ограничивает поиск нужными месячными секциями bonuslog.
+    Возвращает строки, есть ли более новые и есть ли более старые операции.
+    """
+    pivot = decode_cursor(cursor) if cursor is not None else None
+
+    key = tuple_(BonusLog.awarded_at, BonusLog.id)
+    stmt = select(BonusLog).where(BonusLog.client_id == client_id)
+
+    if pivot is not None and direction == NEWER:
+        result = await session.execute(
+            stmt.where(key > tuple_(*pivot), BonusLog.awarded_at >= pivot[0])
+            .order_by(BonusLog.awarded_at, BonusLog.id)
+            .limit(page_size + 1)
+        )
+        rows = list(result.scalars().all())
+        if len(rows) <= page_size:
+            # Дошли до самых новых - это и есть первая страница
+            return await history_page(session, client_id, page_size=page_size)
+        return rows[:page_size][::-1], True, True
+
+    if pivot is not None:
+        # Отдельное условие на awarded_at нужно для отсечения секций: сравнение
+        # кортежей планировщик Postgres для этого не использует
+        stmt = stmt.where(key < tuple_(*pivot), BonusLog.awarded_at <= pivot[0])
+    result = await session.execute(
+        stmt.order_by(BonusLog.awarded_at.desc(), BonusLog.id.desc()).limit(page_size + 1)
+    )
+    rows = list(result.scalars().all())
+    return rows[:page_size], pivot is not None, len(rows) > page_size
+
+
+def format_history(rows: List[BonusLog]) -> str:
+    """Строки вида «19.10.2026  +150  визит»"""
+    return "\n".join(
+        f"{row.awarded_at:%d.%m.%Y}  <b>{row.points:+d}</b>  {KIND_LABELS.get(row.kind, row.kind)}"
+        for row in rows
+    )
+
+
+def history_keyboard(prefix: str, rows: List[BonusLog], has_newer: bool, has_older: bool):
+    """Кнопки листания: <prefix>:n:<курсор первой строки> и <prefix>:o:<курсор последней>"""
+    buttons = []
+    if has_newer:
+        buttons.append(InlineKeyboardButton(text="◀️ Новее", callback_data=f"{prefix}:{NEWER}:{encode_cursor(rows[0])}"))
+    if has_older:
+        buttons.append(InlineKeyboardButton(text="Старше ▶️", callback_data=f"{prefix}:{OLDER}:{encode_cursor(rows[-1])}"))
+    return InlineKeyboardMarkup(inline_keyboard=[buttons]) if buttons else None
@@ -1,9 +1,23 @@
 from datetime import datetime, timezone
-from app.db.models import BonusLog, Clients
+from sqlalchemy import text
+from app.db.models import (
+    BonusLog,
+    Clients,
+    KIND_ADJUST,
+    KIND_CREDIT,
+    KIND_REDEEM,
+    NOTIFY_PENDING,
+    NOTIFY_SKIPPED,
+)
+from app.bot.services.stats import bump_client_stats, bump_daily_stats
 
-async def award_points(session, client: Clients, record_id: int, points: int):
+# Канал Postgres NOTIFY о новых начислениях (слушает app/tasks/bonus_listener.py)
+BONUS_CHANNEL = "bonus_awarded"
+
+async def award_points(session, client: Clients, record_id: int, points: int, amount: int = 0):
     """
-    Начисление баллов клиенту и логирование операции, выделено в отдельный метод
+    Начисление баллов клиенту и логирование операции, выделено в отдельный метод.
+    amount - оплаченная сумма записи, идёт в сводку клиента (clientstats.spend)
     """
     # Обновляем баланс
     client.points += points
@@ -11,9 +25,80 @@ async def award_points(session, client: Clients, record_id: int, points: int):
 
     # Явно используем наивное время для вставки в TIMESTAMP WITHOUT TIME ZONE
     naive_now = datetime.now(timezone.utc).replace(tzinfo=None)
+    # Клиенту без Telegram или с недоступным чатом уведомлять некого,
+    # о визите без баллов (дешевле 100 ₽) - не о чем
+    reachable = points > 0 and client.telegram_user_id is not None and not client.is_chat_unreachable
     session.add(BonusLog(
         record_id=record_id,
         client_id=client.id,
         points=points,
-        awarded_at=naive_now
+        awarded_at=naive_now,
+        is_telegram_notified=not reachable,
+        notify_state=NOTIFY_PENDING if reachable else NOTIFY_SKIPPED
+    ))
+    await bump_daily_stats(session, points_awarded=points, awards_count=1)
+    # Визитом считается только оплаченная запись
+    await bump_client_stats(
+        session, client.id, last_visit_at=datetime.now(timezone.utc) if amount > 0 else None,
+        visits=int(amount > 0), spend=amount, points_earned=points
+    )
+    # NOTIFY доставляется слушателям только после COMMIT этой транзакции.
+    # В SQLite слушателя нет - уведомления отправляет периодический опрос
+    if session.bind.dialect.name == "postgresql":
+        await session.execute(
+            text("SELECT pg_notify(:channel, :payload)"),
+            {"channel": BONUS_CHANNEL, "payload": str(client.id)}
+        )
+
+
+async def change_points(session, client: Clients, points: int, kind: str):
+    """
+    Ручное изменение баланса администратором (kind = credit или redeem,
+    points со знаком) - так же, как и начисления за визиты, через журнал bonuslog
+    """
+    client.points += points
+    session.add(client)
+
+    naive_now = datetime.now(timezone.utc).replace(tzinfo=None)
+    # Администратор сам сообщает клиенту об операции - уведомление не нужно
+    session.add(BonusLog(
+        client_id=client.id,
+        points=points,
+        awarded_at=naive_now,
+        kind=kind,
+        is_telegram_notified=True,
+        notify_state=NOTIFY_SKIPPED
+    ))
+    if kind == KIND_CREDIT:
+        await bump_daily_stats(session, points_credited=points)
+        await bump_client_stats(session, client.id, points_earned=points)
+    elif kind == KIND_REDEEM:
+        await bump_daily_stats(session, points_redeemed=-points, redemptions_count=1)
+        await bump_client_stats(session, client.id, points_redeemed=-points)
+
+
+async def adjust_record_points(session, client: Clients, record_id: int, points: int) -> int:
+    """
+    Компенсирующая корректировка начисления за запись, изменённую в YClients
+    (возврат, снятие оплаты, другая стоимость услуг). Баланс не уходит в минус,
+    если баллы уже потрачены. Возвращает фактически применённую сумму.
+    """
+    applied = max(points, -client.points)
+    if applied == 0:
+        return 0
+    client.points += applied
+    session.add(client)
+
+    naive_now = datetime.now(timezone.utc).replace(tzinfo=None)
+    session.add(BonusLog(
+        record_id=record_id,
+        client_id=client.id,
+        points=applied,
+        awarded_at=naive_now,
+        kind=KIND_ADJUST,
+        is_telegram_notified=True,
+        notify_state=NOTIFY_SKIPPED
     ))
+    await bump_daily_stats(session, points_awarded=applied)
+    await bump_client_stats(session, client.id, points_earned=applied)
+    return applied
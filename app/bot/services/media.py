@@ -0,0 +1,72 @@
+import logging
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import FSInputFile, Message
+
+from app.config import BASE_DIR
+from app.db.models import MediaFile
+from app.db.session import async_session, dialect_insert
+
+logger = logging.getLogger(__name__)
+
+# Реестр медиафайлов бота: ключ -> файл на диске
+MEDIA_FILES = {
+    "welcome": BASE_DIR / "app" / "media" / "welcome.png",
+    "register": BASE_DIR / "app" / "media" / "register.png",
+}
+
+# Кэш file_id в памяти процесса, чтобы не ходить в БД на каждую отправку
+_file_ids: Dict[str, str] = {}
+
+
+async def answer_photo(message: Message, key: str, **kwargs) -> Message:
+    """
+    Отправляет картинку из реестра. Файл загружается в Telegram один раз,
+    дальше отправляется по сохранённому file_id. Если Telegram отклонил
+    file_id (например, после смены бота), файл загружается заново.
+    """
+    file_id = await _get_file_id(key)
+    if file_id:
+        try:
+            return await message.answer_photo(photo=file_id, **kwargs)
+        except TelegramBadRequest as e:
+            logger.warning("Cached file_id for media %r rejected, re-uploading: %s", key, e)
+            _file_ids.pop(key, None)
+
+    sent = await message.answer_photo(photo=FSInputFile(MEDIA_FILES[key]), **kwargs)
+    if sent.photo:
+        # Самый крупный размер - последний в списке
+        await _save_file_id(key, sent.photo[-1].file_id)
+    return sent
+
+
+async def _get_file_id(key: str) -> Optional[str]:
+    if key in _file_ids:
+        return _file_ids[key]
+    async with async_session() as session:
+        media = await session.get(MediaFile, key)
+    if media:
+        _file_ids[key] = media.file_id
+        return media.file_id
+    return None
+
+
+async def _save_file_id(key: str, file_id: str):
+    _file_ids[key] = file_id
+    try:
+        async with async_session() as session:
+            table = MediaFile.__table__
+            stmt = dialect_insert(session, table).values(
+                key=key, file_id=file_id, updated_at=datetime.now(timezone.utc)
+            )
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[table.c.key],
+                set_={"file_id": stmt.excluded.file_id, "updated_at": stmt.excluded.updated_at},
+            )
+            await session.execute(stmt)
+            await session.commit()
+    except Exception as e:
+        # Не критично: в худшем случае файл загрузится ещё раз
+        logger.exception("Failed to persist file_id for media %r: %s", key, e)
@@ -0,0 +1,20 @@
+import re
+from typing import Optional
+
+_NON_DIGITS = re.compile(r"\D")
+
+
+def normalize_phone(raw: Optional[str]) -> Optional[str]:
+    """
+    Приводит номер к формату +7XXXXXXXXXX.
+    Понимает 8XXXXXXXXXX, 7XXXXXXXXXX, +7XXXXXXXXXX и XXXXXXXXXX,
+    в том числе с пробелами, скобками и дефисами. Иначе - None.
+    """
+    if not raw:
+        return None
+    digits = _NON_DIGITS.sub("", raw)
+    if len(digits) == 11 and digits[0] in "78":
+        return "+7" + digits[1:]
+    if len(digits) == 10:
+        return "+7" + digits
+    return None
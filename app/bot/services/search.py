@@ -0,0 +1,106 @@
+import difflib
+import re
+from typing import List, Optional, Tuple
+
+from sqlalchemy import func, or_
+from sqlmodel import select
+
+from app.bot.services.phones import normalize_phone
+from app.db.models import Clients
+
+# Сколько клиентов показывать на странице поиска
+SEARCH_PAGE_SIZE = 8
+# Минимальная длина запроса: триграммный индекс работает с 3 символов
+MIN_QUERY_LENGTH = 3
+# Порог pg_trgm similarity для нечёткого совпадения имени
+NAME_SIMILARITY = 0.3
+
+_NON_DIGITS = re.compile(r"\D")
+# Запрос похож на телефон: цифры и обычные разделители
+_PHONE_LIKE = re.compile(r"[\d\s()+-]+")
+
+
+async def search_clients(
+    session,
+    query: str,
+    page: int = 0,
+    page_size: int = SEARCH_PAGE_SIZE
+) -> Tuple[List[Clients], bool]:
+    """
+    Поиск клиентов по части телефона или имени (с опечатками).
+    Возвращает страницу клиентов и признак наличия следующей страницы.
+    В Postgres работает по GIN-индексам pg_trgm, в SQLite - перебором в процессе.
+    """
+    query = query.strip()
+    digits = _NON_DIGITS.sub("", query)
+    by_phone = bool(_PHONE_LIKE.fullmatch(query)) and len(digits) >= MIN_QUERY_LENGTH
+    digits, prefix = _phone_needles(digits) if by_phone else (None, None)
+
+    if session.bind.dialect.name == "postgresql":
+        clients = await _search_pg(session, query, digits, prefix, page, page_size)
+    else:
+        clients = await _search_in_process(session, query, digits, prefix, page, page_size)
+    return clients[:page_size], len(clients) > page_size
+
+
+def _phone_needles(digits: str) -> Tuple[str, Optional[str]]:
+    """
+    Подстрока для поиска по телефону и, для номера в местном виде 8XXX...,
+    начало номера +7XXX..., с которым он совпадает (телефоны хранятся как +7...).
+    """
+    full = normalize_phone(digits) if len(digits) == 11 else None
+    if full:
+        return full[1:], None
+    if digits.startswith("8"):
+        return digits, "+7" + digits[1:]
+    return digits, None
+
+
+async def _search_pg(session, query: str, digits, prefix, page: int, page_size: int) -> List[Clients]:
+    if digits:
+        # LIKE '%1234%' и LIKE '+7123%' используют триграммный индекс по phone_number
+        condition = Clients.phone_number.contains(digits)
+        if prefix:
+            condition = or_(condition, Clients.phone_number.startswith(prefix))
+        stmt = (
+            select(Clients)
+            .where(condition)
+            .order_by(Clients.phone_number)
+        )
+    else:
+        similarity = func.similarity(Clients.name, query)
+        stmt = (
+            select(Clients)
+            .where(or_(
+                Clients.name.icontains(query, autoescape=True),
+                Clients.name.op("%")(query),
+            ))
+            .order_by(similarity.desc(), Clients.name)
+        )
+    # Берём на одну строку больше, чтобы понять, есть ли следующая страница
+    result = await session.execute(stmt.offset(page * page_size).limit(page_size + 1))
+    return list(result.scalars().all())
+
+
+async def _search_in_process(session, query: str, digits, prefix, page: int, page_size: int) -> List[Clients]:
+    """Запасной вариант без pg_trgm (SQLite): ранжирование difflib в памяти"""
+    result = await session.execute(select(Clients))
+    candidates = result.scalars().all()
+
+    if digits:
+        matched = sorted(
+            (c for c in candidates if digits in c.phone_number or (prefix and c.phone_number.startswith(prefix))),
+            key=lambda c: c.phone_number,
+        )
+    else:
+        needle = query.lower()
+        scored = []
+        for client in candidates:
+            name = client.name.lower()
+            score = 1.0 if needle in name else difflib.SequenceMatcher(None, needle, name).ratio()
+            if score >= NAME_SIMILARITY:
+                scored.append((-score, client.name, client))
+        matched = [client for _, _, client in sorted(scored, key=lambda item: item[:2])]
+
+    start = page * page_size
+    return matched[start:start + page_size + 1]
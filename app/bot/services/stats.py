@@ -0,0 +1,153 @@
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlmodel import select
+
+from app.db.models import ClientStats, Clients, DailyStats, SyncRun
+from app.db.session import dialect_insert
+
+# Сколько клиентов показывать в топе /stats
+TOP_CLIENTS_LIMIT = 5
+
+# Счётчики clientstats, которые прибавляются при UPSERT
+CLIENT_STATS_COUNTERS = ("visits", "spend", "points_earned", "points_redeemed")
+
+# Окна сравнения для /syncstatus: подпись -> длительность
+SYNC_TREND_WINDOWS = (
+    ("24 ч", timedelta(days=1)),
+    ("7 дней", timedelta(days=7)),
+    ("30 дней", timedelta(days=30)),
+)
+
+
+async def bump_daily_stats(session, **deltas: int):
+    """
+    Инкрементально обновляет сводку за сегодня (UPSERT одной строки).
+    Вызывается в той же транзакции, что и изменение баллов, поэтому
+    сводка всегда согласована с балансами.
+    """
+    if not deltas:
+        return
+    table = DailyStats.__table__
+    today = datetime.now(timezone.utc).date()
+    stmt = dialect_insert(session, table).values(day=today, **deltas)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.day],
+        set_={name: table.c[name] + stmt.excluded[name] for name in deltas},
+    )
+    await session.execute(stmt)
+
+
+async def bump_client_stats(session, client_id: int, last_visit_at: Optional[datetime] = None, **deltas: int):
+    """Инкремент сводки одного клиента в текущей транзакции (см. bump_clients_stats)"""
+    deltas = {name: value for name, value in deltas.items() if value}
+    if not deltas and last_visit_at is None:
+        return
+    await bump_clients_stats(session, [dict(client_id=client_id, last_visit_at=last_visit_at, **deltas)])
+
+
+async def bump_clients_stats(session, rows: List[Dict]):
+    """
+    UPSERT сводок нескольких клиентов одним запросом: счётчики
+    CLIENT_STATS_COUNTERS прибавляются, last_visit_at заменяется, если задан.
+    Клиенты в `rows` не должны повторяться.
+    """
+    if not rows:
+        return
+    table = ClientStats.__table__
+    values = [
+        {
+            "client_id": row["client_id"],
+            "last_visit_at": row.get("last_visit_at"),
+            **{name: row.get(name, 0) for name in CLIENT_STATS_COUNTERS},
+        }
+        for row in rows
+    ]
+    stmt = dialect_insert(session, table).values(values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.client_id],
+        set_={
+            **{name: table.c[name] + stmt.excluded[name] for name in CLIENT_STATS_COUNTERS},
+            "last_visit_at": func.coalesce(stmt.excluded.last_visit_at, table.c.last_visit_at),
+        },
+    )
+    await session.execute(stmt)
+
+
+async def collect_stats(session, days: int = 30) -> Tuple[dict, dict, int, List[Clients]]:
+    """
+    Данные для /stats: сегодня, сумма за `days` дней, число участников и топ клиентов.
+    Читаются только сводные строки и индекс по clients.points - время ответа
+    не зависит от длины истории bonuslog.
+    """
+    today = datetime.now(timezone.utc).date()
+    columns = [c for c in DailyStats.__table__.c if c.name != "day"]
+
+    result = await session.execute(
+        select(
+            *[func.coalesce(func.sum(c).filter(DailyStats.day == today), 0).label(c.name) for c in columns],
+            *[func.coalesce(func.sum(c), 0).label(f"period_{c.name}") for c in columns],
+        ).where(DailyStats.day > today - timedelta(days=days))
+    )
+    row = result.one()._mapping
+    today_stats = {c.name: row[c.name] for c in columns}
+    period_stats = {c.name: row[f"period_{c.name}"] for c in columns}
+
+    members = (await session.execute(
+        select(func.count()).select_from(Clients).where(
+            Clients.is_in_loyalty == True,
+            Clients.telegram_user_id.is_not(None),
+        )
+    )).scalar_one()
+
+    top = (await session.execute(
+        select(Clients).order_by(Clients.points.desc()).limit(TOP_CLIENTS_LIMIT)
+    )).scalars().all()
+
+    return today_stats, period_stats, members, top
+
+
+async def collect_sync_status(session) -> Tuple[Optional[SyncRun], List[Tuple[str, dict]]]:
+    """
+    Данные для /syncstatus: последний запуск синхронизации и агрегаты
+    по syncrun за окна SYNC_TREND_WINDOWS (один запрос с FILTER).
+    """
+    last = (await session.execute(
+        select(SyncRun).order_by(SyncRun.started_at.desc()).limit(1)
+    )).scalars().first()
+
+    now = datetime.now(timezone.utc)
+    if session.bind.dialect.name == "sqlite":
+        duration = (func.julianday(SyncRun.finished_at) - func.julianday(SyncRun.started_at)) * 86400
+    else:
+        duration = func.extract("epoch", SyncRun.finished_at - SyncRun.started_at)
+    metrics = {
+        "runs": func.count(),
+        "pages": func.sum(SyncRun.pages),
+        "seen": func.sum(SyncRun.records_seen),
+        "awarded": func.sum(SyncRun.records_awarded),
+        "adjusted": func.sum(SyncRun.records_adjusted),
+        "errors": func.sum(SyncRun.errors + SyncRun.api_errors),
+        "api_seconds": func.sum(SyncRun.api_seconds),
+        "db_seconds": func.sum(SyncRun.db_seconds),
+        "max_duration": func.max(duration),
+    }
+    columns = []
+    for i, (_, span) in enumerate(SYNC_TREND_WINDOWS):
+        in_window = SyncRun.started_at >= now - span
+        columns += [expr.filter(in_window).label(f"{name}_{i}") for name, expr in metrics.items()]
+
+    row = (await session.execute(
+        select(*columns).where(SyncRun.started_at >= now - SYNC_TREND_WINDOWS[-1][1])
+    )).one()._mapping
+
+    trends = []
+    for i, (label, _) in enumerate(SYNC_TREND_WINDOWS):
+        values = {name: row[f"{name}_{i}"] or 0 for name in metrics}
+        # Удельные показатели сравнимы между окнами разной длины
+        values["api_per_page"] = values["api_seconds"] / values["pages"] if values["pages"] else 0
+        values["db_per_record"] = values["db_seconds"] / values["seen"] if values["seen"] else 0
+        values["seen_per_run"] = values["seen"] / values["runs"] if values["runs"] else 0
+        trends.append((label, values))
+    return last, trends
@@ -1,6 +1,7 @@
 from typing import List, Optional
 from pydantic_settings import BaseSettings
 from pydantic import AnyHttpUrl, Field
+from sqlalchemy.engine import make_url
 from pathlib import Path
 import os
 
@@ -23,16 +24,100 @@ class Settings(BaseSettings):
     POSTGRES_PASSWORD: str = Field(default="", env="POSTGRES_PASSWORD")
     POSTGRES_DB: str = Field(default="loyalty_db", env="POSTGRES_DB")
     ADMIN_IDS: List[int] = Field(default=[], env="ADMINS_IDS")
+    # Токен для служебных HTTP-эндпоинтов /admin/* (пусто - эндпоинты отключены)
+    ADMIN_API_TOKEN: str = Field(default="", env="ADMIN_API_TOKEN")
 
     # Остальные настройки из .env
     COMPANY_ID: int = Field(default=0, env="COMPANY_ID")
     YCLIENTS_BOOK_URL: AnyHttpUrl = Field(default="https://example.com", env="YCLIENTS_BOOK_URL")
     SUPPORT_PHONE: str = Field(default="", env="SUPPORT_PHONE")
     COMPANY_YMAPS_LINK: str = Field(default="", env="COMPANY_YMAPS_LINK")
+
+    # Сгорание баллов: срок жизни начисления в месяцах (0 - баллы не сгорают)
+    POINTS_EXPIRY_MONTHS: int = Field(default=0, env="POINTS_EXPIRY_MONTHS")
+    # За сколько дней предупреждать клиента о сгорании (0 - не предупреждать)
+    POINTS_EXPIRY_NOTIFY_DAYS: int = Field(default=7, env="POINTS_EXPIRY_NOTIFY_DAYS")
     
+    # Роль процесса app.main: all - веб и фоновые задания, web - только веб
+    # (фоновые задания тогда запускаются отдельно: python -m app.worker)
+    APP_ROLE: str = Field(default="all", env="APP_ROLE")
+
+    # Строка подключения SQLAlchemy (пусто - Postgres сервиса db из POSTGRES_*).
+    # Для небольшой установки без отдельного сервера БД:
+    # sqlite+aiosqlite:////app/data/loyalty.db
+    DATABASE_URL: str = Field(default="", env="DATABASE_URL")
+    # Пул соединений основной БД и реплики
+    DB_POOL_SIZE: int = Field(default=5, env="DB_POOL_SIZE")
+    DB_MAX_OVERFLOW: int = Field(default=10, env="DB_MAX_OVERFLOW")
+    DB_POOL_RECYCLE: int = Field(default=1800, env="DB_POOL_RECYCLE")
+    DB_POOL_TIMEOUT: int = Field(default=30, env="DB_POOL_TIMEOUT")
+    # Писать в лог все SQL-запросы
+    DB_ECHO: bool = Field(default=True, env="DB_ECHO")
+
+    # Реплика только для чтения (пусто - все запросы идут в основную БД)
+    POSTGRES_READ_HOST: str = Field(default="", env="POSTGRES_READ_HOST")
+    # Сколько секунд после изменения читать данные пользователя из основной БД
+    REPLICA_STICKY_SECONDS: float = Field(default=5.0, env="REPLICA_STICKY_SECONDS")
+
+    # Отбрасывание повторно доставленных апдейтов Telegram
+    UPDATE_DEDUP_TTL_SECONDS: int = Field(default=600, env="UPDATE_DEDUP_TTL_SECONDS")
+    UPDATE_DEDUP_MAX_SIZE: int = Field(default=50_000, env="UPDATE_DEDUP_MAX_SIZE")
+    # Общий индекс в Postgres для нескольких реплик приложения
+    UPDATE_DEDUP_SHARED: bool = Field(default=False, env="UPDATE_DEDUP_SHARED")
+
+    # Лимиты частоты запросов от пользователя: "start=3/10,balance=5/10,contact=2/30"
+    # (команда=число/окно в секундах; не указанные берутся по умолчанию)
+    THROTTLE_LIMITS: str = Field(default="", env="THROTTLE_LIMITS")
+
+    # Мгновенные уведомления о начислениях через LISTEN/NOTIFY
+    NOTIFY_LISTEN: bool = Field(default=True, env="NOTIFY_LISTEN")
+    # Интервал страховочного опроса неуведомлённых начислений (сек)
+    NOTIFY_SWEEP_SECONDS: int = Field(default=600, env="NOTIFY_SWEEP_SECONDS")
+
+    # Архив журнала баллов: секции bonuslog старше стольких месяцев выгружаются
+    # в BONUSLOG_ARCHIVE_DIR и отсоединяются (0 - не архивировать)
+    BONUSLOG_RETENTION_MONTHS: int = Field(default=0, env="BONUSLOG_RETENTION_MONTHS")
+    BONUSLOG_ARCHIVE_DIR: str = Field(default=str(BASE_DIR / "archive"), env="BONUSLOG_ARCHIVE_DIR")
+
+    # Монитор задержек event loop (app/loop_monitor.py)
+    LOOP_MONITOR_ENABLED: bool = Field(default=False, env="LOOP_MONITOR_ENABLED")
+    # Как часто замерять задержку цикла (сек)
+    LOOP_LAG_INTERVAL: float = Field(default=0.5, env="LOOP_LAG_INTERVAL")
+    # С какой задержки (сек) писать в лог стек блокирующего кода
+    LOOP_STALL_THRESHOLD: float = Field(default=0.3, env="LOOP_STALL_THRESHOLD")
+
+    # Запись трафика YClientsAPI в gzip JSONL (пусто - не записывать)
+    YCLIENTS_CAPTURE_FILE: str = Field(default="", env="YCLIENTS_CAPTURE_FILE")
+    # Воспроизведение записанного трафика вместо запросов в сеть
+    YCLIENTS_REPLAY_FILE: str = Field(default="", env="YCLIENTS_REPLAY_FILE")
+    # Множитель записанных задержек ответов при воспроизведении (0 - без задержек)
+    YCLIENTS_REPLAY_LATENCY: float = Field(default=0.0, env="YCLIENTS_REPLAY_LATENCY")
+
+    # Пороги /ready (0 - проверка только показывается и не влияет на статус)
+    # Время ответа БД на SELECT 1, сек
+    READY_DB_TIMEOUT: float = Field(default=3.0, env="READY_DB_TIMEOUT")
+    # Сколько секунд может пройти после последнего успешного sync_records
+    READY_MAX_SYNC_AGE: int = Field(default=600, env="READY_MAX_SYNC_AGE")
+    # На сколько секунд SyncState.last_checked может отставать от текущего времени
+    READY_MAX_SYNC_LAG: int = Field(default=900, env="READY_MAX_SYNC_LAG")
+    # Сколько строк bonuslog может ждать уведомления и как долго (сек)
+    READY_MAX_PENDING_NOTIFY: int = Field(default=1000, env="READY_MAX_PENDING_NOTIFY")
+    READY_MAX_NOTIFY_AGE: int = Field(default=3600, env="READY_MAX_NOTIFY_AGE")
+    # На сколько секунд задание планировщика может опоздать к своему времени
+    READY_SCHEDULER_GRACE: int = Field(default=300, env="READY_SCHEDULER_GRACE")
+
     @property
-    def DATABASE_URL(self) -> str:
-        return f"postgresql+asyncpg://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}@db:5432/{self.POSTGRES_DB}"
+    def DB_DIALECT(self) -> str:
+        """postgresql или sqlite"""
+        return make_url(self.DATABASE_URL).get_backend_name()
+
+    @property
+    def DATABASE_READ_URL(self) -> Optional[str]:
+        # Реплика бывает только у Postgres: тот же URL с другим хостом
+        if not self.POSTGRES_READ_HOST or self.DB_DIALECT != "postgresql":
+            return None
+        url = make_url(self.DATABASE_URL).set(host=self.POSTGRES_READ_HOST)
+        return url.render_as_string(hide_password=False)
 
     class Config:
         env_file = ".env"
@@ -49,6 +134,8 @@ class Settings(BaseSettings):
             self.POSTGRES_USER = read_secret(f"{self.Config.secrets_dir}/postgres_user") or self.POSTGRES_USER
             self.POSTGRES_PASSWORD = read_secret(f"{self.Config.secrets_dir}/postgres_password") or self.POSTGRES_PASSWORD
             self.POSTGRES_DB = read_secret(f"{self.Config.secrets_dir}/postgres_db") or self.POSTGRES_DB
+            self.ADMIN_API_TOKEN = read_secret(f"{self.Config.secrets_dir}/admin_api_token") or self.ADMIN_API_TOKEN
+            self.DATABASE_URL = read_secret(f"{self.Config.secrets_dir}/database_url") or self.DATABASE_URL
 
             # <-- добавь вот это:
             admin_ids_str = read_secret(f"{self.Config.secrets_dir}/admins_ids")
@@ -58,5 +145,8 @@ class Settings(BaseSettings):
                 except ValueError:
                     print("Ошибка разбора admins_ids, требуется проверить формат файла")
 
+        if not self.DATABASE_URL:
+            self.DATABASE_URL = f"postgresql+asyncpg://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}@db:5432/{self.POSTGRES_DB}"
+
 
 settings = Settings()
@@ -1,19 +1,48 @@
-from datetime import datetime, timezone
+from datetime import date, datetime, timezone
 from typing import Optional
 import sqlalchemy
-from sqlalchemy import Column, DateTime, UniqueConstraint
+from sqlalchemy import Column, DateTime, Index
 
 from sqlmodel import SQLModel, Field
 
+# Типы операций в журнале баллов (BonusLog.kind)
+KIND_AWARD = "award"    # начисление за оплаченную запись
+KIND_EXPIRE = "expire"  # сгорание баллов по сроку давности
+KIND_CREDIT = "credit"  # ручное начисление администратором
+KIND_REDEEM = "redeem"  # списание баллов в оплату
+KIND_ADJUST = "adjust"  # корректировка: остаток, не объяснённый журналом
+
+# Состояние доставки уведомления по строке BonusLog (BonusLog.notify_state)
+NOTIFY_PENDING = "pending"  # ждёт отправки (возможно, после паузы notify_next_at)
+NOTIFY_SENT = "sent"        # доставлено
+NOTIFY_SKIPPED = "skipped"  # отправлять некому: нет Telegram или чат недоступен
+NOTIFY_FAILED = "failed"    # ошибка без шансов на успех или исчерпаны попытки
 
 class Clients(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     yclients_id: int  = Field(nullable=False, index=True, description="ID клиента в YCLIENTS")
     phone_number: str = Field(nullable=False, index=True, description="Телефон +7XXXXXXXXXX")
-    points: int       = Field(default=0, nullable=False, description="Накопленные баллы")
+    points: int       = Field(default=0, nullable=False, index=True, description="Накопленные баллы")
     is_in_loyalty: bool = Field(default=True, nullable=False, description="Участвует в программе лояльности")
     name: str = Field(nullable=False, index=True, description="Имя клиента")
     telegram_user_id: Optional[int] = Field(default=None, sa_column=sqlalchemy.Column(sqlalchemy.BigInteger))
+    is_chat_unreachable: bool = Field(
+        default=False,
+        nullable=False,
+        sa_column_kwargs={"server_default": sqlalchemy.text("FALSE")},
+        description="Бот заблокирован, аккаунт удалён или чат не найден - сообщения не отправляем"
+    )
+    __table_args__ = (
+        # Триграммные индексы для поиска по части имени/телефона (pg_trgm)
+        Index(
+            'ix_clients_name_trgm', 'name',
+            postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}
+        ),
+        Index(
+            'ix_clients_phone_number_trgm', 'phone_number',
+            postgresql_using='gin', postgresql_ops={'phone_number': 'gin_trgm_ops'}
+        ),
+    )
 
 
 class SyncState(SQLModel, table=True):
@@ -25,9 +54,15 @@ class SyncState(SQLModel, table=True):
     )
 
 class BonusLog(SQLModel, table=True):
+    """
+    Журнал баллов. В Postgres таблица секционирована по месяцам awarded_at
+    (миграция b6d1e0a47c32, первичный ключ (id, awarded_at)); секции создаёт
+    и отправляет в архив задача maintain_bonuslog_partitions. Уникальность
+    начисления за запись обеспечивает recordfingerprint.record_id.
+    """
     id: Optional[int] = Field(default=None, primary_key=True)
-    record_id: int = Field(index=True, nullable=False, description="ID записи в YClients")
-    client_id: int = Field(foreign_key="clients.id", index=True, nullable=False)
+    record_id: Optional[int] = Field(default=None, nullable=True, description="ID записи в YClients (пусто для служебных операций)")
+    client_id: int = Field(foreign_key="clients.id", nullable=False)
     points: int = Field(nullable=False)
     awarded_at: datetime = Field(
         sa_column=Column(DateTime(timezone=True), nullable=False),
@@ -39,4 +74,153 @@ class BonusLog(SQLModel, table=True):
         nullable=False,
         sa_column_kwargs={"server_default": sqlalchemy.text("FALSE")}
     )
-    __table_args__ = (UniqueConstraint('record_id', name='uix_record_id'),)
\ No newline at end of file
+    kind: str = Field(
+        default=KIND_AWARD,
+        max_length=16,
+        nullable=False,
+        sa_column_kwargs={"server_default": KIND_AWARD},
+        description="Тип операции: award, credit, redeem, expire, adjust"
+    )
+    # is_telegram_notified = TRUE означает, что по строке больше нечего отправлять
+    # (доставлено или конечное состояние), подробности - в notify_state
+    notify_state: str = Field(
+        default=NOTIFY_PENDING,
+        max_length=16,
+        nullable=False,
+        sa_column_kwargs={"server_default": NOTIFY_PENDING},
+        description="Состояние доставки: pending, sent, skipped, failed"
+    )
+    notify_attempts: int = Field(default=0, nullable=False, sa_column_kwargs={"server_default": "0"})
+    notify_next_at: Optional[datetime] = Field(
+        default=None,
+        sa_column=Column(DateTime(timezone=True), nullable=True),
+        description="Не раньше этого времени повторить отправку"
+    )
+    notify_error: Optional[str] = Field(default=None, max_length=255, description="Последняя ошибка отправки")
+    __table_args__ = (
+        # Keyset-пагинация истории клиента (/history)
+        Index('ix_bonuslog_client_id_awarded_at_id', 'client_id', 'awarded_at', 'id'),
+        # Частичный индекс: в нём только строки, ожидающие уведомления
+        Index(
+            'ix_bonuslog_pending', 'notify_next_at',
+            postgresql_where=sqlalchemy.text("NOT is_telegram_notified"),
+        ),
+    )
+
+
+class DailyStats(SQLModel, table=True):
+    """Сводка по дням, обновляется инкрементально в тех же транзакциях, что и баллы"""
+    day: date = Field(primary_key=True, description="День (UTC)")
+    points_awarded: int = Field(default=0, nullable=False, sa_column_kwargs={"server_default": "0"})
+    awards_count: int = Field(default=0, nullable=False, sa_column_kwargs={"server_default": "0"})
+    points_credited: int = Field(default=0, nullable=False, sa_column_kwargs={"server_default": "0"})
+    points_redeemed: int = Field(default=0, nullable=False, sa_column_kwargs={"server_default": "0"})
+    redemptions_count: int = Field(default=0, nullable=False, sa_column_kwargs={"server_default": "0"})
+    points_expired: int = Field(default=0, nullable=False, sa_column_kwargs={"server_default": "0"})
+    new_members: int = Field(default=0, nullable=False, sa_column_kwargs={"server_default": "0"})
+
+
+class MediaFile(SQLModel, table=True):
+    """file_id Telegram для уже загруженных медиафайлов бота"""
+    key: str = Field(primary_key=True, max_length=64, description="Ключ файла в реестре медиа")
+    file_id: str = Field(nullable=False, description="file_id, выданный Telegram после загрузки")
+    updated_at: datetime = Field(
+        sa_column=Column(DateTime(timezone=True), nullable=False),
+        default_factory=lambda: datetime.now(timezone.utc),
+        description="Время последней загрузки"
+    )
+
+
+class ProcessedUpdate(SQLModel, table=True):
+    """Недавно обработанные update_id Telegram (общий индекс дедупликации)"""
+    update_id: int = Field(sa_column=Column(sqlalchemy.BigInteger, primary_key=True, autoincrement=False))
+    seen_at: datetime = Field(
+        sa_column=Column(DateTime(timezone=True), nullable=False, index=True),
+        default_factory=lambda: datetime.now(timezone.utc),
+        description="Когда апдейт был получен"
+    )
+
+
+class RecordFingerprint(SQLModel, table=True):
+    """
+    Отпечаток учтённой записи YClients: по нему синхронизация за один запрос
+    на страницу отличает повторную выдачу той же записи от реального изменения
+    """
+    record_id: int = Field(sa_column=Column(sqlalchemy.Integer, primary_key=True, autoincrement=False))
+    client_id: int = Field(foreign_key="clients.id", nullable=False)
+    fingerprint: Optional[str] = Field(
+        default=None,
+        max_length=16,
+        description="Хэш оплаты, удаления и стоимости услуг (пусто - запись учтена до появления отпечатков)"
+    )
+    points: int = Field(default=0, nullable=False, description="Сколько баллов за запись сейчас учтено в балансе")
+    amount: Optional[int] = Field(
+        default=None,
+        nullable=True,
+        description=(
+            "Оплаченная сумма записи, учтённая в clientstats.spend (0 - не оплачена или отменена, "
+            "пусто - запись учтена до появления колонки, сумма неизвестна)"
+        )
+    )
+
+
+class ClientStats(SQLModel, table=True):
+    """
+    Сводка по клиенту для /balance и будущих уровней: обновляется в тех же
+    транзакциях, что и баллы (bump_client_stats), пересчитывается целиком
+    командой python -m app.tasks.rebuild_client_stats
+    """
+    client_id: int = Field(foreign_key="clients.id", primary_key=True)
+    visits: int = Field(default=0, nullable=False, sa_column_kwargs={"server_default": "0"}, description="Оплаченные визиты")
+    spend: int = Field(default=0, nullable=False, sa_column_kwargs={"server_default": "0"}, description="Сумма оплаченных визитов")
+    points_earned: int = Field(
+        default=0, nullable=False, sa_column_kwargs={"server_default": "0"},
+        description="Начислено баллов за всё время: визиты, корректировки, ручные начисления"
+    )
+    points_redeemed: int = Field(default=0, nullable=False, sa_column_kwargs={"server_default": "0"}, description="Списано баллов в оплату")
+    last_visit_at: Optional[datetime] = Field(
+        default=None,
+        sa_column=Column(DateTime(timezone=True), nullable=True),
+        description="Время последнего начисления за визит"
+    )
+
+
+class SyncRun(SQLModel, table=True):
+    """Аудит запусков sync_records: окно, объёмы и время ожидания API и БД"""
+    id: Optional[int] = Field(default=None, primary_key=True)
+    company_id: int = Field(nullable=False)
+    started_at: datetime = Field(
+        sa_column=Column(DateTime(timezone=True), nullable=False, index=True),
+        default_factory=lambda: datetime.now(timezone.utc),
+        description="Начало запуска"
+    )
+    finished_at: Optional[datetime] = Field(
+        default=None,
+        sa_column=Column(DateTime(timezone=True), nullable=True),
+        description="Окончание запуска"
+    )
+    window_start: Optional[datetime] = Field(
+        default=None,
+        sa_column=Column(DateTime(timezone=True), nullable=True),
+        description="changed_after запроса к API"
+    )
+    window_end: Optional[datetime] = Field(
+        default=None,
+        sa_column=Column(DateTime(timezone=True), nullable=True),
+        description="Граница окна, которая станет новым курсором при успехе"
+    )
+    cursor: Optional[datetime] = Field(
+        default=None,
+        sa_column=Column(DateTime(timezone=True), nullable=True),
+        description="SyncState.last_checked после запуска"
+    )
+    pages: int = Field(default=0, nullable=False)
+    api_seconds: float = Field(default=0, nullable=False, description="Время ожидания YClients API")
+    db_seconds: float = Field(default=0, nullable=False, description="Время обработки записей и запросов к БД")
+    records_seen: int = Field(default=0, nullable=False)
+    records_skipped: int = Field(default=0, nullable=False, description="Без изменений, не оплачены или клиент вне программы")
+    records_awarded: int = Field(default=0, nullable=False)
+    records_adjusted: int = Field(default=0, nullable=False)
+    api_errors: int = Field(default=0, nullable=False, description="Страницы API, не загруженные после повторов")
+    errors: int = Field(default=0, nullable=False, description="Ошибки обработки записей и БД")
+    last_error: Optional[str] = Field(default=None, max_length=255)
@@ -1,32 +1,182 @@
 # app/db/session.py
+import asyncio
+import logging
+import time
+from typing import Dict, Optional
+
 from sqlmodel import SQLModel
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
-from app.config import settings
+from sqlalchemy import event, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine, AsyncSession, async_sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.config import settings, BASE_DIR
+
+logger = logging.getLogger(__name__)
 
-# Параметры пула для asyncpg
+# Параметры пула (настройки DB_*)
 # pool_size           - размер пула постоянных соединений
 # max_overflow        - сколько «лишних» соединений может создаваться сверх pool_size
 # pool_pre_ping       - проверять соединение на «живость» перед выдачей из пула
 # pool_recycle        - время (в секундах), после которого соединение будет пересоздано
 # pool_timeout        - время ожидания свободного соединения из пула
 
-engine = create_async_engine(
-    settings.DATABASE_URL,
-    echo=True,
-    future=True,
-    pool_size=5,
-    max_overflow=10,
-    pool_pre_ping=True,
-    pool_recycle=1800,     # пересоздавать соединения раз в полчаса
-    pool_timeout=30        # ждать до 30 секунд за соединением
+# PRAGMA для каждого соединения SQLite: WAL - читатели не ждут писателя,
+# synchronous=NORMAL в WAL безопасен при сбое процесса, busy_timeout -
+# ожидание блокировки записи вместо немедленной ошибки "database is locked"
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA foreign_keys=ON",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA cache_size=-20000",
+    "PRAGMA temp_store=MEMORY",
 )
 
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for pragma in SQLITE_PRAGMAS:
+        cursor.execute(pragma)
+    cursor.close()
+
+
+def _create_engine(url: str) -> AsyncEngine:
+    backend = make_url(url)
+    if backend.get_backend_name() == "sqlite":
+        if backend.database in (None, "", ":memory:"):
+            # База в памяти живёт, пока открыто соединение - одно на процесс
+            engine = create_async_engine(url, echo=settings.DB_ECHO, poolclass=StaticPool)
+        else:
+            engine = create_async_engine(
+                url,
+                echo=settings.DB_ECHO,
+                pool_size=settings.DB_POOL_SIZE,
+                max_overflow=settings.DB_MAX_OVERFLOW,
+                pool_timeout=settings.DB_POOL_TIMEOUT,
+            )
+        event.listen(engine.sync_engine, "connect", _set_sqlite_pragmas)
+        return engine
+
+    return create_async_engine(
+        url,
+        echo=settings.DB_ECHO,
+        future=True,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_pre_ping=True,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+    )
+
+
+engine = _create_engine(settings.DATABASE_URL)
+
 async_session = async_sessionmaker(
     bind=engine,
     class_=AsyncSession,
     expire_on_commit=False
 )
 
+# Необязательная реплика для запросов только на чтение.
+# Если POSTGRES_READ_HOST не задан, read_engine - это основной engine.
+if settings.DATABASE_READ_URL:
+    read_engine = _create_engine(settings.DATABASE_READ_URL)
+else:
+    read_engine = engine
+
+replica_session = async_sessionmaker(
+    bind=read_engine,
+    class_=AsyncSession,
+    expire_on_commit=False
+)
+
+
+def dialect_insert(session, table):
+    """
+    INSERT с поддержкой ON CONFLICT для диалекта сессии (Postgres или SQLite):
+    у обоих есть on_conflict_do_update / on_conflict_do_nothing и excluded.
+    """
+    if session.bind.dialect.name == "sqlite":
+        return sqlite_insert(table)
+    return pg_insert(table)
+
+
+# telegram_user_id -> time.monotonic() последнего изменения его данных
+_recent_writes: Dict[int, float] = {}
+
+
+def mark_written(*telegram_user_ids: Optional[int]):
+    """
+    Отмечает, что данные этих пользователей только что изменились.
+    Ближайшие REPLICA_STICKY_SECONDS их чтения пойдут в основную БД,
+    чтобы не показать устаревший с реплики баланс (read-your-writes).
+    Отметка живёт в памяти процесса: вызывать там, где пользователь сразу
+    читает свои данные, - в хендлерах бота, а не в фоновых заданиях app.worker.
+    """
+    if read_engine is engine:
+        return
+    now = time.monotonic()
+    for user_id in telegram_user_ids:
+        if user_id is not None:
+            _recent_writes[user_id] = now
+    # Чистим устаревшие отметки, чтобы словарь не рос
+    if len(_recent_writes) > 10_000:
+        horizon = now - settings.REPLICA_STICKY_SECONDS
+        for user_id in [u for u, ts in _recent_writes.items() if ts < horizon]:
+            del _recent_writes[user_id]
+
+
+def read_session(telegram_user_id: Optional[int] = None) -> AsyncSession:
+    """
+    Сессия для запросов только на чтение: реплика, если она настроена и
+    данные пользователя не менялись последние REPLICA_STICKY_SECONDS.
+    Для чтения с последующим изменением использовать async_session.
+    """
+    if telegram_user_id is not None:
+        written_at = _recent_writes.get(telegram_user_id)
+        if written_at is not None and time.monotonic() - written_at < settings.REPLICA_STICKY_SECONDS:
+            return async_session()
+    return replica_session()
+
+
+def _alembic_heads() -> set:
+    """Ревизии head из каталога миграций (импорт alembic - только при старте)"""
+    from alembic.config import Config
+    from alembic.script import ScriptDirectory
+
+    config = Config(str(BASE_DIR / "alembic.ini"))
+    return set(ScriptDirectory.from_config(config).get_heads())
+
+
+async def _applied_revisions() -> set:
+    async with engine.connect() as conn:
+        try:
+            result = await conn.execute(text("SELECT version_num FROM alembic_version"))
+        except Exception:
+            # Таблицы alembic_version ещё нет - миграции не применялись
+            return set()
+        return {row[0] for row in result}
+
+
+async def schema_is_current() -> bool:
+    """True, если в БД уже применена последняя миграция alembic"""
+    heads, applied = await asyncio.gather(
+        asyncio.to_thread(_alembic_heads),
+        _applied_revisions(),
+    )
+    return bool(heads) and applied == heads
+
+
 async def init_db():
+    # В контейнере перед стартом уже выполнен `alembic upgrade head`,
+    # тогда create_all лишь повторно инспектирует все таблицы - пропускаем
+    if await schema_is_current():
+        logger.info("Database schema is at alembic head, skipping create_all")
+        return
     async with engine.begin() as conn:
+        if conn.dialect.name == "postgresql":
+            # Нужен для триграммных индексов clients (gin_trgm_ops)
+            await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
         await conn.run_sync(SQLModel.metadata.create_all)
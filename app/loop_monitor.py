@@ -0,0 +1,111 @@
+# app/loop_monitor.py
+"""
+Монитор задержек event loop. Веб-приложение, хендлеры aiogram и задания
+APScheduler работают в одном цикле asyncio, и любая синхронная операция
+(запись лога в файл, чтение секрета, разбор большого JSON) задерживает всех.
+
+- Корутина раз в LOOP_LAG_INTERVAL секунд засыпает и меряет, насколько
+  позже запланированного проснулась - это и есть задержка цикла.
+  Значения копятся в гистограмме.
+- Сторожевой поток следит за отметкой последнего пробуждения. Если цикл
+  не отвечает дольше LOOP_STALL_THRESHOLD секунд, в лог пишется стек кода,
+  который в этот момент занимает поток цикла.
+
+Включается настройкой LOOP_MONITOR_ENABLED.
+"""
+
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from bisect import bisect_left
+from typing import List, Optional
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Верхние границы корзин гистограммы, мс (последняя корзина - всё, что больше)
+LAG_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+
+class LoopLagMonitor:
+    def __init__(self, interval: float, stall_threshold: float):
+        self.interval = interval
+        self.stall_threshold = stall_threshold
+        self.buckets: List[int] = [0] * (len(LAG_BUCKETS_MS) + 1)
+        self.samples = 0
+        self.max_lag_ms = 0.0
+        self.stalls = 0
+        self._heartbeat = time.monotonic()
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        if self._task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.create_task(self._sample(), name="loop-lag-monitor")
+        self._watchdog = threading.Thread(target=self._watch, name="loop-stall-watchdog", daemon=True)
+        self._watchdog.start()
+        logger.info(
+            "Event loop monitor started (interval %.2fs, stall threshold %.2fs)",
+            self.interval, self.stall_threshold
+        )
+
+    async def stop(self):
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _sample(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._heartbeat = now
+            lag_ms = max(0.0, (now - expected) * 1000)
+            self.samples += 1
+            self.buckets[bisect_left(LAG_BUCKETS_MS, lag_ms)] += 1
+            if lag_ms > self.max_lag_ms:
+                self.max_lag_ms = lag_ms
+
+    def _watch(self):
+        """Поток-сторож: стек потока цикла, если тот завис дольше порога"""
+        reported_for = None
+        while not self._stopped.wait(self.stall_threshold / 2):
+            heartbeat = self._heartbeat
+            stalled = time.monotonic() - heartbeat - self.interval
+            if stalled < self.stall_threshold or reported_for == heartbeat:
+                continue
+            # Одно сообщение на одно зависание
+            reported_for = heartbeat
+            self.stalls += 1
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame else "<no frame>"
+            logger.warning("Event loop blocked for %.0f ms, running:\n%s", stalled * 1000, stack)
+
+    def snapshot(self) -> dict:
+        """Гистограмма и счётчики для /admin/loop-lag"""
+        labels = [f"<={b}ms" for b in LAG_BUCKETS_MS] + [f">{LAG_BUCKETS_MS[-1]}ms"]
+        return {
+            "enabled": self._task is not None,
+            "samples": self.samples,
+            "max_lag_ms": round(self.max_lag_ms, 1),
+            "stalls": self.stalls,
+            "histogram": dict(zip(labels, self.buckets)),
+        }
+
+
+loop_monitor = LoopLagMonitor(settings.LOOP_LAG_INTERVAL, settings.LOOP_STALL_THRESHOLD)
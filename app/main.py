@@ -1,14 +1,18 @@
+import asyncio
 import logging
 import sys
+import time
+from typing import Awaitable, Dict
 from fastapi import FastAPI, Request
 from fastapi.responses import JSONResponse
-from app.tasks.notify_bonuses import notify_new_bonuses
-from app.tasks.sync_bonuses import sync_records
+from app.tasks.scheduler import start_background_jobs, stop_background_jobs
 from app.db.session import init_db
 from app.config import settings
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from app.loop_monitor import loop_monitor
+from app.readiness import check_readiness
 from contextlib import asynccontextmanager
 from .bot.dispatcher import bot, router as bot_router
+from .api.admin import admin_api
 
 # Настройка логирования: консоль и файл
 log_format = "%(asctime)s [%(levelname)s] %(name)s: %(message)s"
@@ -22,47 +26,66 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Инициализация планировщика
-scheduler = AsyncIOScheduler()
+
+async def _set_webhook():
+    webhook_url = f"https://yourweebhookurl.com/bot/{settings.FATHERBOT_TOKEN}"
+    await bot.set_webhook(
+        url=webhook_url,
+        drop_pending_updates=True
+    )
+    logger.info("Webhook set to %s", webhook_url)
+
+
+async def _init_db_and_jobs():
+    # Фоновые задания стартуют только после init_db: на пустой БД первая
+    # синхронизация или рассылка иначе может прийти раньше, чем создадутся таблицы.
+    # При APP_ROLE=web их выполняет отдельный процесс app.worker
+    try:
+        await init_db()
+    finally:
+        # Если БД пока недоступна, задания всё равно запускаются и повторяют попытки сами
+        if settings.APP_ROLE != "web":
+            try:
+                start_background_jobs()
+            except Exception as exc:
+                logger.exception("Error during scheduler startup: %s", exc)
+
+
+async def _timed(timings: Dict[str, float], name: str, step: Awaitable):
+    started = time.perf_counter()
+    try:
+        return await step
+    finally:
+        timings[name] = (time.perf_counter() - started) * 1000
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logger.info("Starting application setup...")
     # Startup
-    try:
-        # Инициализация БД и схем
-        await init_db()
-        logger.info("Database initialized")
-
-        # Плановые задания
-        scheduler.add_job(
-            func=sync_records,
-            trigger="interval",
-            seconds=60,
-            args=[settings.COMPANY_ID],
-            id="sync_records_job",
-            replace_existing=True
-        )
-        scheduler.add_job(
-            func=notify_new_bonuses,
-            trigger="interval",
-            seconds=60,
-            id="notify_new_bonuses_job",
-            replace_existing=True
-        )
-        scheduler.start()
-        logger.info("Scheduler started with jobs: sync_records, notify_new_bonuses")
-
-        # Установка webhook Telegram
-        webhook_url = f"https://yourweebhookurl.com/bot/{settings.FATHERBOT_TOKEN}"
-        await bot.set_webhook(
-            url=webhook_url,
-            drop_pending_updates=True
-        )
-        logger.info("Webhook set to %s", webhook_url)
+    timings: Dict[str, float] = {}
+    started = time.perf_counter()
 
-    except Exception as exc:
-        logger.exception("Error during startup: %s", exc)
+    if settings.LOOP_MONITOR_ENABLED:
+        loop_monitor.start()
+
+    # Независимые шаги (БД и webhook Telegram) выполняются параллельно,
+    # ошибка одного не отменяет другой
+    results = await asyncio.gather(
+        _timed(timings, "init_db", _init_db_and_jobs()),
+        _timed(timings, "set_webhook", _set_webhook()),
+        return_exceptions=True,
+    )
+    for name, result in zip(("init_db", "set_webhook"), results):
+        if isinstance(result, BaseException):
+            logger.error("Error during startup step %s", name, exc_info=result)
+
+    timings["lifespan_total"] = (time.perf_counter() - started) * 1000
+    app.state.startup_timings = timings
+    logger.info(
+        "Startup finished: %s",
+        ", ".join(f"{name}={ms:.1f}ms" for name, ms in timings.items())
+    )
 
     yield
 
@@ -71,7 +94,8 @@ async def lifespan(app: FastAPI):
         logger.info("Shutting down application...")
         await bot.delete_webhook()
         await bot.session.close()
-        scheduler.shutdown(wait=False)
+        await stop_background_jobs()
+        await loop_monitor.stop()
         logger.info("Scheduler shutdown and webhook deleted")
     except Exception as exc:
         logger.exception("Error during shutdown: %s", exc)
@@ -93,7 +117,15 @@ async def catch_exceptions_middleware(request: Request, call_next):
 
 # Монтируем роуты Telegram-бота
 app.include_router(bot_router)
+# Служебные эндпоинты для администраторов (выгрузки и т.п.)
+app.include_router(admin_api)
 
 @app.get("/health")
 async def health():
     return {"status": "ok"}
+
+@app.get("/ready")
+async def ready():
+    """Готовность реплики (app/readiness.py): 503, если нарушен хотя бы один порог"""
+    report = await check_readiness()
+    return JSONResponse(status_code=200 if report["status"] == "ok" else 503, content=report)
@@ -0,0 +1,192 @@
+# app/profiling.py
+"""
+Профилирование по запросу администратора: следующие N запусков
+sync_records или N апдейтов Telegram выполняются под cProfile, сводка
+pstats приходит администратору документом в Telegram.
+
+Запуск: команда /profile или POST /admin/profile. Синхронизация при
+APP_ROLE=web работает в процессе app.worker, поэтому запрос на её
+профилирование уходит туда через Postgres NOTIFY (канал PROFILE_CHANNEL
+слушает BonusListener).
+"""
+
+import asyncio
+import cProfile
+import io
+import json
+import logging
+import pstats
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from sqlalchemy import text
+
+from app.config import settings
+from app.db.session import async_session
+
+logger = logging.getLogger(__name__)
+
+# Канал Postgres NOTIFY с запросами на профилирование для app.worker
+PROFILE_CHANNEL = "profile_request"
+
+TARGET_SYNC = "sync"
+TARGET_UPDATES = "updates"
+# Цель -> максимальное число профилируемых запусков/апдейтов
+PROFILE_LIMITS = {TARGET_SYNC: 20, TARGET_UPDATES: 1000}
+# Сессия профилирования завершается не позже чем через столько секунд
+MAX_PROFILE_SECONDS = 1800
+DEFAULT_PROFILE_SECONDS = 600
+# Сколько строк pstats включать в отчёт
+REPORT_LINES = 60
+
+
+class _ProfileSession:
+    def __init__(self, target: str, count: int, seconds: int, chat_ids: List[int]):
+        self.target = target
+        self.remaining = count
+        self.captured = 0
+        self.active = 0
+        self.seconds = seconds
+        self.chat_ids = chat_ids
+        self.started_at = datetime.now(timezone.utc)
+        self.profile = cProfile.Profile()
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class OnDemandProfiler:
+    """Одна сессия профилирования на процесс"""
+
+    def __init__(self):
+        self._session: Optional[_ProfileSession] = None
+
+    def arm(self, target: str, count: int, seconds: int, chat_ids: List[int]) -> bool:
+        """Профилировать следующие `count` выполнений цели. False - уже идёт другая сессия"""
+        if self._session is not None:
+            return False
+        session = _ProfileSession(target, count, seconds, chat_ids)
+        session.timer = asyncio.get_running_loop().call_later(
+            seconds, lambda: asyncio.create_task(self._finish(session, "time limit"))
+        )
+        self._session = session
+        logger.info("Profiling armed: next %s %s runs, up to %ss", count, target, seconds)
+        return True
+
+    @asynccontextmanager
+    async def capture(self, target: str):
+        """Обёртка выполнения цели; без активной сессии почти ничего не стоит"""
+        session = self._session
+        if session is None or session.target != target or session.remaining <= 0:
+            yield
+            return
+
+        session.remaining -= 1
+        # Параллельные апдейты попадают в один включённый профиль
+        if session.active == 0:
+            session.profile.enable()
+        session.active += 1
+        try:
+            yield
+        finally:
+            session.active -= 1
+            if session.active == 0:
+                session.profile.disable()
+            session.captured += 1
+            if session.remaining <= 0 and session.active == 0:
+                await self._finish(session, "done")
+
+    async def _finish(self, session: _ProfileSession, reason: str):
+        if self._session is not session:
+            return
+        self._session = None
+        if session.timer is not None:
+            session.timer.cancel()
+        if session.active:
+            session.profile.disable()
+
+        report = _format_report(session, reason)
+        logger.info("Profiling of %s finished (%s): %s runs", session.target, reason, session.captured)
+        await _send_report(session, report)
+
+
+def _format_report(session: _ProfileSession, reason: str) -> str:
+    out = io.StringIO()
+    out.write(
+        f"Target: {session.target}, captured: {session.captured}, finished: {reason}\n"
+        f"Started: {session.started_at:%Y-%m-%d %H:%M:%S} UTC\n"
+        "Note: cProfile covers the whole event loop thread while a run is in progress,\n"
+        "so concurrent coroutines are included.\n\n"
+    )
+    if session.captured == 0:
+        out.write("Nothing was captured.\n")
+        return out.getvalue()
+    stats = pstats.Stats(session.profile, stream=out)
+    stats.strip_dirs()
+    out.write("=== by cumulative time ===\n")
+    stats.sort_stats("cumulative").print_stats(REPORT_LINES)
+    out.write("=== by own time ===\n")
+    stats.sort_stats("tottime").print_stats(REPORT_LINES)
+    return out.getvalue()
+
+
+async def _send_report(session: _ProfileSession, report: str):
+    # Импорт здесь: dispatcher сам импортирует хендлеры, которые используют этот модуль
+    from aiogram.types import BufferedInputFile
+    from app.bot.dispatcher import bot
+
+    filename = f"profile_{session.target}_{session.started_at:%Y%m%d_%H%M%S}.txt"
+    for chat_id in session.chat_ids:
+        try:
+            await bot.send_document(
+                chat_id,
+                BufferedInputFile(report.encode(), filename=filename),
+                caption=f"⏱ Профиль {session.target}: {session.captured} выполнений",
+            )
+        except Exception as e:
+            logger.error("Failed to send profile report to %s: %s", chat_id, e)
+
+
+async def request_profile(target: str, count: int, seconds: int, chat_ids: List[int]) -> str:
+    """
+    Запуск сессии профилирования из команды бота или HTTP.
+    Возвращает описание для ответа администратору; ValueError - неверные параметры.
+    """
+    if target not in PROFILE_LIMITS:
+        raise ValueError(f"target must be one of {', '.join(PROFILE_LIMITS)}")
+    count = max(1, min(count, PROFILE_LIMITS[target]))
+    seconds = max(1, min(seconds, MAX_PROFILE_SECONDS))
+
+    if target == TARGET_SYNC and settings.APP_ROLE == "web":
+        # Синхронизация выполняется в app.worker; запрос он получает через LISTEN,
+        # который включён при тех же условиях, что и в scheduler._notify_listen
+        if settings.DB_DIALECT != "postgresql":
+            raise ValueError("profiling the worker needs Postgres NOTIFY, use APP_ROLE=all with SQLite")
+        if not settings.NOTIFY_LISTEN:
+            raise ValueError("app.worker does not listen for profile requests with NOTIFY_LISTEN=false")
+        payload = json.dumps({"target": target, "count": count, "seconds": seconds, "chat_ids": chat_ids})
+        async with async_session() as session:
+            await session.execute(
+                text("SELECT pg_notify(:channel, :payload)"),
+                {"channel": PROFILE_CHANNEL, "payload": payload}
+            )
+            await session.commit()
+        return f"запрос отправлен в app.worker: {count} запусков, не дольше {seconds} с"
+
+    if not profiler.arm(target, count, seconds, chat_ids):
+        return "уже идёт другая сессия профилирования"
+    return f"профилируются следующие {count} выполнений, не дольше {seconds} с"
+
+
+def handle_profile_notify(payload: str):
+    """Запрос из канала PROFILE_CHANNEL (вызывается слушателем в app.worker)"""
+    try:
+        request = json.loads(payload)
+        armed = profiler.arm(request["target"], request["count"], request["seconds"], request["chat_ids"])
+    except Exception as e:
+        logger.error("Invalid profile request %r: %s", payload, e)
+        return
+    if not armed:
+        logger.warning("Profile request ignored: another session is running")
+
+
+profiler = OnDemandProfiler()
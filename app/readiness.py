@@ -0,0 +1,119 @@
+# app/readiness.py
+"""
+Проверка готовности для /ready. В отличие от /health, который отвечает,
+пока жив процесс, здесь проверяется, что реплика действительно работает:
+
+- БД отвечает на SELECT 1 за READY_DB_TIMEOUT секунд (в том числе когда
+  пул соединений исчерпан);
+- по каждому филиалу последний успешный sync_records был не раньше
+  READY_MAX_SYNC_AGE секунд назад, а курсор SyncState.last_checked отстаёт
+  не больше чем на READY_MAX_SYNC_LAG секунд;
+- неуведомлённых строк bonuslog не больше READY_MAX_PENDING_NOTIFY, и самая
+  старая из них ждёт не дольше READY_MAX_NOTIFY_AGE секунд;
+- планировщик этого процесса (APP_ROLE=all или app.worker) запущен, и ни одно
+  задание не просрочено и не зависло.
+
+Порог 0 отключает соответствующую проверку (значение всё равно показывается).
+"""
+
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from sqlalchemy import func, text
+from sqlmodel import select
+
+from app.config import settings
+from app.db.models import BonusLog, SyncRun, SyncState
+from app.db.session import async_session
+from app.tasks.scheduler import scheduler_health
+
+# Отсчёт от старта процесса: до первого запуска синхронизации её отсутствие не ошибка
+_started = time.monotonic()
+
+
+def _aware(moment: Optional[datetime]) -> Optional[datetime]:
+    # SQLite возвращает наивное время, в БД оно всегда UTC
+    if moment is not None and moment.tzinfo is None:
+        return moment.replace(tzinfo=timezone.utc)
+    return moment
+
+
+def _age(moment: Optional[datetime], now: datetime) -> Optional[float]:
+    moment = _aware(moment)
+    return round((now - moment).total_seconds(), 1) if moment else None
+
+
+def _over(value: Optional[float], limit: float) -> bool:
+    return bool(limit) and value is not None and value > limit
+
+
+async def _db_checks(now: datetime, failures: List[str]) -> dict:
+    async with async_session() as session:
+        await session.execute(text("SELECT 1"))
+
+        states = (await session.execute(select(SyncState))).scalars().all()
+        # Успешный запуск сдвинул курсор на конец своего окна
+        last_ok = dict((await session.execute(
+            select(SyncRun.company_id, func.max(SyncRun.finished_at))
+            .where(SyncRun.cursor == SyncRun.window_end)
+            .group_by(SyncRun.company_id)
+        )).all())
+        pending, oldest = (await session.execute(
+            select(func.count(), func.min(BonusLog.awarded_at))
+            .where(BonusLog.is_telegram_notified == False)
+        )).one()
+
+    sync = {}
+    uptime = time.monotonic() - _started
+    for company_id in sorted({settings.COMPANY_ID, *(s.company_id for s in states)}):
+        state = next((s for s in states if s.company_id == company_id), None)
+        age = _age(last_ok.get(company_id), now)
+        lag = _age(state.last_checked, now) if state else None
+        sync[company_id] = {"last_success_age": age, "cursor_lag": lag}
+
+        if age is None:
+            # Ни одного успешного запуска: ошибка, только если процесс давно работает
+            if settings.READY_MAX_SYNC_AGE and uptime > settings.READY_MAX_SYNC_AGE:
+                failures.append(f"sync {company_id}: no successful run")
+        elif _over(age, settings.READY_MAX_SYNC_AGE):
+            failures.append(f"sync {company_id}: last success {age:.0f}s ago")
+        if _over(lag, settings.READY_MAX_SYNC_LAG):
+            failures.append(f"sync {company_id}: cursor lags {lag:.0f}s")
+
+    oldest_age = _age(oldest, now)
+    if settings.READY_MAX_PENDING_NOTIFY and pending > settings.READY_MAX_PENDING_NOTIFY:
+        failures.append(f"notifications: {pending} pending")
+    if _over(oldest_age, settings.READY_MAX_NOTIFY_AGE):
+        failures.append(f"notifications: oldest pending {oldest_age:.0f}s")
+
+    return {
+        "sync": sync,
+        "notifications": {"pending": pending, "oldest_age": oldest_age},
+    }
+
+
+async def check_readiness() -> dict:
+    """Состояние реплики: status ok/fail, список нарушенных порогов и значения проверок"""
+    now = datetime.now(timezone.utc)
+    failures: List[str] = []
+    report = {}
+
+    started = time.perf_counter()
+    try:
+        report.update(await asyncio.wait_for(_db_checks(now, failures), settings.READY_DB_TIMEOUT))
+        report["db"] = {"ok": True}
+    except asyncio.TimeoutError:
+        failures.append(f"db: no answer in {settings.READY_DB_TIMEOUT}s")
+        report["db"] = {"ok": False, "error": "timeout"}
+    except Exception as e:
+        failures.append("db: unavailable")
+        report["db"] = {"ok": False, "error": str(e)[:200]}
+    report["db"]["seconds"] = round(time.perf_counter() - started, 3)
+
+    # При APP_ROLE=web задания выполняет app.worker - в этом процессе их нет
+    if settings.APP_ROLE != "web":
+        report["scheduler"] = scheduler_health(now, failures)
+
+    return {"status": "fail" if failures else "ok", "failures": failures, **report}
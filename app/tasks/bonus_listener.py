@@ -0,0 +1,90 @@
+# app/tasks/bonus_listener.py
+
+import asyncio
+import logging
+from typing import Optional
+
+import asyncpg
+
+from app.config import settings
+from app.bot.services.loyalty import BONUS_CHANNEL
+from app.profiling import PROFILE_CHANNEL, handle_profile_notify
+from app.tasks.notify_bonuses import notify_new_bonuses
+
+logger = logging.getLogger(__name__)
+
+# Пауза перед переподключением после обрыва соединения (сек)
+RECONNECT_DELAY = 5
+
+
+class BonusListener:
+    """
+    Слушает канал BONUS_CHANNEL на отдельном соединении asyncpg и сразу
+    запускает notify_new_bonuses. Пачка NOTIFY за время одного прохода
+    схлопывается в один следующий проход. После (пере)подключения делается
+    разовый проход - на случай уведомлений, пропущенных без соединения.
+    Периодический опрос в планировщике остаётся как страховка.
+    """
+
+    def __init__(self, dsn: str):
+        self.dsn = dsn
+        self._wake = asyncio.Event()
+        self._tasks = []
+
+    def start(self):
+        self._tasks = [
+            asyncio.create_task(self._listen(), name="bonus_listener"),
+            asyncio.create_task(self._dispatch(), name="bonus_dispatcher"),
+        ]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def _on_notify(self, connection, pid, channel, payload):
+        self._wake.set()
+
+    def _on_profile_request(self, connection, pid, channel, payload):
+        handle_profile_notify(payload)
+
+    async def _listen(self):
+        while True:
+            conn: Optional[asyncpg.Connection] = None
+            try:
+                conn = await asyncpg.connect(self.dsn)
+                lost = asyncio.Event()
+                conn.add_termination_listener(lambda _: lost.set())
+                await conn.add_listener(BONUS_CHANNEL, self._on_notify)
+                # Запросы /profile sync из веб-процесса (app/profiling.py)
+                await conn.add_listener(PROFILE_CHANNEL, self._on_profile_request)
+                logger.info("Listening for %s notifications", BONUS_CHANNEL)
+                self._wake.set()
+                await lost.wait()
+                logger.warning("LISTEN connection lost, reconnecting")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("LISTEN connection failed: %s", e)
+            finally:
+                if conn is not None and not conn.is_closed():
+                    await conn.close()
+            await asyncio.sleep(RECONNECT_DELAY)
+
+    async def _dispatch(self):
+        while True:
+            await self._wake.wait()
+            self._wake.clear()
+            try:
+                await notify_new_bonuses()
+            except Exception as e:
+                logger.exception("notify_new_bonuses failed: %s", e)
+
+
+def _asyncpg_dsn(url: str) -> str:
+    # asyncpg не понимает суффикс драйвера SQLAlchemy
+    return url.replace("postgresql+asyncpg://", "postgresql://", 1)
+
+
+bonus_listener = BonusListener(_asyncpg_dsn(settings.DATABASE_URL))
@@ -0,0 +1,138 @@
+# app/tasks/bonuslog_partitions.py
+
+import gzip
+import logging
+import os
+import re
+from datetime import date, datetime, timezone
+from pathlib import Path
+from typing import List, Tuple
+
+from sqlalchemy import text
+
+from app.config import settings
+from app.db.session import engine
+
+logger = logging.getLogger(__name__)
+
+# На сколько месяцев вперёд держать секции созданными
+PARTITIONS_AHEAD = 3
+
+_PARTITION_RE = re.compile(r"^bonuslog_(\d{4})_(\d{2})$")
+
+
+async def maintain_bonuslog_partitions():
+    """
+    Обслуживание секций bonuslog (раз в сутки):
+      - создаёт секции на PARTITIONS_AHEAD месяцев вперёд;
+      - при BONUSLOG_RETENTION_MONTHS > 0 выгружает секции старше срока
+        в BONUSLOG_ARCHIVE_DIR (csv.gz), отсоединяет и удаляет их.
+    Уникальность начислений при этом не страдает: она держится на
+    recordfingerprint.record_id, который не архивируется.
+    """
+    try:
+        async with engine.connect() as conn:
+            if conn.dialect.name != "postgresql" or not await _is_partitioned(conn):
+                return
+            current = datetime.now(timezone.utc).date().replace(day=1)
+            await _create_upcoming(conn, current)
+            if settings.BONUSLOG_RETENTION_MONTHS > 0:
+                await _archive_old(conn, current)
+    except Exception as e:
+        logger.exception("Bonuslog partition maintenance failed: %s", e)
+
+
+def _add_months(month: date, months: int) -> date:
+    total = month.year * 12 + month.month - 1 + months
+    return date(total // 12, total % 12 + 1, 1)
+
+
+async def _is_partitioned(conn) -> bool:
+    result = await conn.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('bonuslog'))"
+    ))
+    return bool(result.scalar())
+
+
+async def _monthly_partitions(conn) -> List[Tuple[date, str]]:
+    """Месячные секции bonuslog (без секции по умолчанию), от старых к новым"""
+    result = await conn.execute(text("""
+        SELECT c.relname FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'bonuslog'::regclass
+    """))
+    partitions = []
+    for (name,) in result.all():
+        m = _PARTITION_RE.match(name)
+        if m:
+            partitions.append((date(int(m.group(1)), int(m.group(2)), 1), name))
+    await conn.commit()
+    return sorted(partitions)
+
+
+async def _create_upcoming(conn, current: date):
+    for offset in range(PARTITIONS_AHEAD + 1):
+        month = _add_months(current, offset)
+        following = _add_months(month, 1)
+        try:
+            await conn.execute(text(
+                f"CREATE TABLE IF NOT EXISTS bonuslog_{month:%Y_%m} PARTITION OF bonuslog "
+                f"FOR VALUES FROM ('{month:%Y-%m-%d} 00:00:00+00') TO ('{following:%Y-%m-%d} 00:00:00+00')"
+            ))
+            await conn.commit()
+        except Exception as e:
+            # Например, в bonuslog_default уже есть строки этого месяца
+            await conn.rollback()
+            logger.error("Cannot create bonuslog partition for %s: %s", month, e)
+
+
+async def _archive_old(conn, current: date):
+    retention = settings.BONUSLOG_RETENTION_MONTHS
+    if settings.POINTS_EXPIRY_MONTHS > 0 and retention <= settings.POINTS_EXPIRY_MONTHS:
+        # Сгорание считает FIFO по всем начислениям, старше срока жизни баллов
+        # журнал архивировать нельзя
+        logger.warning(
+            "BONUSLOG_RETENTION_MONTHS=%s must exceed POINTS_EXPIRY_MONTHS=%s, archiving skipped",
+            retention, settings.POINTS_EXPIRY_MONTHS
+        )
+        return
+
+    cutoff = _add_months(current, -retention)
+    archive_dir = Path(settings.BONUSLOG_ARCHIVE_DIR)
+    archive_dir.mkdir(parents=True, exist_ok=True)
+
+    for month, name in await _monthly_partitions(conn):
+        if month >= cutoff:
+            break
+        pending = (await conn.execute(
+            text(f"SELECT count(*) FROM {name} WHERE NOT is_telegram_notified")
+        )).scalar()
+        await conn.commit()
+        if pending:
+            logger.warning("Partition %s has %s pending notifications, not archived yet", name, pending)
+            continue
+
+        path = archive_dir / f"{name}.csv.gz"
+        rows = await _dump_partition(conn, name, path)
+
+        # Файл уже на диске - секцию можно отсоединить и удалить
+        await conn.execute(text(f"ALTER TABLE bonuslog DETACH PARTITION {name}"))
+        await conn.execute(text(f"DROP TABLE {name}"))
+        await conn.commit()
+        logger.info("Archived bonuslog partition %s: %s rows -> %s", name, rows, path)
+
+
+async def _dump_partition(conn, name: str, path: Path) -> int:
+    """COPY секции в csv.gz; файл появляется под итоговым именем только целиком"""
+    tmp_path = path.with_name(path.name + ".tmp")
+    raw = await conn.get_raw_connection()
+    with gzip.open(tmp_path, "wb") as fh:
+        status = await raw.driver_connection.copy_from_table(
+            name, output=fh, format="csv", header=True
+        )
+        fh.flush()
+    with open(tmp_path, "rb") as fh:
+        os.fsync(fh.fileno())
+    os.replace(tmp_path, path)
+    # status вида "COPY 1234"
+    return int(status.split()[-1])
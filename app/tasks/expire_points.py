@@ -0,0 +1,227 @@
+# app/tasks/expire_points.py
+
+import calendar
+import logging
+from datetime import datetime, timedelta, timezone
+
+from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+from sqlalchemy import case, func, insert, literal, true, update
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+from sqlmodel import select
+
+from app.db.models import BonusLog, Clients, KIND_EXPIRE, NOTIFY_SKIPPED
+from app.db.session import async_session
+from app.bot.services.stats import bump_daily_stats
+from app.bot.services.delivery import deliver, mark_unreachable, SENT, UNREACHABLE
+from app.bot.dispatcher import bot
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+async def expire_points():
+    """
+    Ежедневное сгорание баллов старше POINTS_EXPIRY_MONTHS месяцев.
+    Все суммы считаются одним агрегирующим запросом по bonuslog,
+    списание и запись в журнал - одним INSERT ... SELECT в одной транзакции.
+    """
+    months = settings.POINTS_EXPIRY_MONTHS
+    if months <= 0:
+        return
+
+    # awarded_at пишется как наивное UTC-время (см. award_points)
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    cutoff = _months_ago(now, months)
+
+    try:
+        async with async_session() as session:
+            if session.bind.dialect.name == "postgresql":
+                result = await session.execute(_expire_statement(cutoff, now))
+                rows = result.all()
+            else:
+                rows = await _expire_stepwise(session, cutoff, now)
+            expired = -sum(points for (points,) in rows)
+            if expired:
+                await bump_daily_stats(session, points_expired=expired)
+            await session.commit()
+        logger.info(
+            "Expired %s pts for %s clients (awarded before %s)",
+            expired, len(rows), cutoff.isoformat()
+        )
+    except Exception as e:
+        logger.exception("Points expiry failed: %s", e)
+        return
+
+    if settings.POINTS_EXPIRY_NOTIFY_DAYS > 0:
+        await _notify_expiring(now, months, settings.POINTS_EXPIRY_NOTIFY_DAYS)
+
+
+def _months_ago(moment: datetime, months: int) -> datetime:
+    """Тот же день N месяцев назад (с поправкой на длину месяца)."""
+    total = moment.year * 12 + moment.month - 1 - months
+    year, month = divmod(total, 12)
+    day = min(moment.day, calendar.monthrange(year, month + 1)[1])
+    return moment.replace(year=year, month=month + 1, day=day)
+
+
+class _least(FunctionElement):
+    """least(a, b, ...); в SQLite то же делает min с несколькими аргументами"""
+    name = "least"
+    inherit_cache = True
+
+
+@compiles(_least)
+def _compile_least(element, compiler, **kw):
+    return f"least({compiler.process(element.clauses, **kw)})"
+
+
+@compiles(_least, "sqlite")
+def _compile_least_sqlite(element, compiler, **kw):
+    return f"min({compiler.process(element.clauses, **kw)})"
+
+
+def _expiring_amounts(cutoff: datetime):
+    """
+    Сколько баллов каждого клиента сгорит к моменту cutoff.
+    Списания погашают самые старые начисления первыми (FIFO): всего потрачено
+    total_earned - points, поэтому из начисленного до cutoff остаётся
+    old_earned - (total_earned - points), но не больше текущего баланса.
+    """
+    earned = (
+        select(
+            BonusLog.client_id,
+            func.coalesce(
+                func.sum(BonusLog.points).filter(BonusLog.awarded_at < cutoff), 0
+            ).label("old_earned"),
+            func.sum(BonusLog.points).label("total_earned"),
+        )
+        .where(BonusLog.points > 0)
+        .group_by(BonusLog.client_id)
+        .subquery("earned")
+    )
+    amount = _least(
+        Clients.points,
+        earned.c.old_earned,
+        earned.c.old_earned - (earned.c.total_earned - Clients.points),
+    )
+    return (
+        select(Clients.id.label("client_id"), Clients.telegram_user_id, amount.label("amount"))
+        .join(earned, earned.c.client_id == Clients.id)
+        .where(Clients.points > 0)
+    )
+
+
+def _expire_statement(cutoff: datetime, now: datetime):
+    """
+    WITH expiring AS (...), debited AS (UPDATE clients ... RETURNING)
+    INSERT INTO bonuslog SELECT ... FROM debited
+    """
+    expiring = _expiring_amounts(cutoff).cte("expiring")
+    debited = (
+        update(Clients)
+        .where(Clients.id == expiring.c.client_id, expiring.c.amount > 0)
+        .values(points=Clients.points - expiring.c.amount)
+        .returning(Clients.id.label("client_id"), expiring.c.amount)
+        .cte("debited")
+    )
+    # Сгорание не требует отдельного уведомления о начислении
+    return (
+        insert(BonusLog)
+        .from_select(
+            ["client_id", "points", "awarded_at", "is_telegram_notified", "notify_state", "kind"],
+            select(
+                debited.c.client_id,
+                -debited.c.amount,
+                literal(now),
+                true(),
+                literal(NOTIFY_SKIPPED),
+                literal(KIND_EXPIRE),
+            ),
+        )
+        .returning(BonusLog.points)
+    )
+
+
+async def _expire_stepwise(session, cutoff: datetime, now: datetime):
+    """
+    То же для SQLite, где нет UPDATE внутри WITH: суммы одним запросом,
+    затем один UPDATE clients и одна вставка в журнал. Записи в SQLite
+    идут по одной, баланс дополнительно ограничен снизу нулём.
+    """
+    result = await session.execute(_expiring_amounts(cutoff))
+    amounts = {client_id: amount for client_id, _, amount in result.all() if amount > 0}
+    if not amounts:
+        return []
+    await session.execute(
+        update(Clients)
+        .where(Clients.id.in_(list(amounts)))
+        .values(points=func.max(Clients.points - case(amounts, value=Clients.id), 0))
+        .execution_options(synchronize_session=False)
+    )
+    await session.execute(insert(BonusLog.__table__), [
+        {
+            "client_id": client_id,
+            "points": -amount,
+            "awarded_at": now,
+            "is_telegram_notified": True,
+            "notify_state": NOTIFY_SKIPPED,
+            "kind": KIND_EXPIRE,
+        }
+        for client_id, amount in amounts.items()
+    ])
+    return [(-amount,) for amount in amounts.values()]
+
+
+async def _notify_expiring(now: datetime, months: int, days: int):
+    """
+    Предупреждает клиентов, у которых баллы сгорят в ближайшие `days` дней.
+    Задача запускается раз в сутки, поэтому берём только тех, у кого
+    за последние сутки в окно предупреждения попало новое начисление -
+    так каждое предупреждение уходит один раз.
+    """
+    notify_cutoff = _months_ago(now + timedelta(days=days), months)
+    entered_window = (
+        select(BonusLog.id)
+        .where(
+            BonusLog.client_id == Clients.id,
+            BonusLog.points > 0,
+            BonusLog.awarded_at >= notify_cutoff - timedelta(days=1),
+            BonusLog.awarded_at < notify_cutoff,
+        )
+        .exists()
+    )
+    upcoming = (
+        _expiring_amounts(notify_cutoff)
+        .where(
+            Clients.telegram_user_id.is_not(None),
+            Clients.is_chat_unreachable == False,
+            entered_window,
+        )
+        .subquery("upcoming")
+    )
+
+    async with async_session() as session:
+        result = await session.execute(
+            select(upcoming.c.client_id, upcoming.c.telegram_user_id, upcoming.c.amount)
+            .where(upcoming.c.amount > 0)
+        )
+        recipients = result.all()
+
+        book_kb = InlineKeyboardMarkup(
+            inline_keyboard=[[InlineKeyboardButton(text="📅 Записаться", url=str(settings.YCLIENTS_BOOK_URL))]]
+        )
+        for client_id, telegram_user_id, amount in recipients:
+            outcome, _, error = await deliver(
+                bot,
+                telegram_user_id,
+                f"⏳ Через {days} дн. сгорят <b>{amount}</b> бонусов.\n"
+                "Успейте потратить их при следующем визите!",
+                parse_mode="HTML",
+                reply_markup=book_kb
+            )
+            if outcome == UNREACHABLE:
+                await mark_unreachable(session, client_id)
+                await session.commit()
+            elif outcome != SENT:
+                logger.error("Failed to send expiry warning to %s: %s", telegram_user_id, error)
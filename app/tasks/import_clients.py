@@ -0,0 +1,173 @@
+# app/tasks/import_clients.py
+"""
+Массовый импорт клиентов YCLIENTS в таблицу clients.
+
+    python -m app.tasks.import_clients --csv clients.csv
+    python -m app.tasks.import_clients --api
+
+Телефоны нормализуются к +7XXXXXXXXXX, строки загружаются через COPY во
+временную таблицу и сливаются в clients одним MERGE: новые номера
+добавляются, существующие клиенты не дублируются.
+"""
+
+import argparse
+import asyncio
+import csv
+import logging
+import time
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import text
+
+from app.api.yclients import YClientsAPI
+from app.bot.services.phones import normalize_phone
+from app.config import settings
+from app.db.session import async_session
+
+logger = logging.getLogger(__name__)
+
+# Варианты заголовков колонок в CSV-выгрузке YCLIENTS
+ID_HEADERS = ("id", "client_id", "id клиента")
+PHONE_HEADERS = ("phone", "телефон")
+NAME_HEADERS = ("name", "имя", "фио", "клиент")
+
+STAGING_TABLE = "client_import"
+
+ImportRow = Tuple[int, str, str]
+
+
+def read_csv(path: Path) -> Tuple[List[ImportRow], int]:
+    """Читает CSV-выгрузку, возвращает валидные строки и число отброшенных."""
+    rows: List[ImportRow] = []
+    rejected = 0
+    with open(path, encoding="utf-8-sig", newline="") as fh:
+        sample = fh.read(4096)
+        fh.seek(0)
+        dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+        reader = csv.DictReader(fh, dialect=dialect)
+        columns = {name.strip().lower(): name for name in reader.fieldnames or []}
+        id_col = _pick_column(columns, ID_HEADERS)
+        phone_col = _pick_column(columns, PHONE_HEADERS)
+        name_col = _pick_column(columns, NAME_HEADERS)
+        if not id_col or not phone_col:
+            raise ValueError(f"CSV must contain id and phone columns, got: {reader.fieldnames}")
+
+        for raw in reader:
+            row = _to_row(raw.get(id_col), raw.get(phone_col), raw.get(name_col) if name_col else "")
+            if row:
+                rows.append(row)
+            else:
+                rejected += 1
+    return rows, rejected
+
+
+async def fetch_from_api(page_size: int = 200) -> Tuple[List[ImportRow], int]:
+    """Постранично выкачивает всю базу клиентов филиала из API."""
+    rows: List[ImportRow] = []
+    rejected = 0
+    api = YClientsAPI()
+    page = 1
+    try:
+        while True:
+            data = await api.search_clients(page=page, page_size=page_size)
+            for yc in data:
+                row = _to_row(yc.get("id"), yc.get("phone"), yc.get("name"))
+                if row:
+                    rows.append(row)
+                else:
+                    rejected += 1
+            if len(data) < page_size:
+                break
+            page += 1
+    finally:
+        await api.close()
+    return rows, rejected
+
+
+async def import_clients(rows: Iterable[ImportRow]) -> int:
+    """
+    COPY во временную таблицу и один MERGE в clients в одной транзакции.
+    Дубликаты внутри файла схлопываются по телефону, уже известные
+    телефоны не вставляются повторно (у них только заполняется пустое имя).
+    Возвращает число затронутых строк clients.
+    """
+    async with async_session() as session:
+        conn = await session.connection()
+        await conn.execute(text(
+            f"CREATE TEMP TABLE {STAGING_TABLE} ("
+            " yclients_id integer NOT NULL,"
+            " phone_number varchar NOT NULL,"
+            " name varchar NOT NULL"
+            ") ON COMMIT DROP"
+        ))
+
+        raw = await conn.get_raw_connection()
+        await raw.driver_connection.copy_records_to_table(
+            STAGING_TABLE,
+            records=rows,
+            columns=["yclients_id", "phone_number", "name"],
+        )
+
+        result = await conn.execute(text(f"""
+            MERGE INTO clients AS c
+            USING (
+                SELECT DISTINCT ON (phone_number) yclients_id, phone_number, name
+                FROM {STAGING_TABLE}
+                ORDER BY phone_number, yclients_id DESC
+            ) AS s
+            ON c.phone_number = s.phone_number
+            WHEN MATCHED AND c.name = '' THEN
+                UPDATE SET name = s.name
+            WHEN NOT MATCHED THEN
+                INSERT (yclients_id, phone_number, name, points, is_in_loyalty)
+                VALUES (s.yclients_id, s.phone_number, s.name, 0, TRUE)
+        """))
+        await session.commit()
+        return result.rowcount
+
+
+def _pick_column(columns: dict, candidates: Tuple[str, ...]) -> Optional[str]:
+    for candidate in candidates:
+        if candidate in columns:
+            return columns[candidate]
+    return None
+
+
+def _to_row(yclients_id, phone, name) -> Optional[ImportRow]:
+    phone = normalize_phone(str(phone) if phone is not None else None)
+    try:
+        yclients_id = int(yclients_id)
+    except (TypeError, ValueError):
+        return None
+    if not phone:
+        return None
+    return yclients_id, phone, (name or "").strip()
+
+
+async def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Bulk import of YCLIENTS clients")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--csv", type=Path, help="CSV-выгрузка клиентов из YCLIENTS")
+    source.add_argument("--api", action="store_true", help="выкачать клиентов через API")
+    args = parser.parse_args(argv)
+    if settings.DB_DIALECT != "postgresql":
+        # COPY и MERGE есть только в Postgres
+        parser.error("bulk import needs Postgres; with SQLite clients are added on registration")
+
+    started = time.perf_counter()
+    if args.csv:
+        rows, rejected = read_csv(args.csv)
+    else:
+        rows, rejected = await fetch_from_api()
+    loaded = time.perf_counter()
+    print(f"read {len(rows)} rows ({rejected} rejected) in {loaded - started:.2f}s")
+
+    affected = await import_clients(rows)
+    finished = time.perf_counter()
+    print(f"copy + merge: {affected} clients inserted/updated in {finished - loaded:.2f}s")
+    print(f"total: {finished - started:.2f}s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
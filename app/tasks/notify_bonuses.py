@@ -1,41 +1,149 @@
 # app/tasks/notify_bonuses.py
 
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+from sqlalchemy import and_, func, or_, update
+
 from app.db.session import async_session
-from app.db.models import BonusLog, Clients
+from app.db.models import (
+    BonusLog,
+    Clients,
+    NOTIFY_FAILED,
+    NOTIFY_SENT,
+    NOTIFY_SKIPPED,
+)
 from app.bot.dispatcher import bot
+from app.bot.services.delivery import deliver, mark_unreachable, FAILED, SENT, UNREACHABLE
 from app.config import settings
 from sqlmodel import select
 
+logger = logging.getLogger(__name__)
+
+# Сколько строк обрабатывать за один проход
+NOTIFY_BATCH_SIZE = 500
+# После стольких неудачных попыток уведомление переводится в failed
+MAX_NOTIFY_ATTEMPTS = 8
+# Экспоненциальная пауза между попытками: 1, 2, 4 ... минут, но не больше 6 часов
+RETRY_BASE_SECONDS = 60
+RETRY_MAX_SECONDS = 6 * 3600
+
+# Проход запускается и по NOTIFY, и страховочным опросом - не даём им
+# выполняться одновременно, иначе одно начисление уйдёт клиенту дважды
+_notify_lock = asyncio.Lock()
+
+
 async def notify_new_bonuses():
+    async with _notify_lock:
+        await _notify_pending()
+
+
+async def _notify_pending():
+    now = datetime.now(timezone.utc)
+    due = and_(
+        BonusLog.is_telegram_notified == False,
+        or_(BonusLog.notify_next_at.is_(None), BonusLog.notify_next_at <= now),
+    )
     async with async_session() as session:
-        # выбираем все не­уведомлённые записи
+        # Строки клиентов, которым отправлять некому, закрываем одним UPDATE
+        await _skip_unreachable(session)
+        await session.commit()
+
+        # Неуведомлённые начисления сгруппированы по клиенту: одно сообщение
+        # на клиента с общей суммой, сколько бы визитов ни накопилось
+        groups = (
+            select(
+                BonusLog.client_id,
+                func.sum(BonusLog.points).label("points"),
+                func.count().label("visits"),
+                func.max(BonusLog.id).label("last_id"),
+                func.max(BonusLog.notify_attempts).label("attempts"),
+            )
+            .where(due)
+            .group_by(BonusLog.client_id)
+            .order_by(func.min(BonusLog.id))
+            .limit(NOTIFY_BATCH_SIZE)
+            .subquery("groups")
+        )
         result = await session.execute(
-            select(BonusLog, Clients)
-            .join(Clients, BonusLog.client_id == Clients.id)
-            .where(BonusLog.is_telegram_notified == False)
+            select(groups, Clients).join(Clients, Clients.id == groups.c.client_id)
+        )
+
+        # Кнопка Яндекс.Карты
+        maps_kb = InlineKeyboardMarkup(
+            inline_keyboard=[
+                [InlineKeyboardButton(text="📍 Мы на Яндекс.Картах", url=settings.COMPANY_YMAPS_LINK)]
+            ]
         )
-        for bonuslog, client in result.fetchall():
-            # если у клиента есть telegram_user_id - шлём ему сообщение
-            if client.telegram_user_id:
-                try:
-                    # Кнопка Яндекс.Карты
-                    from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-                    maps_kb = InlineKeyboardMarkup(
-                        inline_keyboard=[
-                            [InlineKeyboardButton(text="📍 Мы на Яндекс.Картах", url=settings.COMPANY_YMAPS_LINK)]
-                        ]
-                    )
-                    await bot.send_message(
-                        client.telegram_user_id,
-                        f"🎉 За ваш последний визит начислено <b>{bonuslog.points}</b> бонусов!\n"
-                        "Пожалуйста, оцените нас на Яндекс.Картах, если Вам понравились наши услуги!",
-                        parse_mode="HTML",
-                        reply_markup=maps_kb
-                    )
-                    # помечаем, что уведомление отправлено
-                    bonuslog.is_telegram_notified = True
-                    session.add(bonuslog)
-                    await session.commit()
-                except Exception as e:
-                    # логируем ошибку
-                    print(f"[ERROR] Не удалось отправить уведомление: {e}")
+        for client_id, points, visits, last_id, attempts, client in result.all():
+            if visits == 1:
+                headline = f"🎉 За ваш последний визит начислено <b>{points}</b> бонусов!\n"
+            else:
+                headline = f"🎉 За ваши последние визиты ({visits}) начислено <b>{points}</b> бонусов!\n"
+            outcome, retry_after, error = await deliver(
+                bot,
+                client.telegram_user_id,
+                headline +
+                f"💳 Ваш баланс: <b>{client.points}</b> баллов\n"
+                "Пожалуйста, оцените нас на Яндекс.Картах, если Вам понравились наши услуги!",
+                parse_mode="HTML",
+                reply_markup=maps_kb
+            )
+
+            # Все строки группы закрываются одним UPDATE; строки, появившиеся
+            # после выборки (id > last_id), уйдут следующим проходом
+            await session.execute(
+                update(BonusLog)
+                .where(BonusLog.client_id == client_id, BonusLog.id <= last_id, due)
+                .values(
+                    notify_attempts=BonusLog.notify_attempts + 1,
+                    **_outcome_values(outcome, retry_after, error, attempts + 1, now)
+                )
+                .execution_options(synchronize_session=False)
+            )
+            if outcome == UNREACHABLE:
+                await mark_unreachable(session, client_id)
+            await session.commit()
+
+            if outcome != SENT:
+                logger.warning(
+                    "Bonus notification for client %s (%s rows): %s (%s), attempt %s",
+                    client_id, visits, outcome, error, attempts + 1
+                )
+
+
+async def _skip_unreachable(session):
+    """Неуведомлённые строки клиентов без Telegram или с недоступным чатом"""
+    unreachable = select(Clients.id).where(
+        or_(Clients.telegram_user_id.is_(None), Clients.is_chat_unreachable == True)
+    )
+    await session.execute(
+        update(BonusLog)
+        .where(BonusLog.is_telegram_notified == False, BonusLog.client_id.in_(unreachable))
+        .values(is_telegram_notified=True, notify_state=NOTIFY_SKIPPED)
+    )
+
+
+def _outcome_values(
+    outcome: str,
+    retry_after: Optional[float],
+    error: Optional[str],
+    attempt: int,
+    now: datetime
+) -> dict:
+    """Новые значения полей доставки по результату попытки номер `attempt`"""
+    error = error[:255] if error else None
+    if outcome == SENT:
+        return {"is_telegram_notified": True, "notify_state": NOTIFY_SENT, "notify_next_at": None}
+    if outcome == UNREACHABLE:
+        return {"is_telegram_notified": True, "notify_state": NOTIFY_SKIPPED,
+                "notify_next_at": None, "notify_error": error}
+    if outcome == FAILED or attempt >= MAX_NOTIFY_ATTEMPTS:
+        return {"is_telegram_notified": True, "notify_state": NOTIFY_FAILED,
+                "notify_next_at": None, "notify_error": error}
+    # RETRY
+    delay = retry_after or min(RETRY_BASE_SECONDS * 2 ** (attempt - 1), RETRY_MAX_SECONDS)
+    return {"notify_next_at": now + timedelta(seconds=delay), "notify_error": error}
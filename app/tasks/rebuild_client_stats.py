@@ -0,0 +1,128 @@
+# app/tasks/rebuild_client_stats.py
+"""
+Полный пересчёт сводок клиентов clientstats.
+
+    python -m app.tasks.rebuild_client_stats
+
+В обычной работе сводки обновляются в тех же транзакциях, что и баллы
+(bump_client_stats). Пересчёт нужен после ручных правок в БД или если
+счётчики разошлись с журналом: визиты и сумма берутся из recordfingerprint,
+баллы и время последнего визита - из bonuslog. Секции bonuslog, уже
+отправленные в архив, в пересчёт не попадают.
+
+Корректировки без записи (record_id пусто) - это расхождения баланса с
+журналом, найденные миграцией 7e2d9b41c0a6: баллы, начисленные или списанные
+когда-то мимо журнала. Положительная входит в начисленные, отрицательная -
+в потраченные.
+"""
+
+import argparse
+import asyncio
+import time
+from typing import List, Optional
+
+from sqlalchemy import and_, case, delete, func, insert, or_, select, text
+
+from app.db.models import (
+    BonusLog,
+    ClientStats,
+    Clients,
+    KIND_ADJUST,
+    KIND_AWARD,
+    KIND_CREDIT,
+    KIND_REDEEM,
+    RecordFingerprint,
+)
+from app.db.session import async_session
+
+# Операции журнала, которые входят в points_earned (плюс корректировки по записям)
+EARNED_KINDS = (KIND_AWARD, KIND_CREDIT)
+
+
+def client_stats_select():
+    """SELECT сводок всех клиентов, у которых есть записи или операции с баллами"""
+    fp = RecordFingerprint.__table__
+    log = BonusLog.__table__
+
+    # Запись, учтённая до колонки amount, считается оплаченной по баллам
+    paid = func.coalesce(fp.c.amount, fp.c.points) > 0
+    records = (
+        select(
+            fp.c.client_id,
+            func.sum(case((paid, 1), else_=0)).label("visits"),
+            func.sum(fp.c.amount).label("spend"),
+        )
+        .group_by(fp.c.client_id)
+        .subquery()
+    )
+    record_adjust = and_(log.c.kind == KIND_ADJUST, log.c.record_id.is_not(None))
+    drift_adjust = and_(log.c.kind == KIND_ADJUST, log.c.record_id.is_(None))
+    earned = or_(log.c.kind.in_(EARNED_KINDS), record_adjust, and_(drift_adjust, log.c.points > 0))
+    redeemed = or_(log.c.kind == KIND_REDEEM, and_(drift_adjust, log.c.points < 0))
+    points = (
+        select(
+            log.c.client_id,
+            func.sum(case((earned, log.c.points), else_=0)).label("earned"),
+            func.sum(case((redeemed, -log.c.points), else_=0)).label("redeemed"),
+        )
+        .group_by(log.c.client_id)
+        .subquery()
+    )
+    # Последний визит - начисление или положительная корректировка по оплаченной записи
+    visits = (
+        select(log.c.client_id, func.max(log.c.awarded_at).label("last_visit_at"))
+        .join(fp, fp.c.record_id == log.c.record_id)
+        .where(or_(log.c.kind == KIND_AWARD, and_(log.c.kind == KIND_ADJUST, log.c.points > 0)), paid)
+        .group_by(log.c.client_id)
+        .subquery()
+    )
+
+    clients = Clients.__table__
+    return (
+        select(
+            clients.c.id,
+            func.coalesce(records.c.visits, 0),
+            func.coalesce(records.c.spend, 0),
+            func.coalesce(points.c.earned, 0),
+            func.coalesce(points.c.redeemed, 0),
+            visits.c.last_visit_at,
+        )
+        .select_from(
+            clients
+            .outerjoin(records, records.c.client_id == clients.c.id)
+            .outerjoin(points, points.c.client_id == clients.c.id)
+            .outerjoin(visits, visits.c.client_id == clients.c.id)
+        )
+        .where(or_(records.c.client_id.is_not(None), points.c.client_id.is_not(None)))
+    )
+
+
+async def rebuild_client_stats() -> int:
+    """Пересчитывает clientstats одной транзакцией, возвращает число сводок"""
+    table = ClientStats.__table__
+    async with async_session() as session:
+        if session.bind.dialect.name == "postgresql":
+            # Начисления, пришедшие во время пересчёта, ждут его окончания, а не теряются
+            await session.execute(text("LOCK TABLE clientstats IN EXCLUSIVE MODE"))
+        await session.execute(delete(table))
+        result = await session.execute(
+            insert(table).from_select(
+                ["client_id", "visits", "spend", "points_earned", "points_redeemed", "last_visit_at"],
+                client_stats_select(),
+            )
+        )
+        await session.commit()
+    return result.rowcount
+
+
+async def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Rebuild per-client stats from recordfingerprint and bonuslog")
+    parser.parse_args(argv)
+
+    started = time.perf_counter()
+    count = await rebuild_client_stats()
+    print(f"rebuilt {count} client stats in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,125 @@
+# app/tasks/scheduler.py
+
+import logging
+from datetime import datetime, timezone
+from typing import Dict, List
+
+from apscheduler.events import (
+    EVENT_JOB_ERROR,
+    EVENT_JOB_EXECUTED,
+    EVENT_JOB_MAX_INSTANCES,
+    EVENT_JOB_MISSED,
+)
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+
+from app.config import settings
+from app.tasks.notify_bonuses import notify_new_bonuses
+from app.tasks.sync_bonuses import sync_records
+from app.tasks.expire_points import expire_points
+from app.tasks.bonus_listener import bonus_listener
+from app.tasks.bonuslog_partitions import maintain_bonuslog_partitions
+
+logger = logging.getLogger(__name__)
+
+# Инициализация планировщика
+scheduler = AsyncIOScheduler()
+
+# Последнее событие каждого задания (для /ready): id -> {"event", "at"}
+job_events: Dict[str, dict] = {}
+
+_EVENT_NAMES = {
+    EVENT_JOB_EXECUTED: "executed",
+    EVENT_JOB_ERROR: "error",
+    EVENT_JOB_MISSED: "missed",
+    EVENT_JOB_MAX_INSTANCES: "max_instances",
+}
+
+
+def _on_job_event(event):
+    job_events[event.job_id] = {"event": _EVENT_NAMES[event.code], "at": datetime.now(timezone.utc)}
+
+
+def start_background_jobs():
+    """
+    Регистрация плановых заданий, запуск планировщика и слушателя NOTIFY.
+    Вызывается из app.worker или из lifespan веб-приложения при APP_ROLE=all.
+    """
+    scheduler.add_job(
+        func=sync_records,
+        trigger="interval",
+        seconds=60,
+        args=[settings.COMPANY_ID],
+        id="sync_records_job",
+        replace_existing=True
+    )
+    # С LISTEN/NOTIFY уведомления уходят сразу, опрос - только страховка
+    scheduler.add_job(
+        func=notify_new_bonuses,
+        trigger="interval",
+        seconds=settings.NOTIFY_SWEEP_SECONDS if _notify_listen() else 60,
+        id="notify_new_bonuses_job",
+        replace_existing=True
+    )
+    if settings.POINTS_EXPIRY_MONTHS > 0:
+        # Сгорание баллов раз в сутки, ночью
+        scheduler.add_job(
+            func=expire_points,
+            trigger="cron",
+            hour=3,
+            id="expire_points_job",
+            replace_existing=True
+        )
+    # Секции журнала баллов на будущие месяцы и архив старых
+    scheduler.add_job(
+        func=maintain_bonuslog_partitions,
+        trigger="cron",
+        hour=4,
+        id="bonuslog_partitions_job",
+        replace_existing=True
+    )
+    scheduler.add_listener(_on_job_event, sum(_EVENT_NAMES))
+    scheduler.start()
+    logger.info("Scheduler started with jobs: %s", ", ".join(job.id for job in scheduler.get_jobs()))
+
+    if _notify_listen():
+        bonus_listener.start()
+
+
+def _notify_listen() -> bool:
+    # LISTEN/NOTIFY есть только в Postgres
+    return settings.NOTIFY_LISTEN and settings.DB_DIALECT == "postgresql"
+
+
+async def stop_background_jobs():
+    if scheduler.running:
+        scheduler.shutdown(wait=False)
+    await bonus_listener.stop()
+    logger.info("Background jobs stopped")
+
+
+def scheduler_health(now: datetime, failures: List[str]) -> dict:
+    """
+    Состояние планировщика для /ready. Ошибка - планировщик остановлен,
+    задание просрочено больше чем на READY_SCHEDULER_GRACE секунд (цикл
+    событий завис) или пропущено, потому что предыдущий запуск ещё идёт.
+    Ошибки внутри заданий только показываются: ночное задание с ошибкой
+    не должно выводить реплику из работы на сутки.
+    """
+    if not scheduler.running:
+        failures.append("scheduler: not running")
+        return {"running": False, "jobs": {}}
+
+    jobs = {}
+    for job in scheduler.get_jobs():
+        last = job_events.get(job.id, {})
+        overdue = (now - job.next_run_time).total_seconds() if job.next_run_time else None
+        jobs[job.id] = {
+            "next_run": job.next_run_time.isoformat() if job.next_run_time else None,
+            "last_event": last.get("event"),
+            "last_event_at": last["at"].isoformat() if last else None,
+        }
+        if overdue is not None and settings.READY_SCHEDULER_GRACE and overdue > settings.READY_SCHEDULER_GRACE:
+            failures.append(f"scheduler: {job.id} overdue by {overdue:.0f}s")
+        if last.get("event") == "max_instances":
+            failures.append(f"scheduler: {job.id} is still running from a previous run")
+    return {"running": True, "jobs": jobs}
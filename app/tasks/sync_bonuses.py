@@ -1,101 +1,254 @@
+import hashlib
 import logging
+import time
 from datetime import datetime, timedelta, timezone
-from typing import List, Optional
+from typing import TYPE_CHECKING, AsyncIterator, Dict, List, Optional, Tuple
 
+from sqlalchemy import delete
 from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlmodel import select
 
-from app.db.models import BonusLog, SyncState, Clients
+from app.db.models import SyncState, SyncRun, Clients, RecordFingerprint
 from app.db.session import async_session
-from app.api.yclients import YClientsAPI
 
-from app.bot.services.loyalty import award_points
+from app.bot.services.loyalty import adjust_record_points, award_points
+from app.bot.services.stats import bump_client_stats
+from app.profiling import profiler, TARGET_SYNC
+
+if TYPE_CHECKING:
+    from app.api.yclients import YClientsAPI
 
 # Настройка логирования для задач синхронизации
 logger = logging.getLogger(__name__)
 
+# Сколько дней хранить статистику запусков в syncrun
+SYNC_RUN_RETENTION_DAYS = 90
+
+# Результат обработки одной записи
+AWARDED = "awarded"
+ADJUSTED = "adjusted"
+SKIPPED = "skipped"
+FAILED = "failed"
+
 async def sync_records(company_id: int):
     """Основная функция синхронизации бонусов для конкретного филиала"""
+    # Под профилировщиком, если администратор запросил /profile sync
+    async with profiler.capture(TARGET_SYNC):
+        await _sync_records(company_id)
+
+async def _sync_records(company_id: int):
+    # Клиент API импортируется при первом запуске, а не при старте приложения
+    from app.api.yclients import YClientsAPI
     api = YClientsAPI()
+    start_time = datetime.now(timezone.utc)
+    # Статистика запуска, сохраняется в syncrun даже при сбое
+    run = SyncRun(company_id=company_id, started_at=start_time, window_end=start_time)
     try:
         async with async_session() as session:
-            start_time = datetime.now(timezone.utc)
-
             # Получаем или создаём состояние
+            db_started = time.perf_counter()
             state = await _get_or_create_state(session, company_id)
             last_checked_aware = state.last_checked.replace(tzinfo=timezone.utc)
             safe_since = last_checked_aware + timedelta(milliseconds=1)
+            run.window_start = safe_since
+            run.cursor = last_checked_aware
+            run.db_seconds += time.perf_counter() - db_started
 
-            # Получаем все новые записи
-            pages = await _fetch_all_records(api, safe_since)
+            # Записи обрабатываются постранично: отпечатки всей страницы - одним запросом
+            async for batch in _iter_record_pages(api, safe_since, run):
+                db_started = time.perf_counter()
+                records = {rec["id"]: rec for rec in batch if rec.get("id") is not None}
+                known = await _load_fingerprints(session, list(records))
+                run.records_seen += len(records)
 
-            for rec in pages:
-                rec_id = rec.get("id")
-                if rec_id is None:
-                    continue
+                for rec_id, rec in records.items():
+                    fingerprint = _record_fingerprint(rec)
+                    stored = known.get(rec_id)
 
-                # Пропускаем уже обработанные
-                if await _is_record_processed(session, rec_id):
-                    logger.debug(f"record {rec_id} already processed, skipping")
-                    continue
+                    # Повторная выдача без изменений - ничего не делаем
+                    if stored is not None and stored.fingerprint == fingerprint:
+                        run.records_skipped += 1
+                        continue
+                    # Новая, но ещё не оплаченная запись - ждём оплаты. Оплаченный визит
+                    # дешевле 100 ₽ (0 баллов) учитывается: он попадает в сводку клиента,
+                    # а его отпечаток нужен, чтобы последующее изменение суммы стало корректировкой
+                    if stored is None and _record_amount(rec) == 0:
+                        run.records_skipped += 1
+                        continue
 
-                # Фильтруем неполные или не оплаченные
-                if rec.get("paid_full") != 1 or not rec.get("services"):
-                    continue
+                    client_data = rec.get("client")
+                    if stored is None and not client_data:
+                        run.records_skipped += 1
+                        continue
 
-                client_data = rec.get("client")
-                if not client_data:
-                    continue
+                    outcome, error = await _apply_record(rec_id, rec, fingerprint, client_data)
+                    if outcome == AWARDED:
+                        run.records_awarded += 1
+                    elif outcome == ADJUSTED:
+                        run.records_adjusted += 1
+                    elif outcome == FAILED:
+                        run.errors += 1
+                        run.last_error = error
+                    else:
+                        run.records_skipped += 1
+                run.db_seconds += time.perf_counter() - db_started
 
-                # Обрабатываем каждую запись в отдельной транзакции
+            # После обработки всех - обновляем метку времени. Если страница API
+            # не загрузилась, окно не сдвигаем: пропущенные записи придут в следующий раз
+            if run.api_errors:
+                logger.warning("YClients API failed, SyncState.last_checked left at %s", state.last_checked)
+            else:
                 try:
-                    async with async_session() as inner_sess:
-                        # Проверяем ещё раз внутри транзакции
-                        if await _is_record_processed(inner_sess, rec_id):
-                            continue
-
-                        client = await _get_client(inner_sess, client_data.get("id"))
-                        if not client or not client.is_in_loyalty:
-                            continue
-
-                        total_amount = sum(s.get("cost", 0) for s in rec.get("services", []))
-                        points = int(total_amount * 0.01)
-
-                        # Начисляем баллы и логируем в БД
-                        await award_points(inner_sess, client, rec_id, points)
-                        await inner_sess.commit()
-
-                        logger.info(f"Awarded {points} pts to client {client.yclients_id} for record {rec_id}")
+                    db_started = time.perf_counter()
+                    state.last_checked = start_time
+                    session.add(state)
+                    await session.commit()
+                    run.cursor = start_time
+                    run.db_seconds += time.perf_counter() - db_started
+                    logger.debug(f"SyncState.last_checked updated to {state.last_checked}")
                 except Exception as e:
-                    logger.exception(f"Failed to process record {rec_id}: {e}")
-
-            # После обработки всех - обновляем метку времени
-            try:
-                state.last_checked = start_time
-                session.add(state)
-                await session.commit()
-                logger.debug(f"SyncState.last_checked updated to {state.last_checked}")
-            except Exception as e:
-                logger.exception("Failed to update SyncState.last_checked: %s", e)
+                    logger.exception("Failed to update SyncState.last_checked: %s", e)
+                    run.errors += 1
+                    run.last_error = str(e)
 
     except Exception as e:
         # Глобальный обработчик ошибок
         logger.exception(f"Sync failed entirely: {e}")
+        run.errors += 1
+        run.last_error = str(e)
         try:
             await session.rollback()
         except Exception:
             pass
     finally:
         await api.close()
+        await _save_run(run)
 
-async def _is_record_processed(session: AsyncSession, record_id: int) -> bool:
+async def _save_run(run: SyncRun):
+    """Запись статистики запуска в syncrun (отдельная транзакция)"""
+    run.finished_at = datetime.now(timezone.utc)
+    if run.last_error:
+        run.last_error = run.last_error[:255]
+    try:
+        async with async_session() as session:
+            session.add(run)
+            await session.execute(
+                delete(SyncRun).where(
+                    SyncRun.started_at < run.started_at - timedelta(days=SYNC_RUN_RETENTION_DAYS)
+                )
+            )
+            await session.commit()
+    except Exception as e:
+        logger.exception("Failed to save SyncRun: %s", e)
+    logger.info(
+        "Sync run: %s records (%s awarded, %s adjusted, %s skipped, %s errors), "
+        "%s pages, API %.2fs, DB %.2fs",
+        run.records_seen, run.records_awarded, run.records_adjusted, run.records_skipped,
+        run.errors, run.pages, run.api_seconds, run.db_seconds
+    )
+
+async def _apply_record(
+    rec_id: int,
+    rec: dict,
+    fingerprint: str,
+    client_data: Optional[dict]
+) -> Tuple[str, Optional[str]]:
     """
-    Проверяет, была ли запись уже обработана (начислены бонусы).
+    Учёт новой или изменённой записи в отдельной транзакции:
+    первое начисление - award_points, изменение уже учтённой записи -
+    корректировка на разницу баллов.
+    Возвращает (результат, текст ошибки).
     """
+    try:
+        async with async_session() as inner_sess:
+            # Проверяем ещё раз внутри транзакции
+            stored = await inner_sess.get(RecordFingerprint, rec_id)
+            if stored is not None and stored.fingerprint == fingerprint:
+                return SKIPPED, None
+            points = _record_points(rec)
+            amount = _record_amount(rec)
+
+            if stored is None:
+                client = await _get_client(inner_sess, client_data.get("id"))
+                if not client or not client.is_in_loyalty:
+                    return SKIPPED, None
+
+                # Начисляем баллы и логируем в БД
+                await award_points(inner_sess, client, rec_id, points, amount)
+                inner_sess.add(RecordFingerprint(
+                    record_id=rec_id,
+                    client_id=client.id,
+                    fingerprint=fingerprint,
+                    points=points,
+                    amount=amount
+                ))
+                await inner_sess.commit()
+                logger.info(f"Awarded {points} pts to client {client.yclients_id} for record {rec_id}")
+                return AWARDED, None
+
+            # Запись уже учтена и изменилась (возврат, снятие оплаты, другая стоимость)
+            delta = points - stored.points
+            applied = 0
+            if delta:
+                client = await inner_sess.get(Clients, stored.client_id)
+                applied = await adjust_record_points(inner_sess, client, rec_id, delta)
+                if applied != delta:
+                    logger.warning(
+                        f"Record {rec_id}: reversal of {delta} pts limited to {applied}, "
+                        f"client {stored.client_id} has already spent the rest"
+                    )
+            # Отмена или возврат убирает визит из сводки клиента, повторная оплата - возвращает.
+            # Сумма записей, учтённых до колонки amount, неизвестна и в spend не входила
+            was_paid = (stored.points if stored.amount is None else stored.amount) > 0
+            await bump_client_stats(
+                inner_sess, stored.client_id,
+                last_visit_at=datetime.now(timezone.utc) if applied > 0 and amount > 0 else None,
+                visits=(amount > 0) - was_paid,
+                spend=amount - (stored.amount or 0)
+            )
+            # У записи, учтённой до колонки amount, сумма просто становится известной
+            amount_changed = stored.amount is not None and stored.amount != amount
+            stored.fingerprint = fingerprint
+            # Учтено ровно то, что применено: если возврат упёрся в потраченные баллы,
+            # повторная оплата не должна вернуть клиенту баллы второй раз
+            stored.points += applied
+            stored.amount = amount
+            inner_sess.add(stored)
+            await inner_sess.commit()
+            if not delta and not amount_changed:
+                # Изменились поля, не влияющие на баллы, или заполнен отпечаток старой записи
+                return SKIPPED, None
+            if delta:
+                logger.info(f"Record {rec_id} changed: adjusted client {stored.client_id} by {applied} pts")
+            return ADJUSTED, None
+    except Exception as e:
+        logger.exception(f"Failed to process record {rec_id}: {e}")
+        return FAILED, f"record {rec_id}: {e}"
+
+def _record_amount(rec: dict) -> int:
+    """Оплаченная сумма записи в её текущем состоянии (0 - не оплачена или удалена)"""
+    if rec.get("paid_full") != 1 or rec.get("deleted") or not rec.get("services"):
+        return 0
+    return int(sum(s.get("cost", 0) for s in rec.get("services", [])))
+
+def _record_points(rec: dict) -> int:
+    """Сколько баллов положено за запись в её текущем состоянии"""
+    return int(_record_amount(rec) * 0.01)
+
+def _record_fingerprint(rec: dict) -> str:
+    """Хэш полей, влияющих на баллы: оплата, удаление и стоимость услуг"""
+    costs = sorted((s.get("id"), s.get("cost", 0)) for s in rec.get("services") or [])
+    payload = repr((rec.get("paid_full"), bool(rec.get("deleted")), costs))
+    return hashlib.blake2b(payload.encode(), digest_size=8).hexdigest()
+
+async def _load_fingerprints(session: AsyncSession, record_ids: List[int]) -> Dict[int, RecordFingerprint]:
+    """Отпечатки учтённых записей страницы одним запросом"""
+    if not record_ids:
+        return {}
     result = await session.execute(
-        select(BonusLog).where(BonusLog.record_id == record_id)
+        select(RecordFingerprint).where(RecordFingerprint.record_id.in_(record_ids))
     )
-    return result.scalar_one_or_none() is not None
+    return {fp.record_id: fp for fp in result.scalars().all()}
 
 async def _get_client(session: AsyncSession, yclients_id: int) -> Optional[Clients]:
     """
@@ -119,36 +272,44 @@ async def _get_or_create_state(
         logger.debug(f"Created SyncState company_id={company_id}, initial={initial.isoformat()}")
     return state
 
-async def _fetch_all_records(
-    api: YClientsAPI,
+async def _iter_record_pages(
+    api: "YClientsAPI",
     changed_after: datetime,
+    run: SyncRun,
     page_size: int = 100
-) -> List[dict]:
+) -> AsyncIterator[List[dict]]:
     """
-    Загружает все записи из API, изменённые после `changed_after`.
+    Постранично отдаёт записи из API, изменённые после `changed_after`.
+    Число страниц, время ожидания API и ошибки копятся в `run`.
     """
-    all_records: List[dict] = []
     page = 1
+    fetched = 0
 
     while True:
+        api_started = time.perf_counter()
         try:
             batch = await api.fetch_records(
                 changed_after=changed_after,
                 page=page,
                 count=page_size
             )
-        except Exception:
+        except Exception as e:
             # Ошибка уже залогирована внутри fetch_records
+            run.api_errors += 1
+            run.last_error = f"API page {page}: {e}"
             break
+        finally:
+            run.api_seconds += time.perf_counter() - api_started
 
+        run.pages += 1
         logger.debug(f"page {page} → {len(batch)} records from API")
         if not batch:
             break
 
-        all_records.extend(batch)
+        fetched += len(batch)
+        yield batch
         if len(batch) < page_size:
             break
         page += 1
 
-    logger.info(f"total records fetched from API: {len(all_records)}")
-    return all_records
+    logger.info(f"total records fetched from API: {fetched}")
@@ -0,0 +1,61 @@
+# app/worker.py
+"""
+Отдельный процесс для фоновых заданий (синхронизация, уведомления,
+сгорание баллов) без HTTP-сервера:
+
+    python -m app.worker
+
+Веб-процесс при этом запускается с APP_ROLE=web, чтобы задания не
+выполнялись дважды.
+"""
+
+import asyncio
+import logging
+import signal
+import sys
+
+from app.bot.dispatcher import bot
+from app.config import settings
+from app.db.session import init_db
+from app.loop_monitor import loop_monitor
+from app.tasks.scheduler import start_background_jobs, stop_background_jobs
+
+# Настройка логирования: консоль и файл
+log_format = "%(asctime)s [%(levelname)s] %(name)s: %(message)s"
+logging.basicConfig(
+    level=logging.INFO,
+    format=log_format,
+    handlers=[
+        logging.StreamHandler(sys.stdout),
+        logging.FileHandler("bot.log", encoding="utf-8")
+    ]
+)
+logger = logging.getLogger(__name__)
+
+
+async def run_worker():
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    logger.info("Starting background worker...")
+    if settings.LOOP_MONITOR_ENABLED:
+        loop_monitor.start()
+    # Задания обращаются к таблицам с первого запуска: сначала схема БД
+    try:
+        await init_db()
+    except Exception as exc:
+        logger.exception("Error during init_db: %s", exc)
+    start_background_jobs()
+    try:
+        await stop.wait()
+    finally:
+        logger.info("Shutting down background worker...")
+        await stop_background_jobs()
+        await loop_monitor.stop()
+        await bot.session.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(run_worker())
@@ -0,0 +1,96 @@
+"""
+Повтор записанного дня синхронизации без сети.
+
+    # на сервере: записать трафик YClientsAPI
+    YCLIENTS_CAPTURE_FILE=/app/archive/yclients.jsonl.gz
+    # локально: прогнать sync_records по записи
+    python benchmarks/replay_sync.py yclients.jsonl.gz
+    python benchmarks/replay_sync.py yclients.jsonl.gz --latency 1   # с записанными задержками API
+
+Каждый записанный запуск (запрос первой страницы записей) превращается в
+один вызов sync_records. Нужна БД со схемой и базой клиентов; начисления
+пишутся в неё, поэтому повторные прогоны делаются на свежей копии, иначе
+все записи будут пропущены как уже учтённые.
+"""
+
+import argparse
+import asyncio
+import os
+import re
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+RECORDS_PATH = re.compile(r"/records/(\d+)/$")
+
+
+async def replay(path: str, latency: float):
+    # Настройки читаются при импорте app.config
+    os.environ["YCLIENTS_REPLAY_FILE"] = path
+    os.environ["YCLIENTS_REPLAY_LATENCY"] = str(latency)
+    sys.path.insert(0, str(ROOT))
+
+    from sqlmodel import select
+    from app.api.yclients_replay import load_replay
+    from app.config import settings
+    from app.db.models import SyncRun
+    from app.db.session import async_session
+    from app.tasks.sync_bonuses import sync_records
+
+    log = load_replay(path)
+    companies = {
+        int(m.group(1)) for (_, p, _, _), queue in log.entries.items()
+        if queue and (m := RECORDS_PATH.search(p))
+    }
+    if len(companies) != 1:
+        raise SystemExit(f"Expected records of one company in {path}, got {sorted(companies)}")
+    company_id = settings.COMPANY_ID = companies.pop()
+    prefix = f"/api/v1/records/{company_id}/"
+
+    started_at = datetime.now(timezone.utc)
+    walls = []
+    left = log.remaining(prefix, page=1)
+    while left:
+        run_started = time.perf_counter()
+        await sync_records(company_id)
+        walls.append(time.perf_counter() - run_started)
+        # sync_records глотает ошибки: если запуск упал до первой страницы, запись не сдвинулась
+        before, left = left, log.remaining(prefix, page=1)
+        if left >= before:
+            print(f"Run {len(walls)} did not request a recorded first page, stopping")
+            break
+
+    async with async_session() as session:
+        runs = (await session.execute(
+            select(SyncRun).where(SyncRun.started_at >= started_at).order_by(SyncRun.started_at)
+        )).scalars().all()
+
+    print(f"{'run':>4} {'pages':>6} {'seen':>6} {'awarded':>8} {'adjusted':>9} {'errors':>7} "
+          f"{'api s':>8} {'db s':>8} {'wall s':>8}")
+    for i, (run, wall) in enumerate(zip(runs, walls), 1):
+        print(f"{i:>4} {run.pages:>6} {run.records_seen:>6} {run.records_awarded:>8} "
+              f"{run.records_adjusted:>9} {run.errors + run.api_errors:>7} "
+              f"{run.api_seconds:>8.2f} {run.db_seconds:>8.2f} {wall:>8.2f}")
+    if walls:
+        print(f"\n{len(walls)} runs: total {sum(walls):.2f} s, median {statistics.median(walls):.2f} s, "
+              f"max {max(walls):.2f} s; DB total {sum(r.db_seconds for r in runs):.2f} s")
+    left = sum(len(q) for q in log.entries.values())
+    if left:
+        print(f"{left} recorded responses were not requested")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded YClients traffic through sync_records")
+    parser.add_argument("capture", help="файл YCLIENTS_CAPTURE_FILE (gzip JSONL)")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="множитель записанных задержек API (0 - без задержек)")
+    args = parser.parse_args()
+    asyncio.run(replay(args.capture, args.latency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Бенчмарк холодного старта приложения.
+
+    python benchmarks/startup.py                # импорт, 5 прогонов
+    python benchmarks/startup.py --runs 10
+    python benchmarks/startup.py --lifespan     # + фазы lifespan (нужны БД и токен бота)
+
+Импорт измеряется в отдельном процессе через `python -X importtime`, чтобы
+каждый прогон был холодным. Фазы lifespan берутся из app.state.startup_timings.
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Модули, вклад которых в импорт показываем отдельно (кумулятивное время)
+IMPORT_GROUPS = (
+    "app.config",
+    "app.db.session",
+    "app.bot.dispatcher",
+    "app.api.admin",
+    "aiogram",
+    "fastapi",
+    "sqlmodel",
+    "apscheduler",
+    "httpx",
+    "app.main",
+)
+
+
+def measure_imports() -> Dict[str, float]:
+    """Один холодный импорт app.main: кумулятивное время групп в мс + wall time"""
+    env = dict(os.environ, PYTHONPATH=str(ROOT))
+    env.setdefault("FATHERBOT_TOKEN", "123456:benchmark")
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        # app пишет bot.log в текущий каталог - не засоряем репозиторий
+        cwd=tempfile.gettempdir(), env=env, capture_output=True, text=True,
+    )
+    wall = (time.perf_counter() - started) * 1000
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr[-2000:])
+
+    result = {"process_wall": wall}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        name = name.strip()
+        if name in IMPORT_GROUPS and name not in result:
+            result[name] = int(cumulative) / 1000
+    return result
+
+
+async def measure_lifespan() -> Dict[str, float]:
+    sys.path.insert(0, str(ROOT))
+    from app.main import app
+
+    async with app.router.lifespan_context(app):
+        return dict(app.state.startup_timings)
+
+
+def _report(title: str, samples: List[Dict[str, float]]):
+    print(f"\n{title}")
+    keys = [k for k in samples[0]]
+    for key in keys:
+        values = [s[key] for s in samples if key in s]
+        print(f"  {key:<22} median {statistics.median(values):9.1f} ms   "
+              f"min {min(values):9.1f} ms   max {max(values):9.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold start benchmark")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--lifespan", action="store_true", help="также замерить фазы lifespan")
+    args = parser.parse_args()
+
+    _report(
+        f"import app.main ({args.runs} cold runs)",
+        [measure_imports() for _ in range(args.runs)],
+    )
+    if args.lifespan:
+        _report("lifespan phases (1 run)", [asyncio.run(measure_lifespan())])
+
+
+if __name__ == "__main__":
+    main()